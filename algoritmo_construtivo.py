@@ -1,269 +1,1868 @@
+import os
 import random
+import hashlib
 import copy
+import math
+import collections
 import time
-def construir_rotas_iniciais(servicos, deposito, matriz_distancias, capacidade):
+import multiprocessing
+import concurrent.futures
+import numpy as np
+from array import array
+
+from tabela_servicos import TabelaServicos
+
+# Acima deste número de serviços, o Clarke & Wright usa a variante podada dos savings (top-M por serviço)
+LIMITE_SAVINGS_COMPLETOS = 2000
+TOP_M_SAVINGS = 100
+
+# Candidatos sorteados em cada passo do tour gigante (construtivo por split)
+K_TOUR_GIGANTE = 3
+
+# Busca local iterada: segmentos movidos por perturbação, comprimento máximo de cada segmento,
+# tamanho do histórico da aceitação tardia e temperaturas (relativas ao custo inicial) do recozimento
+FORCA_PERTURBACAO = 3
+MAX_SEGMENTO_PERTURBACAO = 5
+HISTORICO_ACEITACAO = 25
+TEMPERATURA_INICIAL = 0.01
+TEMPERATURA_FINAL = 0.0001
+
+# Ruína e recriação (LNS): fração dos serviços retirados, critérios de remoção e ordem do arrependimento
+FRACAO_RUINA_MIN = 0.10
+FRACAO_RUINA_MAX = 0.30
+CRITERIOS_RUINA = ("aleatoria", "relacionada", "rotas")
+REGRET_K = 3
+
+# Semente base quando nenhuma é informada; as sementes de cada tentativa (e de cada ilha) são derivadas dela por derivar_semente
+SEMENTE_PADRAO = 12345
+
+# Construtivos disponíveis no multi-start ("misto" alterna Clarke & Wright e split entre as tentativas)
+CONSTRUTIVOS = ("clarke_wright", "split", "misto")
+
+# Comprimento máximo padrão dos blocos do segment_relocate e tamanho dos lotes de avaliação vetorizada
+MAX_SEGMENTO = 10
+LIMITE_AVALIACOES_BLOCO = 1 << 20
+
+# Tamanho das listas de vizinhos das vizinhanças granulares (buscas locais)
+K_VIZINHOS = 20
+
+# Comprimento máximo de cada bloco trocado pelo CROSS-exchange
+MAX_BLOCO_CROSS = 3
+
+# Comprimento máximo das cadeias movidas pelo Or-opt
+MAX_CADEIA_OR_OPT = 3
+
+
+class Prazo:
+    """
+    1. Objetivo:
+       Representa um prazo (orçamento de tempo) para o modo "anytime" das heurísticas.
+
+    2. Entradas:
+       - segundos: orçamento de tempo a partir da criação do objeto.
+       - cpu: se True, mede tempo de CPU do processo (time.process_time); senão, tempo de parede (time.perf_counter).
+
+    3. Lógica:
+       Guarda o instante limite no relógio escolhido; esgotado() compara o relógio atual com esse limite.
+
+    4. Contribuição:
+       Permite que o multi-start e as buscas locais parem de forma limpa no prazo, devolvendo a melhor solução encontrada até ali.
+    """
+
+    def __init__(self, segundos, cpu=False):
+        self.segundos = segundos
+        self.cpu = cpu
+        self.limite = self._relogio() + segundos
+
+    def _relogio(self):
+        return time.process_time() if self.cpu else time.perf_counter()
+
+    def esgotado(self):
+        return self._relogio() >= self.limite
+
+    def restante(self):
+        return max(0.0, self.limite - self._relogio())
+
+
+def derivar_semente(*partes):
+    """
+    Semente reprodutível (inteiro não negativo de 63 bits) derivada das partes informadas, ex.: derivar_semente(nome_instancia)
+    ou derivar_semente(semente_base, tentativa). Usa SHA-256 em vez de hash(), cujo valor para textos muda a cada execução do interpretador.
+    """
+    texto = "|".join(str(parte) for parte in partes)
+    return int.from_bytes(hashlib.sha256(texto.encode("utf-8")).digest()[:8], "big") >> 1
+
+
+def construir_rotas_iniciais(tabela, deposito, matriz_distancias, capacidade):
     """
     1. Objetivo:
        Cria uma solução inicial trivial para o problema de roteamento, onde cada serviço obrigatório é atendido por uma rota separada.
 
     2. Entradas:
-       - servicos: lista de dicionários, cada um representando um serviço obrigatório.
+       - tabela: TabelaServicos com os serviços obrigatórios.
        - deposito: índice do depósito (nó de partida/chegada).
        - matriz_distancias: matriz de distâncias entre os nós do grafo.
        - capacidade: capacidade máxima do veículo.
 
     3. Lógica:
-       Para cada serviço, cria uma rota contendo apenas esse serviço e registra sua demanda.
+       Para cada serviço, cria uma rota contendo apenas o índice desse serviço e registra sua demanda.
 
     4. Contribuição:
        Serve como ponto de partida para algoritmos construtivos e heurísticas de fusão de rotas.
     """
-    rotas = []
-    demandas = []
-    for serv in servicos:
-        demanda = serv['demanda']
-        rotas.append([serv])
-        demandas.append(demanda)
+    rotas = [[s] for s in range(len(tabela))]
+    demandas = list(tabela.demanda)
     return rotas, demandas
 
-def rota_custo(rota, matriz_distancias, deposito):
+def orientar_sequencia(entradas, saidas, matriz_distancias, deposito):
+    """
+    1. Objetivo:
+       Escolhe o sentido de travessia de cada serviço de uma sequência fixa, minimizando o custo de deslocamento.
+
+    2. Entradas:
+       - entradas: para cada posição, o par (nó de entrada no sentido 0, nó de entrada no sentido 1).
+       - saidas: para cada posição, o par (nó de saída no sentido 0, nó de saída no sentido 1).
+       - matriz_distancias: matriz de distâncias.
+       - deposito: índice do depósito.
+
+    3. Lógica:
+       Programação dinâmica linear com dois estados por posição: custo[o] é o menor deslocamento desde o depósito até
+       o fim do serviço atual atendido no sentido o. A transição soma a ligação saída(anterior, o') -> entrada(atual, o)
+       e guarda o melhor o'. No final soma a volta ao depósito e reconstrói os sentidos de trás para frente.
+       Em empates, prefere o sentido 0 (origem -> destino).
+
+    4. Contribuição:
+       Núcleo da avaliação orientada: permite atender arestas requeridas em qualquer sentido e cobra corretamente
+       o deslocamento até a origem dos arcos. Custa O(n), o que permite reavaliar rotas a cada movimento aplicado.
+       Retorna (custo de deslocamento, lista de sentidos).
+    """
+    if not entradas:
+        return 0, []
+    linha_deposito = matriz_distancias[deposito]
+    e0, e1 = entradas[0]
+    custo0, custo1 = linha_deposito[e0], linha_deposito[e1]
+    escolhas = []
+    x0, x1 = saidas[0]
+    for k in range(1, len(entradas)):
+        linha0, linha1 = matriz_distancias[x0], matriz_distancias[x1]
+        e0, e1 = entradas[k]
+        a, b = custo0 + linha0[e0], custo1 + linha1[e0]
+        novo0, origem0 = (a, 0) if a <= b else (b, 1)
+        a, b = custo0 + linha0[e1], custo1 + linha1[e1]
+        novo1, origem1 = (a, 0) if a <= b else (b, 1)
+        escolhas.append((origem0, origem1))
+        custo0, custo1 = novo0, novo1
+        x0, x1 = saidas[k]
+    custo0 += matriz_distancias[x0][deposito]
+    custo1 += matriz_distancias[x1][deposito]
+    sentido = 0 if custo0 <= custo1 else 1
+    sentidos = [sentido]
+    for escolha in reversed(escolhas):
+        sentido = escolha[sentido]
+        sentidos.append(sentido)
+    sentidos.reverse()
+    return min(custo0, custo1), sentidos
+
+
+def orientar_rota(rota, matriz_distancias, deposito, tabela):
+    """
+    Custo total de uma rota (serviço + deslocamento) com os sentidos ótimos dos serviços (orientar_sequencia).
+    Retorna (custo, sentidos), com sentidos alinhados à rota.
+    """
+    e0, e1 = tabela.entrada
+    x0, x1 = tabela.saida
+    custo_transporte, sentidos = orientar_sequencia(
+        [(e0[s], e1[s]) for s in rota], [(x0[s], x1[s]) for s in rota], matriz_distancias, deposito
+    )
+    return sum(tabela.custo_servico[s] for s in rota) + custo_transporte, sentidos
+
+
+def rota_custo(rota, matriz_distancias, deposito, tabela):
     """
     1. Objetivo:
        Calcula o custo total de uma rota, considerando custos de serviço e transporte.
 
     2. Entradas:
-       - rota: lista de serviços (na ordem de atendimento).
+       - rota: lista de índices de serviços (na ordem de atendimento).
        - matriz_distancias: matriz de distâncias entre nós.
        - deposito: índice do depósito.
+       - tabela: TabelaServicos com os dados dos serviços.
 
     3. Lógica:
        Soma o custo de serviço de cada serviço na rota.
-       Soma o custo de transporte: do depósito ao primeiro serviço, entre serviços consecutivos, e do último serviço de volta ao depósito.
+       Soma o custo de transporte: do depósito à entrada do primeiro serviço, da saída de cada serviço à entrada do seguinte,
+       e da saída do último serviço de volta ao depósito, com o sentido de cada aresta escolhido por orientar_sequencia.
 
     4. Contribuição:
        Permite avaliar e comparar rotas, sendo fundamental para heurísticas de melhoria e validação de soluções.
     """
     if not rota:
         return 0
-    custo_servico = sum(serv['custo_servico'] for serv in rota)
-    destinos = [serv['destino'] for serv in rota]
-    custo_transporte = matriz_distancias[deposito][destinos[0]]
-    for i in range(len(destinos) - 1):
-        custo_transporte += matriz_distancias[destinos[i]][destinos[i+1]]
-    custo_transporte += matriz_distancias[destinos[-1]][deposito]
-    return custo_servico + custo_transporte
+    return orientar_rota(rota, matriz_distancias, deposito, tabela)[0]
+
 
-def calcular_savings(servicos, deposito, matriz_distancias):
+class Solucao:
     """
     1. Objetivo:
-       Calcula a matriz de 'savings' (economias) para todos os pares de serviços, segundo o método de Clarke & Wright.
+       Representa uma solução em construção/melhoria com rotas compactas, índice de posições, sentidos de travessia e custos e demandas por rota.
 
     2. Entradas:
-       - servicos: lista de serviços obrigatórios.
+       - tabela: TabelaServicos com os serviços obrigatórios.
        - deposito: índice do depósito.
        - matriz_distancias: matriz de distâncias.
+       - capacidade: capacidade máxima do veículo.
+       - rotas: rotas iniciais (sequências de índices de serviços).
 
     3. Lógica:
-       Para cada par de serviços (i, j), calcula o quanto se economiza ao atendê-los juntos em vez de separadamente.
-       Ordena os savings do maior para o menor.
+       - Cada rota é um array('i') de índices de serviços; rota_de[s] e posicao[s] localizam cada serviço (índice de posições).
+       - sentido[s] é o sentido de travessia atual do serviço, e entrada[s] / saida[s] os nós correspondentes,
+         usados pelas buscas locais para avaliar movimentos em O(1).
+       - demanda[j] e custo[j] guardam a demanda e o custo de cada rota.
+       - Os movimentos (mover, mover_segmento, trocar_segmentos, trocar_caudas, inverter, remover, inserir) alteram as rotas no lugar e devolvem um registro que desfazer() usa
+         para restaurar o estado anterior. Apenas as rotas afetadas são reorientadas (orientar_rota, O(n) por rota), o que
+         atualiza de uma vez sentidos, custo e índice de posições.
+
+    4. Contribuição:
+       Elimina a cópia de listas e o recálculo de custos da solução inteira nos laços das buscas locais e reduz a memória de cada solução
+       (4 bytes por serviço nas rotas, em vez de uma lista de referências).
+    """
+
+    def __init__(self, tabela, deposito, matriz_distancias, capacidade, rotas):
+        self.tabela = tabela
+        self.deposito = deposito
+        self.matriz_distancias = matriz_distancias
+        self.capacidade = capacidade
+        self.rotas = [array("i", rota) for rota in rotas]
+        self.rota_de = array("i", [-1]) * len(tabela)
+        self.posicao = array("i", [-1]) * len(tabela)
+        self.sentido = array("b", [0]) * len(tabela)
+        # Nós de entrada e saída no sentido atual; listas, pois são só consultadas nos laços quentes
+        self.entrada = list(tabela.entrada[0])
+        self.saida = list(tabela.saida[0])
+        self.demanda = array("q", [sum(tabela.demanda[s] for s in rota) for rota in self.rotas])
+        self.custo = [0] * len(self.rotas)
+        for j in range(len(self.rotas)):
+            self._reorientar(j)
+
+    def _reorientar(self, j, inicio=0):
+        # Escolhe os sentidos ótimos da rota j, atualiza seu custo e reindexa as posições a partir de inicio
+        rota = self.rotas[j]
+        custo, sentidos = orientar_rota(rota, self.matriz_distancias, self.deposito, self.tabela)
+        self.custo[j] = custo
+        entradas, saidas = self.tabela.entrada, self.tabela.saida
+        for pos, s in enumerate(rota):
+            o = sentidos[pos]
+            self.sentido[s] = o
+            self.entrada[s] = entradas[o][s]
+            self.saida[s] = saidas[o][s]
+            if pos >= inicio:
+                self.rota_de[s] = j
+                self.posicao[s] = pos
+
+    def nos_vizinhos(self, j, pos):
+        """
+        Nós entre os quais um serviço inserido na posição pos da rota j ficaria: saída do anterior e entrada do seguinte (depósito nas pontas).
+        """
+        rota = self.rotas[j]
+        a = self.saida[rota[pos - 1]] if pos > 0 else self.deposito
+        b = self.entrada[rota[pos]] if pos < len(rota) else self.deposito
+        return a, b
+
+    def custo_insercao(self, s, a, b):
+        """
+        Acréscimo de deslocamento ao inserir o serviço s entre os nós a e b, no melhor sentido.
+        """
+        d = self.matriz_distancias
+        tabela = self.tabela
+        linha_a = d[a]
+        custo = linha_a[tabela.entrada[0][s]] + d[tabela.saida[0][s]][b]
+        if tabela.reversivel[s]:
+            custo = min(custo, linha_a[tabela.entrada[1][s]] + d[tabela.saida[1][s]][b])
+        return custo - linha_a[b]
+
+    def custo_total(self):
+        return sum(self.custo)
+
+    def num_rotas(self):
+        return sum(1 for rota in self.rotas if rota)
+
+    def mover(self, s, j, pos):
+        """
+        Move o serviço s para a rota j, na posição pos (contada após a retirada de s). Devolve o registro do movimento.
+        """
+        i, idx = self.rota_de[s], self.posicao[s]
+        demanda_s = self.tabela.demanda[s]
+        del self.rotas[i][idx]
+        self.demanda[i] -= demanda_s
+        self.rotas[j].insert(pos, s)
+        self.demanda[j] += demanda_s
+        if i != j:
+            self._reorientar(i, idx)
+            self._reorientar(j, pos)
+        else:
+            self._reorientar(j, min(idx, pos))
+        return ("mover", s, i, idx)
+
+    def remover(self, s):
+        """
+        Retira o serviço s da sua rota (s fica sem rota: rota_de[s] = -1). Devolve o registro do movimento.
+        """
+        i, idx = self.rota_de[s], self.posicao[s]
+        del self.rotas[i][idx]
+        self.demanda[i] -= self.tabela.demanda[s]
+        self.rota_de[s] = self.posicao[s] = -1
+        self._reorientar(i, idx)
+        return ("remover", s, i, idx)
+
+    def inserir(self, s, j, pos):
+        """
+        Insere o serviço s (sem rota) na rota j, na posição pos. Devolve o registro do movimento.
+        """
+        self.rotas[j].insert(pos, s)
+        self.demanda[j] += self.tabela.demanda[s]
+        self._reorientar(j, pos)
+        return ("inserir", s)
+
+    def nova_rota(self):
+        """
+        Acrescenta uma rota vazia e devolve o seu índice.
+        """
+        self.rotas.append(array("i"))
+        self.demanda.append(0)
+        self.custo.append(0)
+        return len(self.rotas) - 1
+
+    def mover_segmento(self, i, a, b, j, pos):
+        """
+        Move o bloco rotas[i][a..b] (mesma ordem) para a rota j, a partir da posição pos (se j == i, contada após a retirada do bloco).
+        Devolve o registro do movimento.
+        """
+        rota_i = self.rotas[i]
+        bloco = rota_i[a:b + 1]
+        demanda_bloco = sum(self.tabela.demanda[s] for s in bloco)
+        del rota_i[a:b + 1]
+        self.demanda[i] -= demanda_bloco
+        self.rotas[j][pos:pos] = bloco
+        self.demanda[j] += demanda_bloco
+        if i != j:
+            self._reorientar(i, a)
+            self._reorientar(j, pos)
+        else:
+            self._reorientar(j, min(a, pos))
+        return ("segmento", j, pos, pos + b - a, i, a)
+
+    def trocar_segmentos(self, i, a, tam_i, j, b, tam_j):
+        """
+        Troca o bloco rotas[i][a:a+tam_i] pelo bloco rotas[j][b:b+tam_j] (rotas distintas, ordem interna mantida). Devolve o registro do movimento.
+        """
+        rota_i, rota_j = self.rotas[i], self.rotas[j]
+        bloco_i = rota_i[a:a + tam_i]
+        bloco_j = rota_j[b:b + tam_j]
+        demanda = self.tabela.demanda
+        diferenca = sum(demanda[s] for s in bloco_j) - sum(demanda[s] for s in bloco_i)
+        rota_i[a:a + tam_i] = bloco_j
+        rota_j[b:b + tam_j] = bloco_i
+        self.demanda[i] += diferenca
+        self.demanda[j] -= diferenca
+        self._reorientar(i, a)
+        self._reorientar(j, b)
+        return ("trocar", i, a, tam_j, j, b, tam_i)
+
+    def trocar_caudas(self, i, p, j, q):
+        """
+        Troca as caudas de duas rotas (2-opt*): rotas[i][p:] passa para o fim de rotas[j][:q] e vice-versa. Devolve o registro do movimento.
+        """
+        rota_i, rota_j = self.rotas[i], self.rotas[j]
+        cauda_i = rota_i[p:]
+        cauda_j = rota_j[q:]
+        demanda = self.tabela.demanda
+        diferenca = sum(demanda[s] for s in cauda_j) - sum(demanda[s] for s in cauda_i)
+        del rota_i[p:]
+        rota_i.extend(cauda_j)
+        del rota_j[q:]
+        rota_j.extend(cauda_i)
+        self.demanda[i] += diferenca
+        self.demanda[j] -= diferenca
+        self._reorientar(i, p)
+        self._reorientar(j, q)
+        return ("caudas", i, p, j, q)
+
+    def inverter(self, i, a, b):
+        """
+        Inverte o trecho rotas[i][a..b] (os sentidos são reescolhidos para a nova ordem). Devolve o registro do movimento.
+        """
+        rota = self.rotas[i]
+        rota[a:b + 1] = rota[a:b + 1][::-1]
+        self._reorientar(i, a)
+        return ("inverter", i, a, b)
+
+    def desfazer(self, registro):
+        """
+        Desfaz um movimento a partir do registro devolvido por mover, mover_segmento, trocar_segmentos, trocar_caudas, inverter, remover ou inserir.
+        """
+        tipo = registro[0]
+        if tipo == "mover":
+            _, s, i, idx = registro
+            self.mover(s, i, idx)
+        elif tipo == "remover":
+            _, s, i, idx = registro
+            self.inserir(s, i, idx)
+        elif tipo == "inserir":
+            self.remover(registro[1])
+        elif tipo == "segmento":
+            _, j, inicio, fim, i, a = registro
+            self.mover_segmento(j, inicio, fim, i, a)
+        elif tipo == "trocar":
+            self.trocar_segmentos(*registro[1:])
+        elif tipo == "caudas":
+            self.trocar_caudas(*registro[1:])
+        else:
+            _, i, a, b = registro
+            self.inverter(i, a, b)
+
+    def remover_vazias(self):
+        """
+        Remove as rotas vazias e reindexa as demais.
+        """
+        manter = [j for j, rota in enumerate(self.rotas) if rota]
+        if len(manter) == len(self.rotas):
+            return
+        self.rotas = [self.rotas[j] for j in manter]
+        self.demanda = array("q", [self.demanda[j] for j in manter])
+        self.custo = [self.custo[j] for j in manter]
+        for j, rota in enumerate(self.rotas):
+            for pos, s in enumerate(rota):
+                self.rota_de[s] = j
+                self.posicao[s] = pos
+
+    def copiar(self):
+        """
+        Cópia independente da solução (os arrays são copiados; tabela e matriz são compartilhadas).
+        """
+        copia = copy.copy(self)
+        copia.rotas = [array("i", rota) for rota in self.rotas]
+        copia.rota_de = self.rota_de[:]
+        copia.posicao = self.posicao[:]
+        copia.sentido = self.sentido[:]
+        copia.entrada = self.entrada[:]
+        copia.saida = self.saida[:]
+        copia.demanda = self.demanda[:]
+        copia.custo = self.custo[:]
+        return copia
+
+
+def calcular_savings(tabela, deposito, matriz_distancias, top_m=None):
+    """
+    1. Objetivo:
+       Calcula os 'savings' (economias) de todos os pares ordenados de serviços, segundo o método de Clarke & Wright.
+
+    2. Entradas:
+       - tabela: TabelaServicos com os serviços obrigatórios.
+       - deposito: índice do depósito.
+       - matriz_distancias: matriz de distâncias (MatrizDistancias, com array denso).
+       - top_m: se informado, mantém apenas os top_m melhores sucessores de cada serviço (variante podada, com memória O(n * top_m)).
+
+    3. Lógica:
+       O saving do par ordenado (i, j) é a economia de atender j logo após i em vez de voltar ao depósito entre eles:
+       d[saída de i][dep] + d[dep][entrada de j] - d[saída de i][entrada de j], com cada termo no melhor sentido de travessia
+       (arestas podem ser atendidas nos dois sentidos; os sentidos definitivos são escolhidos depois, por rota, em orientar_rota).
+       As linhas (i) são processadas em blocos com broadcast NumPy; na variante podada, só os top_m sucessores de cada i são guardados.
+       Ordena os savings do maior para o menor (empates pela ordem decrescente de i e j).
 
     4. Contribuição:
        Fundamenta o algoritmo de fusão de rotas do Clarke & Wright e suas variantes.
+       Retorna três arrays alinhados (valores, i, j), com índices int32, em vez de uma lista de tuplas.
+    """
+    n = len(tabela)
+    if n < 2:
+        vazio = np.empty(0, dtype=np.int32)
+        return np.empty(0, dtype=matriz_distancias.valores.dtype), vazio, vazio
+
+    indice = matriz_distancias.indice
+    valores_matriz = matriz_distancias.valores
+    no_deposito = indice[deposito]
+    entradas = [np.array([indice[v] for v in lado], dtype=np.int64) for lado in tabela.entrada]
+    saidas = [np.array([indice[v] for v in lado], dtype=np.int64) for lado in tabela.saida]
+    linha_deposito = np.asarray(valores_matriz[no_deposito], dtype=np.float64)
+    coluna_deposito = np.asarray(valores_matriz[:, no_deposito], dtype=np.float64)
+    ate_deposito = np.minimum(coluna_deposito[saidas[0]], coluna_deposito[saidas[1]])
+    do_deposito = np.minimum(linha_deposito[entradas[0]], linha_deposito[entradas[1]])
+
+    completo = top_m is None or top_m >= n - 1
+    blocos_valores, blocos_i, blocos_j = [], [], []
+    bloco = max(1, (1 << 22) // n)
+    for inicio in range(0, n, bloco):
+        linhas = np.arange(inicio, min(n, inicio + bloco))
+        # Menor ligação saída(i) -> entrada(j) entre os sentidos possíveis dos dois serviços
+        ligacao = np.full((len(linhas), n), np.inf)
+        for saida in saidas:
+            for entrada in entradas:
+                np.minimum(ligacao, valores_matriz[np.ix_(saida[linhas], entrada)], out=ligacao)
+        saving = ate_deposito[linhas, None] + do_deposito[None, :] - ligacao
+        saving[np.arange(len(linhas)), linhas] = -np.inf
+        if completo:
+            ii = np.repeat(linhas, n)
+            jj = np.tile(np.arange(n), len(linhas))
+            manter = ii != jj
+            ii, jj = ii[manter], jj[manter]
+        else:
+            melhores = np.argpartition(-saving, top_m - 1, axis=1)[:, :top_m]
+            ii = np.repeat(linhas, top_m)
+            jj = melhores.ravel()
+        blocos_valores.append(saving[ii - inicio, jj])
+        blocos_i.append(ii)
+        blocos_j.append(jj)
+
+    valores = np.concatenate(blocos_valores)
+    ii, jj = np.concatenate(blocos_i), np.concatenate(blocos_j)
+    if np.issubdtype(valores_matriz.dtype, np.integer):
+        valores = valores.astype(valores_matriz.dtype)
+    ordem = np.lexsort((jj, ii, valores))[::-1]
+    return valores[ordem], ii[ordem].astype(np.int32), jj[ordem].astype(np.int32)
+
+
+def _iterar_savings(savings, bloco=4096):
     """
-    savings = []
-    n = len(servicos)
-    for i in range(n):
-        for j in range(i+1, n):
-            s_i = servicos[i]
-            s_j = servicos[j]
-            saving = (
-                matriz_distancias[deposito][s_i['destino']]
-                + matriz_distancias[deposito][s_j['destino']]
-                - matriz_distancias[s_i['destino']][s_j['destino']]
-            )
-            savings.append((saving, i, j))
-    savings.sort(reverse=True)
-    return savings
-
-def clarke_wright_grasp(servicos, deposito, matriz_distancias, capacidade, k=3):
+    Percorre os arrays de savings como tuplas (saving, i, j), convertendo-os para objetos Python em blocos.
+    """
+    valores, ii, jj = savings
+    for inicio in range(0, len(ii), bloco):
+        fim = inicio + bloco
+        yield from zip(valores[inicio:fim].tolist(), ii[inicio:fim].tolist(), jj[inicio:fim].tolist())
+
+
+def clarke_wright_grasp(tabela, deposito, matriz_distancias, capacidade, k=3, rng=None, top_m=None, savings=None):
     """
     1. Objetivo:
        Gera uma solução inicial para o CARP usando o algoritmo Clarke & Wright com randomização GRASP (escolha aleatória entre os top-k savings).
 
     2. Entradas:
-       - servicos: lista de serviços obrigatórios.
+       - tabela: TabelaServicos com os serviços obrigatórios.
        - deposito: índice do depósito.
        - matriz_distancias: matriz de distâncias.
        - capacidade: capacidade máxima do veículo.
        - k: número de savings do topo a considerar em cada passo (top-k).
+       - rng: gerador random.Random usado na escolha aleatória (padrão: gerador próprio com SEMENTE_PADRAO; o gerador global nunca é usado).
+       - top_m: parceiros mantidos por serviço na variante podada de calcular_savings (None = automático: todos os pares até LIMITE_SAVINGS_COMPLETOS serviços).
+       - savings: savings já calculados (resultado de calcular_savings), reaproveitados entre construções; None = calcula aqui.
 
     3. Lógica:
-       Inicializa cada serviço em uma rota separada.
-       Calcula os savings e, em cada iteração, escolhe aleatoriamente um dos top-k savings disponíveis para tentar fundir rotas, respeitando a capacidade.
-       Remove savings já tentados e repete até não haver mais savings disponíveis.
-       Remove rotas vazias e valida que todos os serviços obrigatórios estão presentes.
+       Inicializa cada serviço em uma rota separada, encadeada por ponteiros, com mapas O(1) de início -> fim e fim -> início de rota.
+       Calcula os savings e, em cada iteração, escolhe aleatoriamente um dos top-k savings que ainda correspondem a uma fusão válida
+       (i no fim de uma rota, j no início de outra, respeitando a capacidade); savings inválidos são descartados preguiçosamente.
+       A fusão cria exatamente a ligação i -> j avaliada pelo saving (rota de i seguida da rota de j).
+       Repete até não haver mais fusões possíveis, reconstrói as rotas e valida que todos os serviços obrigatórios estão presentes.
 
     4. Contribuição:
        Cria soluções iniciais diversificadas e potencialmente melhores para serem refinadas por heurísticas locais.
     """
-    # Inicializa cada serviço em uma rota separada
-    rotas, demandas = construir_rotas_iniciais(servicos, deposito, matriz_distancias, capacidade)
-
-    # Calcula e ordena savings (maior para menor) apenas uma vez
-    savings = calcular_savings(servicos, deposito, matriz_distancias)
+    rng = rng or random.Random(SEMENTE_PADRAO)
+    n = len(tabela)
+
+    # Cada serviço começa em uma rota própria. Uma rota é identificada pelo seu serviço inicial
+    # (a fusão mantém o início da rota de i), e os serviços são encadeados por ponteiros "proximo".
+    proximo = [-1] * n
+    fim_da_rota = list(range(n))        # início -> último serviço da rota
+    inicio_da_rota = list(range(n))     # último serviço -> início da rota
+    eh_inicio = [True] * n
+    eh_fim = [True] * n
+    demanda_rota = list(tabela.demanda)
+
+    def fusao_valida(saving):
+        _, i, j = saving
+        return (
+            eh_fim[i] and eh_inicio[j]
+            and inicio_da_rota[i] != j
+            and demanda_rota[inicio_da_rota[i]] + demanda_rota[j] <= capacidade
+        )
 
-    # Mantém um conjunto de savings ainda disponíveis para fusão
-    savings_disponiveis = savings[:]
+    # Calcula e ordena savings (maior para menor) apenas uma vez; a lista não depende da randomização e pode ser reaproveitada
+    if savings is None:
+        if top_m is None and n > LIMITE_SAVINGS_COMPLETOS:
+            top_m = TOP_M_SAVINGS
+        savings = calcular_savings(tabela, deposito, matriz_distancias, top_m=top_m)
+    savings = _iterar_savings(savings)
+
+    # Janela com os top-k savings ainda válidos; o restante é consumido da sequência já ordenada.
+    # Uma fusão inválida nunca volta a ser válida (serviços internos não voltam a ser extremidades
+    # e as demandas só crescem), então os savings inválidos são descartados de forma preguiçosa.
+    janela = []
+    while True:
+        janela = [saving for saving in janela if fusao_valida(saving)]
+        while len(janela) < k:
+            saving = next(savings, None)
+            if saving is None:
+                break
+            if fusao_valida(saving):
+                janela.append(saving)
+        if not janela:
+            break
 
-    while savings_disponiveis:
-        # Seleciona os top-k savings disponíveis (ou menos, se restarem poucos)
-        top_k = savings_disponiveis[:k]
-        saving_escolhido = random.choice(top_k)
+        # Escolhe aleatoriamente entre os top-k savings válidos
+        saving_escolhido = rng.choice(janela)
+        janela.remove(saving_escolhido)
         _, i, j = saving_escolhido
 
-        # Encontra as rotas onde estão os serviços i e j
-        idx_i = idx_j = None
-        for idx, rota in enumerate(rotas):
-            if rota and rota[0]['id_servico'] == servicos[i]['id_servico']:
-                idx_i = idx
-            if rota and rota[-1]['id_servico'] == servicos[j]['id_servico']:
-                idx_j = idx
-
-        # Só tenta fundir se as rotas são diferentes e a fusão respeita a capacidade
-        if (
-            idx_i is not None and idx_j is not None and idx_i != idx_j
-            and demandas[idx_i] + demandas[idx_j] <= capacidade
-        ):
-            # Funde as rotas
-            rotas[idx_i] = rotas[idx_i] + rotas[idx_j]
-            demandas[idx_i] += demandas[idx_j]
-            rotas[idx_j] = []
-            demandas[idx_j] = 0
-
-        # Remove o saving escolhido da lista (não tenta mais esse par)
-        savings_disponiveis.remove(saving_escolhido)
-
-    # Remove rotas vazias e sincroniza demandas
-    rotas = [r for r in rotas if r]
-    demandas = [d for r, d in zip(rotas, demandas) if r]
+        # Funde a rota que termina em i com a rota que começa em j (nessa ordem), criando a ligação i -> j
+        inicio_i = inicio_da_rota[i]
+        fim_j = fim_da_rota[j]
+        proximo[i] = j
+        eh_fim[i] = False
+        eh_inicio[j] = False
+        fim_da_rota[inicio_i] = fim_j
+        inicio_da_rota[fim_j] = inicio_i
+        demanda_rota[inicio_i] += demanda_rota[j]
+
+    # Reconstrói as rotas a partir dos inícios, na ordem dos serviços
+    rotas = []
+    demandas = []
+    for inicio in range(n):
+        if not eh_inicio[inicio]:
+            continue
+        rota = []
+        atual = inicio
+        while atual != -1:
+            rota.append(atual)
+            atual = proximo[atual]
+        rotas.append(rota)
+        demandas.append(demanda_rota[inicio])
 
     # Validação final: todos os serviços obrigatórios devem estar presentes
-    ids_esperados = set(s['id_servico'] for s in servicos)
-    ids_nas_rotas = set(serv['id_servico'] for rota in rotas for serv in rota)
-    if ids_esperados != ids_nas_rotas:
+    if set(s for rota in rotas for s in rota) != set(range(n)):
         raise Exception("Erro: serviços obrigatórios perdidos na construção GRASP!")
 
     return rotas, demandas
 
 
+def tour_gigante(tabela, deposito, matriz_distancias, k=K_TOUR_GIGANTE, rng=None, vizinhos=None):
+    """
+    1. Objetivo:
+       Constrói um tour gigante: uma única sequência com todos os serviços obrigatórios, sem considerar a capacidade.
+
+    2. Entradas:
+       - tabela: TabelaServicos com os serviços obrigatórios.
+       - deposito: índice do depósito.
+       - matriz_distancias: MatrizDistancias (usa o array denso e o índice de rótulos).
+       - k: número de candidatos mais próximos entre os quais o próximo serviço é sorteado (k = 1: vizinho mais próximo puro).
+       - rng: gerador random.Random usado no sorteio (padrão: gerador próprio com SEMENTE_PADRAO; o gerador global nunca é usado).
+       - vizinhos: VizinhancaGranular opcional, usada para achar os candidatos sem varrer todos os serviços.
+
+    3. Lógica:
+       Vizinho mais próximo randomizado: partindo do depósito, avalia cada serviço ainda não visitado nos seus sentidos possíveis
+       (distância da saída do último serviço até a entrada do candidato) e sorteia um dos k melhores pares (serviço, sentido).
+       Os candidatos vêm primeiro da lista granular do último serviço; se todos já foram visitados (ou no primeiro passo),
+       a busca varre com NumPy todos os serviços livres.
+
+    4. Contribuição:
+       Primeira etapa do construtivo "route-first, cluster-second" (seguida por split), com custo próximo de O(n·K)
+       e diversidade controlada por k e pela semente. Retorna (tour, sentidos), com os sentidos alinhados ao tour.
+    """
+    rng = rng or random.Random(SEMENTE_PADRAO)
+    n = len(tabela)
+    indice = matriz_distancias.indice
+    valores = matriz_distancias.valores
+    # Entradas dos serviços nos dois sentidos (índices da matriz); o sentido 1 só é candidato para arestas
+    entradas = np.array([[indice[v] for v in tabela.entrada[o]] for o in (0, 1)], dtype=np.int64).reshape(2, n)
+    reversivel = np.asarray(tabela.reversivel, dtype=bool)
+    livre = np.ones(n, dtype=bool)
+
+    tour, sentidos = [], []
+    ultimo = None
+    atual = deposito
+    for _ in range(n):
+        linha = matriz_distancias[atual]
+        candidatos = []
+        if vizinhos is not None and ultimo is not None:
+            for t in vizinhos.vizinhos[ultimo]:
+                if livre[t]:
+                    candidatos.append((linha[tabela.entrada[0][t]], t, 0))
+                    if reversivel[t]:
+                        candidatos.append((linha[tabela.entrada[1][t]], t, 1))
+        if candidatos:
+            candidatos.sort()
+            candidatos = candidatos[:k]
+        else:
+            # Varredura completa dos serviços livres nos dois sentidos
+            custo = np.asarray(valores[indice[atual]][entradas], dtype=np.float64)
+            custo[:, ~livre] = np.inf
+            custo[1, ~reversivel] = np.inf
+            plano = custo.ravel()
+            m = min(k, int(np.count_nonzero(np.isfinite(plano))) or 1)
+            melhores = np.argpartition(plano, m - 1)[:m]
+            melhores = melhores[np.argsort(plano[melhores], kind="stable")]
+            candidatos = [(plano[p], int(p % n), int(p // n)) for p in melhores]
+        _, s, o = rng.choice(candidatos)
+        livre[s] = False
+        tour.append(s)
+        sentidos.append(o)
+        ultimo = s
+        atual = tabela.saida[o][s]
+    return tour, sentidos
+
+
+def split(tour, sentidos, tabela, deposito, matriz_distancias, capacidade):
+    """
+    1. Objetivo:
+       Divide um tour gigante, de forma ótima, em rotas que respeitam a capacidade (algoritmo Split em tempo linear).
+
+    2. Entradas:
+       - tour: sequência de índices de serviços (tour_gigante).
+       - sentidos: sentido de travessia de cada serviço do tour.
+       - tabela: TabelaServicos com os serviços obrigatórios.
+       - deposito: índice do depósito.
+       - matriz_distancias: matriz de distâncias.
+       - capacidade: capacidade máxima do veículo.
+
+    3. Lógica:
+       Com L[t] a soma prefixa das ligações saída(t-1) -> entrada(t) do tour, a rota formada pelos serviços t = i..j-1 custa
+       d(depósito, entrada(i)) - L[i] + L[j-1] + d(saída(j-1), depósito) (o custo de serviço é constante e fica de fora).
+       O custo p[j] do melhor particionamento dos j primeiros serviços é então min f(i) + L[j-1] + d(saída(j-1), depósito),
+       com f(i) = p[i] + d(depósito, entrada(i)) - L[i] e i restrito à janela em que a demanda de i..j-1 cabe no veículo.
+       Como a demanda acumulada é crescente, a janela só avança, e uma fila dupla monótona (deque de Vidal) dá o mínimo
+       de cada janela em O(1) amortizado: O(n) no total. Um serviço cuja demanda sozinha excede a capacidade forma uma rota própria.
+       Os sentidos do tour são mantidos na divisão; a Solucao reorienta depois cada rota (o que só reduz o custo).
+
+    4. Contribuição:
+       Segunda etapa do construtivo "route-first, cluster-second": transforma qualquer permutação dos serviços na melhor
+       solução compatível com ela. Retorna (rotas, demandas).
+    """
+    n = len(tour)
+    entrada = [tabela.entrada[o][s] for s, o in zip(tour, sentidos)]
+    saida = [tabela.saida[o][s] for s, o in zip(tour, sentidos)]
+    linha_deposito = matriz_distancias[deposito]
+
+    # Somas prefixas das ligações internas (L) e das demandas (Q)
+    L = [0] * n
+    for t in range(1, n):
+        L[t] = L[t - 1] + matriz_distancias[saida[t - 1]][entrada[t]]
+    Q = [0] * (n + 1)
+    for t, s in enumerate(tour):
+        Q[t + 1] = Q[t] + tabela.demanda[s]
+
+    p = [0] * (n + 1)
+    antecessor = [0] * (n + 1)
+    f = [0] * n
+    fila = collections.deque()
+    inicio_janela = 0
+    for j in range(1, n + 1):
+        # O início i = j - 1 (rota só com o serviço j - 1) entra na fila, descartando os dominados
+        i = j - 1
+        f[i] = p[i] + linha_deposito[entrada[i]] - L[i]
+        while fila and f[fila[-1]] >= f[i]:
+            fila.pop()
+        fila.append(i)
+        # Avança a janela até que a demanda de i..j-1 caiba no veículo (a rota unitária é sempre aceita)
+        while inicio_janela < i and Q[j] - Q[inicio_janela] > capacidade:
+            inicio_janela += 1
+        while fila[0] < inicio_janela:
+            fila.popleft()
+        melhor = fila[0]
+        p[j] = f[melhor] + L[j - 1] + matriz_distancias[saida[j - 1]][deposito]
+        antecessor[j] = melhor
+
+    # Reconstrói as rotas a partir do fim do tour
+    rotas, demandas = [], []
+    j = n
+    while j > 0:
+        i = antecessor[j]
+        rotas.append(tour[i:j])
+        demandas.append(Q[j] - Q[i])
+        j = i
+    rotas.reverse()
+    demandas.reverse()
+    return rotas, demandas
+
+
 
-def relocate(rotas, demandas, capacidade, matriz_distancias, deposito):
+def relocate(solucao, vizinhos=None, prazo=None):
     """
     1. Objetivo:
        Melhora a solução atual movendo serviços de uma rota para outra, se isso reduzir o custo total e respeitar a capacidade.
 
     2. Entradas:
-       - rotas: lista de rotas (cada rota é uma lista de serviços).
-       - demandas: lista de demandas de cada rota.
-       - capacidade: capacidade máxima do veículo.
-       - matriz_distancias: matriz de distâncias.
-       - deposito: índice do depósito.
+       - solucao: Solucao a ser melhorada (alterada no lugar).
+       - vizinhos: VizinhancaGranular opcional; se informada, só avalia inserções ao lado de vizinhos do serviço.
+       - prazo: Prazo opcional; quando esgotado, a busca para e devolve a solução corrente.
 
     3. Lógica:
-       Para cada serviço em cada rota, tenta movê-lo para outra rota se isso não violar a capacidade e reduzir o custo total.
-       Repete até não haver mais melhorias.
+       Para cada serviço, calcula em O(1) o ganho de removê-lo da rota atual (apenas os vizinhos anterior e seguinte mudam)
+       e o custo de inseri-lo em cada posição candidata de cada outra rota com capacidade disponível (apenas os dois vizinhos da posição mudam),
+       no melhor sentido de travessia (arestas nos dois sentidos). As ligações usam a saída do serviço anterior e a entrada do seguinte.
+       O custo de serviço se cancela entre remoção e inserção, então só as distâncias entram no delta.
+       Com os demais sentidos fixos, o delta é um limite superior: a reorientação das rotas após o movimento só pode reduzi-lo.
+       Sem vizinhança granular, as candidatas são todas as posições; com ela, são as posições imediatamente antes e depois
+       de cada vizinho do serviço (localizado pelo índice de posições da solução) e, se o depósito for vizinho, o início e o fim das rotas.
+       A melhor inserção é aplicada no lugar (Solucao.mover), e somente se reduzir o custo total. Repete até não haver mais melhorias.
 
     4. Contribuição:
        Refina a solução inicial, reduzindo o custo total e melhorando a distribuição dos serviços entre as rotas.
     """
+    rotas = solucao.rotas
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+    entrada, saida = solucao.entrada, solucao.saida
+    demandas = solucao.demanda
+    matriz_distancias = solucao.matriz_distancias
+    deposito = solucao.deposito
+    tabela = solucao.tabela
+    demanda_servico = tabela.demanda
+
+    def candidatas(serv, i):
+        # Pares (rota, posição de inserção) avaliados para o serviço
+        if vizinhos is None:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield from ((j, pos) for pos in range(len(rotas[j]) + 1))
+            return
+        for t in vizinhos.vizinhos[serv]:
+            j = rota_de[t]
+            if j != i:
+                yield j, posicao[t]
+                yield j, posicao[t] + 1
+        if vizinhos.perto_deposito[serv]:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield j, 0
+                    yield j, len(rotas[j])
+
     melhorou = True
     while melhorou:
         melhorou = False
         for i in range(len(rotas)):
-            for j in range(len(rotas)):
-                if i == j or not rotas[i]:
-                    continue
-                for idx, serv in enumerate(rotas[i]):
-                    if demandas[j] + serv['demanda'] <= capacidade:
-                        nova_rota_i = rotas[i][:idx] + rotas[i][idx+1:]
-                        nova_rota_j = rotas[j] + [serv]
-                        if not nova_rota_i:
-                            continue
-                        custo_antigo = rota_custo(rotas[i], matriz_distancias, deposito) + rota_custo(rotas[j], matriz_distancias, deposito)
-                        custo_novo = rota_custo(nova_rota_i, matriz_distancias, deposito) + rota_custo(nova_rota_j, matriz_distancias, deposito)
-                        if custo_novo < custo_antigo:
-                            rotas[i] = nova_rota_i
-                            rotas[j] = nova_rota_j
-                            demandas[i] -= serv['demanda']
-                            demandas[j] += serv['demanda']
-                            melhorou = True
-                            break
-                if melhorou:
+            idx = 0
+            while idx < len(rotas[i]):
+                if prazo is not None and prazo.esgotado():
+                    melhorou = False
                     break
-            if melhorou:
+                rota_i = rotas[i]
+                if len(rota_i) < 2:
+                    break  # Não esvazia rotas
+                serv = rota_i[idx]
+                anterior = saida[rota_i[idx - 1]] if idx > 0 else deposito
+                proximo = entrada[rota_i[idx + 1]] if idx + 1 < len(rota_i) else deposito
+                ganho_remocao = (
+                    matriz_distancias[anterior][entrada[serv]] + matriz_distancias[saida[serv]][proximo]
+                    - matriz_distancias[anterior][proximo]
+                )
+
+                # Procura a melhor posição de inserção nas outras rotas, com o serviço no melhor sentido
+                sentidos = [(tabela.entrada[0][serv], matriz_distancias[tabela.saida[0][serv]])]
+                if tabela.reversivel[serv]:
+                    sentidos.append((tabela.entrada[1][serv], matriz_distancias[tabela.saida[1][serv]]))
+                folga = solucao.capacidade - demanda_servico[serv]
+                melhor_delta = 0
+                melhor_j = melhor_pos = None
+                for j, pos in candidatas(serv, i):
+                    if demandas[j] > folga:
+                        continue
+                    rota_j = rotas[j]
+                    a = saida[rota_j[pos - 1]] if pos > 0 else deposito
+                    b = entrada[rota_j[pos]] if pos < len(rota_j) else deposito
+                    linha_a = matriz_distancias[a]
+                    base = linha_a[b] + ganho_remocao
+                    for e, linha_x in sentidos:
+                        delta = linha_a[e] + linha_x[b] - base
+                        if delta < melhor_delta:
+                            melhor_delta, melhor_j, melhor_pos = delta, j, pos
+
+                if melhor_j is None:
+                    idx += 1
+                    continue
+
+                # Aplica o movimento no lugar
+                solucao.mover(serv, melhor_j, melhor_pos)
+                melhorou = True
+            if prazo is not None and prazo.esgotado():
                 break
-    rotas = [r for r in rotas if r]
-    demandas = [d for r, d in zip(rotas, demandas) if r]
-    return rotas, demandas
+    solucao.remover_vazias()
+    return solucao
 
 
 
-def two_opt(rota, matriz_distancias, deposito):
+class VizinhancaGranular:
     """
     1. Objetivo:
-       Otimiza a ordem dos serviços em uma única rota, tentando todas as inversões possíveis de segmentos (2-opt), buscando reduzir o custo.
+       Índice dos K serviços mais próximos de cada serviço (vizinhanças granulares), calculado uma vez por instância
+       e compartilhado por todas as buscas locais (relocate, troca, 2-opt*, CROSS-exchange, Or-opt, two_opt, segment_relocate).
 
     2. Entradas:
-       - rota: lista de serviços (na ordem atual).
-       - matriz_distancias: matriz de distâncias.
+       - tabela: TabelaServicos com os serviços obrigatórios.
        - deposito: índice do depósito.
+       - matriz_distancias: MatrizDistancias (usa o array denso e o índice de rótulos).
+       - k: tamanho de cada lista de vizinhos.
 
     3. Lógica:
-       Para cada par de posições, inverte o segmento intermediário e aceita a inversão se reduzir o custo da rota.
-       Repete até não haver mais melhorias.
+       A proximidade entre dois serviços é a menor distância, em qualquer sentido, entre uma extremidade (origem/destino) de um
+       e uma extremidade do outro; o depósito entra como um elemento extra (índice len(tabela)). A matriz de proximidade é
+       calculada com NumPy em blocos de linhas e np.argpartition seleciona os k mais próximos de cada elemento.
+       Guarda:
+         - vizinhos[s]: os serviços entre os k mais próximos de s, do mais próximo ao mais distante;
+         - perto_deposito[s]: 1 se s e o depósito são vizinhos (em qualquer das duas listas);
+         - proximo: matriz booleana (n+1) x (n+1), simétrica, que indica se dois elementos são vizinhos, para as máscaras vetorizadas.
+
+    4. Contribuição:
+       As buscas locais passam a avaliar apenas movimentos que colocam um serviço ao lado de um de seus vizinhos,
+       descartando a maioria dos pares (distantes) que nunca melhoram a solução.
+    """
+
+    def __init__(self, tabela, deposito, matriz_distancias, k=K_VIZINHOS):
+        n = len(tabela)
+        indice = matriz_distancias.indice
+        valores = matriz_distancias.valores
+        no_deposito = indice[deposito]
+        extremos = np.array(
+            [[indice[v] for v in tabela.origem] + [no_deposito], [indice[v] for v in tabela.destino] + [no_deposito]],
+            dtype=np.int64
+        )
+        total = n + 1
+        k = min(k, total - 1)
+
+        self.k = k
+        self.proximo = np.zeros((total, total), dtype=bool)
+        listas = []
+        if k > 0:
+            bloco = max(1, (1 << 22) // total)
+            for inicio in range(0, total, bloco):
+                linhas = np.arange(inicio, min(total, inicio + bloco))
+                distancia = np.full((len(linhas), total), np.inf)
+                for a in extremos[:, linhas]:
+                    for b in extremos:
+                        np.minimum(distancia, np.asarray(valores[np.ix_(a, b)], dtype=np.float64), out=distancia)
+                        np.minimum(distancia, np.asarray(valores[np.ix_(b, a)], dtype=np.float64).T, out=distancia)
+                distancia[np.arange(len(linhas)), linhas] = np.inf
+                mais_proximos = np.argpartition(distancia, k - 1, axis=1)[:, :k]
+                ordem = np.argsort(np.take_along_axis(distancia, mais_proximos, axis=1), axis=1, kind="stable")
+                mais_proximos = np.take_along_axis(mais_proximos, ordem, axis=1)
+                self.proximo[linhas[:, None], mais_proximos] = True
+                listas.extend(mais_proximos.tolist())
+        self.proximo |= self.proximo.T
+
+        self.vizinhos = [[t for t in lista if t != n] for lista in listas[:n]] if k > 0 else [[] for _ in range(n)]
+        self.perto_deposito = bytearray(self.proximo[n, :n].tolist())
+
+
+def two_opt(solucao, i, vizinhos=None, prazo=None):
+    """
+    1. Objetivo:
+       Otimiza a ordem dos serviços em uma única rota, tentando inversões de segmentos (2-opt), buscando reduzir o custo.
+
+    2. Entradas:
+       - solucao: Solucao que contém a rota (alterada no lugar).
+       - i: índice da rota a otimizar.
+       - vizinhos: VizinhancaGranular para podar candidatos; se None, avalia todos os pares.
+       - prazo: Prazo opcional; quando esgotado, devolve a solução corrente.
+
+    3. Lógica:
+       Inverter o segmento de a a b troca as ligações (anterior -> x_a) e (x_b -> seguinte) por (anterior -> x_b) e (x_a -> seguinte)
+       e, como a matriz é assimétrica (arcos), também troca o sentido de todas as ligações internas do segmento.
+       As arestas do segmento passam a ser percorridas no sentido oposto (entrada e saída trocadas); vértices e arcos mantêm o seu.
+       Somas prefixas das ligações internas nos dois sentidos tornam o delta de cada movimento O(1).
+       Com a vizinhança granular, só são avaliados segmentos cuja nova ligação de entrada ou de saída une serviços vizinhos
+       (ou um serviço e o depósito vizinho), localizados pelo índice de posições da solução.
+       Aplica cada inversão que reduz o custo (Solucao.inverter, que reescolhe os sentidos da rota) e repete até convergir.
 
     4. Contribuição:
        Reduz o custo de cada rota individualmente, melhorando a eficiência do trajeto do veículo.
     """
-    if len(rota) < 3:
-        return rota
+    rota = solucao.rotas[i]
+    n = len(rota)
+    if n < 2:
+        return solucao
+    matriz_distancias = solucao.matriz_distancias
+    deposito = solucao.deposito
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+    entrada, saida = solucao.entrada, solucao.saida
+    reversivel = solucao.tabela.reversivel
+
+    def preparar():
+        # Nós de entrada/saída no sentido atual (x_in, x_out) e no sentido invertido (arestas trocam as pontas)
+        x_in = [entrada[s] for s in rota]
+        x_out = [saida[s] for s in rota]
+        inv_in = [saida[s] if reversivel[s] else entrada[s] for s in rota]
+        inv_out = [entrada[s] if reversivel[s] else saida[s] for s in rota]
+        # Somas prefixas das ligações internas no sentido original (ida) e invertido (volta)
+        ida = [0] * n
+        volta = [0] * n
+        for t in range(n - 1):
+            ida[t + 1] = ida[t] + matriz_distancias[x_out[t]][x_in[t + 1]]
+            volta[t + 1] = volta[t] + matriz_distancias[inv_out[t + 1]][inv_in[t]]
+        return x_in, x_out, inv_in, inv_out, ida, volta
+
+    def posicao_na_rota(t):
+        return posicao[t] if rota_de[t] == i else -1
+
     melhorou = True
-    melhor_rota = rota[:]
     while melhorou:
         melhorou = False
-        for i in range(1, len(melhor_rota) - 1):
-            for j in range(i + 1, len(melhor_rota)):
-                nova_rota = melhor_rota[:i] + melhor_rota[i:j][::-1] + melhor_rota[j:]
-                if rota_custo(nova_rota, matriz_distancias, deposito) < rota_custo(melhor_rota, matriz_distancias, deposito):
-                    melhor_rota = nova_rota
-                    melhorou = True
-        if melhorou:
-            break
-    return melhor_rota
+        x_in, x_out, inv_in, inv_out, ida, volta = preparar()
+        a = 0
+        while a < n - 1:
+            if prazo is not None and prazo.esgotado():
+                return solucao
+            anterior = x_out[a - 1] if a > 0 else deposito
+            linha_anterior = matriz_distancias[anterior]
+            linha_xa = matriz_distancias[inv_out[a]]
+            custo_entrada = linha_anterior[x_in[a]]
+
+            if vizinhos is None:
+                candidatos = range(a + 1, n)
+            else:
+                # Nova ligação de entrada (anterior -> x_b) ou de saída (x_a -> x_{b+1} / depósito) entre vizinhos
+                candidatos = set()
+                if a > 0:
+                    for t in vizinhos.vizinhos[rota[a - 1]]:
+                        p = posicao_na_rota(t)
+                        if p > a:
+                            candidatos.add(p)
+                else:
+                    candidatos.update(p for p in range(a + 1, n) if vizinhos.perto_deposito[rota[p]])
+                for t in vizinhos.vizinhos[rota[a]]:
+                    p = posicao_na_rota(t) - 1
+                    if p > a:
+                        candidatos.add(p)
+                if vizinhos.perto_deposito[rota[a]]:
+                    candidatos.add(n - 1)
+                candidatos = sorted(candidatos)
+
+            aplicado = False
+            for b in candidatos:
+                seguinte = x_in[b + 1] if b + 1 < n else deposito
+                delta = (
+                    linha_anterior[inv_in[b]] + (volta[b] - volta[a]) + linha_xa[seguinte]
+                    - custo_entrada - (ida[b] - ida[a]) - matriz_distancias[x_out[b]][seguinte]
+                )
+                if delta < 0:
+                    # Aplica a inversão (a rota é reorientada, o que só pode reduzir o custo estimado) e continua a partir da mesma posição
+                    solucao.inverter(i, a, b)
+                    x_in, x_out, inv_in, inv_out, ida, volta = preparar()
+                    melhorou = aplicado = True
+                    break
+            if not aplicado:
+                a += 1
+    return solucao
 
 
-def vnd(rotas, demandas, capacidade, matriz_distancias, deposito):
+def or_opt(solucao, i, vizinhos=None, prazo=None, max_cadeia=MAX_CADEIA_OR_OPT):
     """
     1. Objetivo:
-       Aplica a metaheurística VND (Variable Neighborhood Descent) para refinar a solução, combinando relocate e 2-opt.
+       Otimiza a ordem dos serviços em uma única rota movendo cadeias de 1 a max_cadeia serviços consecutivos para outra posição da mesma rota (Or-opt).
 
     2. Entradas:
-       - rotas: lista de rotas.
-       - demandas: lista de demandas.
-       - capacidade: capacidade máxima do veículo.
-       - matriz_distancias: matriz de distâncias.
-       - deposito: índice do depósito.
+       - solucao: Solucao que contém a rota (alterada no lugar).
+       - i: índice da rota a otimizar.
+       - vizinhos: VizinhancaGranular para podar candidatos; se None, avalia todas as posições.
+       - prazo: Prazo opcional; quando esgotado, devolve a solução corrente.
+       - max_cadeia: comprimento máximo das cadeias.
 
     3. Lógica:
-       Primeiro aplica relocate para mover serviços entre rotas, depois aplica 2-opt para otimizar a ordem dos serviços em cada rota.
+       A cadeia mantém a ordem e os sentidos dos seus serviços, então, ao contrário do 2-opt, nenhuma ligação interna muda de sentido
+       (o que importa com a matriz assimétrica): retirar a cadeia troca as ligações anterior -> cadeia -> seguinte por anterior -> seguinte,
+       e inseri-la entre p e q troca p -> q por p -> cadeia -> q, ambos em O(1).
+       Com a vizinhança granular, a cadeia só é levada para logo após um vizinho do seu primeiro serviço ou logo antes de um vizinho
+       do último (e para as pontas da rota, se o depósito for vizinho), localizados pelo índice de posições da solução.
+       Para cada início de cadeia, aplica o melhor movimento que reduz o custo (Solucao.mover_segmento na própria rota) e repete até convergir.
+
+    4. Contribuição:
+       Melhora barata e eficaz dentro das rotas, complementando o 2-opt sem inverter trechos.
+    """
+    rota = solucao.rotas[i]
+    if len(rota) < 2:
+        return solucao
+    matriz_distancias = solucao.matriz_distancias
+    deposito = solucao.deposito
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+    entrada, saida = solucao.entrada, solucao.saida
+
+    def lacunas_vizinhas(s, deslocamento, ponta):
+        # Lacunas g (entre rota[g - 1] e rota[g]) ao lado dos vizinhos de s na rota: após o vizinho (deslocamento 1) ou antes dele (0);
+        # ponta é a lacuna incluída quando o depósito é vizinho de s
+        lacunas = {posicao[t] + deslocamento for t in vizinhos.vizinhos[s] if rota_de[t] == i}
+        if vizinhos.perto_deposito[s]:
+            lacunas.add(ponta)
+        return lacunas
+
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        a = 0
+        while a < len(rota):
+            if prazo is not None and prazo.esgotado():
+                return solucao
+            n = len(rota)
+            anterior = saida[rota[a - 1]] if a > 0 else deposito
+            linha_anterior = matriz_distancias[anterior]
+            entrada_cadeia = entrada[rota[a]]
+            apos_inicio = range(n + 1) if vizinhos is None else lacunas_vizinhas(rota[a], 1, 0)
+            melhor_delta = 0
+            melhor = None
+            for b in range(a, min(n, a + max_cadeia)):
+                if b - a + 1 == n:
+                    break  # A cadeia é a rota inteira
+                saida_cadeia = saida[rota[b]]
+                linha_cadeia = matriz_distancias[saida_cadeia]
+                seguinte = entrada[rota[b + 1]] if b + 1 < n else deposito
+                ganho_remocao = linha_anterior[entrada_cadeia] + linha_cadeia[seguinte] - linha_anterior[seguinte]
+                lacunas = apos_inicio if vizinhos is None else apos_inicio | lacunas_vizinhas(rota[b], 0, n)
+                for g in lacunas:
+                    if a <= g <= b + 1:
+                        continue  # Dentro da própria cadeia ou nas suas pontas (sem efeito)
+                    p = saida[rota[g - 1]] if g > 0 else deposito
+                    q = entrada[rota[g]] if g < n else deposito
+                    linha_p = matriz_distancias[p]
+                    delta = linha_p[entrada_cadeia] + linha_cadeia[q] - linha_p[q] - ganho_remocao
+                    if delta < melhor_delta:
+                        melhor_delta, melhor = delta, (b, g)
+            if melhor is None:
+                a += 1
+                continue
+            # Aplica o movimento (a rota é reorientada, o que só pode reduzir o custo estimado) e continua a partir da mesma posição
+            b, g = melhor
+            solucao.mover_segmento(i, a, b, i, g if g < a else g - (b - a + 1))
+            melhorou = True
+    return solucao
+
+
+def _trocar_blocos(solucao, vizinhos, prazo, max_bloco, unitaria):
+    # Núcleo comum de troca (1-1) e cross_exchange: troca, entre rotas distintas, um bloco que começa no serviço u
+    # por um bloco da outra rota, escolhendo para cada u a melhor troca candidata (unitaria: só blocos de 1 serviço)
+    rotas = solucao.rotas
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+    entrada, saida = solucao.entrada, solucao.saida
+    demandas = solucao.demanda
+    capacidade = solucao.capacidade
+    matriz_distancias = solucao.matriz_distancias
+    deposito = solucao.deposito
+    tabela = solucao.tabela
+    demanda_servico = tabela.demanda
+
+    cache_blocos = {}
+
+    def blocos(j, inicio):
+        # Blocos que começam em rotas[j][inicio]: (tamanho, carga, sentidos possíveis (entrada, linha da saída), seguinte, custo atual das pontas),
+        # com a linha da matriz do nó anterior. Guardados em cache até o próximo movimento aplicado
+        chave = (j, inicio)
+        if chave in cache_blocos:
+            return cache_blocos[chave]
+        rota = rotas[j]
+        n = len(rota)
+        anterior = saida[rota[inicio - 1]] if inicio > 0 else deposito
+        linha_anterior = matriz_distancias[anterior]
+        s = rota[inicio]
+        lista = []
+        carga = 0
+        for fim in range(inicio, min(n, inicio + max_bloco)):
+            carga += demanda_servico[rota[fim]]
+            seguinte = entrada[rota[fim + 1]] if fim + 1 < n else deposito
+            linha_saida = matriz_distancias[saida[rota[fim]]]
+            atual = linha_anterior[entrada[s]] + linha_saida[seguinte]
+            if fim == inicio and tabela.reversivel[s]:
+                # Um serviço isolado pode trocar de sentido
+                sentidos = tuple((tabela.entrada[o][s], matriz_distancias[tabela.saida[o][s]]) for o in (0, 1))
+            else:
+                sentidos = ((entrada[s], linha_saida),)
+            lista.append((fim - inicio + 1, carga, sentidos, seguinte, atual))
+            if unitaria:
+                break
+        cache_blocos[chave] = linha_anterior, lista
+        return linha_anterior, lista
+
+    def ligar(linha_anterior, sentidos, seguinte):
+        # Menor custo das ligações anterior -> bloco -> seguinte entre os sentidos possíveis do bloco
+        e, linha_x = sentidos[0]
+        custo = linha_anterior[e] + linha_x[seguinte]
+        if len(sentidos) > 1:
+            e, linha_x = sentidos[1]
+            custo = min(custo, linha_anterior[e] + linha_x[seguinte])
+        return custo
+
+    def candidatas(u, i):
+        # Pares (rota, início do bloco) da outra rota: o bloco de u passa a seguir um vizinho v (e, na troca 1-1, ocupa o lugar de v)
+        if vizinhos is None:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield from ((j, b) for b in range(len(rotas[j])))
+            return
+        for v in vizinhos.vizinhos[u]:
+            j = rota_de[v]
+            if j != i:
+                yield j, posicao[v] + 1
+                if unitaria:
+                    yield j, posicao[v]
+        if vizinhos.perto_deposito[u]:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield j, 0
+
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for u in range(len(tabela)):
+            if prazo is not None and prazo.esgotado():
+                return solucao
+            i = rota_de[u]
+            a = posicao[u]
+            anterior_i, blocos_i = blocos(i, a)
+            livre_i = capacidade - demandas[i]
+            melhor_delta = 0
+            melhor = None
+            for j, b in candidatas(u, i):
+                if b >= len(rotas[j]):
+                    continue
+                anterior_j, blocos_j = blocos(j, b)
+                livre_j = capacidade - demandas[j]
+                for tam_i, carga_i, sentidos_i, seguinte_i, atual_i in blocos_i:
+                    for tam_j, carga_j, sentidos_j, seguinte_j, atual_j in blocos_j:
+                        if not unitaria and tam_i == tam_j == 1:
+                            continue  # Troca 1-1, coberta pela vizinhança troca
+                        if carga_j - carga_i > livre_i or carga_i - carga_j > livre_j:
+                            continue
+                        # As ligações são não negativas: se o bloco de j já não cabe no orçamento, o de i nem é avaliado
+                        limite = atual_i + atual_j + melhor_delta
+                        novo = ligar(anterior_i, sentidos_j, seguinte_i)
+                        if novo >= limite:
+                            continue
+                        novo += ligar(anterior_j, sentidos_i, seguinte_j)
+                        if novo < limite:
+                            melhor_delta, melhor = novo - atual_i - atual_j, (i, a, tam_i, j, b, tam_j)
+            if melhor is not None:
+                solucao.trocar_segmentos(*melhor)
+                cache_blocos.clear()
+                melhorou = True
+    return solucao
+
+
+def troca(solucao, vizinhos=None, prazo=None):
+    """
+    1. Objetivo:
+       Melhora a solução trocando de lugar dois serviços de rotas diferentes (swap 1-1).
+
+    2. Entradas:
+       - solucao: Solucao a ser melhorada (alterada no lugar).
+       - vizinhos: VizinhancaGranular opcional; se informada, só avalia trocas que colocam o serviço no lugar de um vizinho ou logo após ele.
+       - prazo: Prazo opcional; quando esgotado, a busca para e devolve a solução corrente.
+
+    3. Lógica:
+       Cada serviço ocupa o lugar do outro, no melhor sentido de travessia; só as quatro ligações em volta dos dois serviços mudam,
+       então o delta é O(1), e a capacidade é conferida com as demandas por rota guardadas na solução.
+       Para cada serviço, aplica a melhor troca candidata que reduz o custo (Solucao.trocar_segmentos) e repete até convergir.
+
+    4. Contribuição:
+       Alcança soluções que o relocate não alcança quando as rotas estão cheias: a troca mantém a carga das duas rotas quase igual.
+    """
+    return _trocar_blocos(solucao, vizinhos, prazo, 1, True)
+
+
+def cross_exchange(solucao, vizinhos=None, prazo=None, max_bloco=MAX_BLOCO_CROSS):
+    """
+    1. Objetivo:
+       Melhora a solução trocando blocos de serviços consecutivos entre duas rotas (CROSS-exchange).
+
+    2. Entradas:
+       - solucao: Solucao a ser melhorada (alterada no lugar).
+       - vizinhos: VizinhancaGranular opcional; se informada, o bloco de cada serviço só é levado para logo após um de seus vizinhos.
+       - prazo: Prazo opcional; quando esgotado, a busca para e devolve a solução corrente.
+       - max_bloco: comprimento máximo de cada bloco.
+
+    3. Lógica:
+       Os blocos mantêm a ordem e os sentidos dos serviços (um bloco de um só serviço pode inverter uma aresta), então apenas as
+       quatro ligações das pontas mudam e o delta é O(1); as cargas dos blocos são acumuladas à medida que eles crescem.
+       As trocas 1-1 ficam para a vizinhança troca. Como nas demais buscas, o delta é um limite superior: as rotas afetadas
+       são reorientadas após o movimento. Para cada serviço, aplica a melhor troca candidata e repete até convergir.
+
+    4. Contribuição:
+       Generaliza a troca e o relocate de blocos, redistribuindo trechos inteiros entre rotas com a carga quase inalterada.
+    """
+    return _trocar_blocos(solucao, vizinhos, prazo, max_bloco, False)
+
+
+def two_opt_estrela(solucao, vizinhos=None, prazo=None):
+    """
+    1. Objetivo:
+       Melhora a solução trocando as caudas de duas rotas (2-opt*): a rota i passa a terminar com o final da rota j e vice-versa.
+
+    2. Entradas:
+       - solucao: Solucao a ser melhorada (alterada no lugar).
+       - vizinhos: VizinhancaGranular opcional; se informada, só avalia as trocas que criam a ligação u -> v entre vizinhos (ou u -> depósito).
+       - prazo: Prazo opcional; quando esgotado, a busca para e devolve a solução corrente.
+
+    3. Lógica:
+       Cortar a rota i após u e a rota j antes de v troca as ligações u -> (seguinte de u) e (anterior de v) -> v por u -> v
+       e (anterior de v) -> (seguinte de u); as caudas mantêm a ordem e os sentidos, então o delta é O(1).
+       A capacidade é conferida com as demandas prefixas de cada rota, guardadas em cache e recalculadas só para as rotas alteradas.
+       Para cada serviço, aplica a melhor troca candidata que reduz o custo (Solucao.trocar_caudas) e repete até convergir.
+
+    4. Contribuição:
+       Reconecta rotas que se cruzam e troca cargas grandes de uma vez, o que o relocate não consegue em instâncias com capacidade apertada.
+    """
+    rotas = solucao.rotas
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+    entrada, saida = solucao.entrada, solucao.saida
+    demandas = solucao.demanda
+    capacidade = solucao.capacidade
+    matriz_distancias = solucao.matriz_distancias
+    deposito = solucao.deposito
+    demanda_servico = solucao.tabela.demanda
+    cargas = {}
+
+    def carga_prefixa(j):
+        # Demandas acumuladas da rota j (cargas[j][q] = demanda dos q primeiros serviços)
+        if j not in cargas:
+            acumulada = [0]
+            for s in rotas[j]:
+                acumulada.append(acumulada[-1] + demanda_servico[s])
+            cargas[j] = acumulada
+        return cargas[j]
+
+    def candidatas(u, i):
+        # Pares (rota j, corte q): a cauda de j começa na posição q
+        if vizinhos is None:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield from ((j, q) for q in range(len(rotas[j]) + 1))
+            return
+        for v in vizinhos.vizinhos[u]:
+            j = rota_de[v]
+            if j != i:
+                yield j, posicao[v]
+        if vizinhos.perto_deposito[u]:
+            for j in range(len(rotas)):
+                if j != i:
+                    yield j, len(rotas[j])
+
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for u in range(len(demanda_servico)):
+            if prazo is not None and prazo.esgotado():
+                return solucao
+            i = rota_de[u]
+            rota_i = rotas[i]
+            p = posicao[u] + 1
+            linha_u = matriz_distancias[saida[u]]
+            seguinte = entrada[rota_i[p]] if p < len(rota_i) else deposito
+            prefixo_i = carga_prefixa(i)[p]
+            resto_i = demandas[i] - prefixo_i
+            melhor_delta = 0
+            melhor = None
+            for j, q in candidatas(u, i):
+                prefixo_j = carga_prefixa(j)[q]
+                if prefixo_i + demandas[j] - prefixo_j > capacidade or prefixo_j + resto_i > capacidade:
+                    continue
+                rota_j = rotas[j]
+                anterior = saida[rota_j[q - 1]] if q > 0 else deposito
+                v = entrada[rota_j[q]] if q < len(rota_j) else deposito
+                linha_anterior = matriz_distancias[anterior]
+                delta = linha_u[v] + linha_anterior[seguinte] - linha_u[seguinte] - linha_anterior[v]
+                if delta < melhor_delta:
+                    melhor_delta, melhor = delta, (i, p, j, q)
+            if melhor is not None:
+                solucao.trocar_caudas(*melhor)
+                cargas.pop(melhor[0], None)
+                cargas.pop(melhor[2], None)
+                melhorou = True
+    return solucao
+
+
+def vnd(solucao, vizinhos=None, prazo=None):
+    """
+    1. Objetivo:
+       Aplica a metaheurística VND (Variable Neighborhood Descent) para refinar a solução, percorrendo as vizinhanças entre rotas e dentro das rotas.
+
+    2. Entradas:
+       - solucao: Solucao a ser refinada (alterada no lugar).
+       - vizinhos: VizinhancaGranular compartilhada pelas buscas locais (opcional).
+       - prazo: Prazo opcional repassado às buscas locais.
+
+    3. Lógica:
+       As vizinhanças são, em ordem: relocate, troca (1-1), 2-opt*, CROSS-exchange e, em cada rota, Or-opt e 2-opt. Cada uma é levada até o seu ótimo local;
+       se ela reduziu o custo total, a descida recomeça da primeira vizinhança, senão passa para a seguinte. Termina quando nenhuma
+       vizinhança melhora a solução (ótimo local de todas) ou o prazo se esgota. Todas usam a mesma vizinhança granular
+       (calculada aqui se não for informada) e deltas O(1) sobre as entradas/saídas e as demandas por rota guardadas na Solucao.
 
     4. Contribuição:
        Refina significativamente a solução inicial, explorando diferentes vizinhanças para encontrar soluções de menor custo.
     """
-    rotas, demandas = relocate(rotas, demandas, capacidade, matriz_distancias, deposito)
-    for i in range(len(rotas)):
-        rotas[i] = two_opt(rotas[i], matriz_distancias, deposito)
-    return rotas, demandas
+    if vizinhos is None:
+        vizinhos = VizinhancaGranular(solucao.tabela, solucao.deposito, solucao.matriz_distancias)
+
+    def or_opt_rotas(solucao, vizinhos, prazo):
+        for i in range(len(solucao.rotas)):
+            or_opt(solucao, i, vizinhos, prazo)
+
+    def two_opt_rotas(solucao, vizinhos, prazo):
+        for i in range(len(solucao.rotas)):
+            two_opt(solucao, i, vizinhos, prazo)
+
+    vizinhancas = (relocate, troca, two_opt_estrela, cross_exchange, or_opt_rotas, two_opt_rotas)
+    k = 0
+    while k < len(vizinhancas):
+        if prazo is not None and prazo.esgotado():
+            break
+        custo = solucao.custo_total()
+        vizinhancas[k](solucao, vizinhos, prazo)
+        # A primeira vizinhança já está no seu ótimo local; após uma melhora nela, segue para a próxima
+        k = 0 if k > 0 and solucao.custo_total() < custo else k + 1
+    solucao.remover_vazias()
+    return solucao
+
+
+def perturbar(solucao, rng, forca=FORCA_PERTURBACAO, max_segmento=MAX_SEGMENTO_PERTURBACAO, vizinhos=None):
+    """
+    1. Objetivo:
+       Perturba a solução com remoções e reinserções aleatórias de segmentos, para escapar do ótimo local atual.
+
+    2. Entradas:
+       - solucao: Solucao a perturbar (alterada no lugar).
+       - rng: random.Random.
+       - forca: número de segmentos movidos.
+       - max_segmento: comprimento máximo de cada segmento.
+       - vizinhos: VizinhancaGranular opcional; se informada, o segmento é reinserido perto de um vizinho do seu primeiro serviço.
+
+    3. Lógica:
+       Em cada passo sorteia uma rota, um segmento de 1 a max_segmento serviços e uma posição em outra rota com capacidade
+       para recebê-lo: logo após um vizinho granular do primeiro serviço do segmento ou, sem vizinhança, uma posição qualquer.
+       O movimento é aplicado com Solucao.mover_segmento (que atualiza custos e sentidos só das duas rotas).
+       Passos sem destino viável são ignorados.
+
+    4. Contribuição:
+       Gera, a custo O(forca · tamanho das rotas), um novo ponto de partida próximo da solução atual para a busca local iterada.
+    """
+    demanda_servico = solucao.tabela.demanda
+    for _ in range(forca):
+        ocupadas = [j for j, rota in enumerate(solucao.rotas) if rota]
+        if len(ocupadas) < 2:
+            return solucao
+        i = rng.choice(ocupadas)
+        rota_i = solucao.rotas[i]
+        comprimento = rng.randint(1, min(max_segmento, len(rota_i)))
+        a = rng.randrange(len(rota_i) - comprimento + 1)
+        b = a + comprimento - 1
+        demanda_bloco = sum(demanda_servico[s] for s in rota_i[a:b + 1])
+        if vizinhos is not None:
+            # Reinsere o segmento logo após um vizinho granular do seu primeiro serviço (em outra rota, com capacidade)
+            destinos = [
+                (solucao.rota_de[t], solucao.posicao[t] + 1) for t in vizinhos.vizinhos[rota_i[a]]
+                if solucao.rota_de[t] != i and solucao.demanda[solucao.rota_de[t]] + demanda_bloco <= solucao.capacidade
+            ]
+            if not destinos:
+                continue
+            j, pos = rng.choice(destinos)
+        else:
+            destinos = [j for j in ocupadas if j != i and solucao.demanda[j] + demanda_bloco <= solucao.capacidade]
+            if not destinos:
+                continue
+            j = rng.choice(destinos)
+            pos = rng.randint(0, len(solucao.rotas[j]))
+        solucao.mover_segmento(i, a, b, j, pos)
+    return solucao
+
+
+def remover_servicos(solucao, rng, quantidade, criterio, vizinhos=None):
+    """
+    1. Objetivo:
+       Etapa de "ruína" da busca em vizinhança grande: retira serviços da solução.
+
+    2. Entradas:
+       - solucao: Solucao (alterada no lugar).
+       - rng: random.Random.
+       - quantidade: número de serviços a retirar.
+       - criterio: "aleatoria", "relacionada" (serviços próximos entre si) ou "rotas" (rotas inteiras).
+       - vizinhos: VizinhancaGranular, usada pela remoção relacionada.
+
+    3. Lógica:
+       - Aleatória: sorteia os serviços.
+       - Relacionada: parte de um serviço sorteado e, repetidamente, retira um vizinho granular ainda presente de um serviço
+         já retirado (sorteado entre eles); sem vizinho disponível, recomeça de outro serviço sorteado.
+       - Rotas: retira rotas inteiras sorteadas até atingir a quantidade.
+       As rotas que ficam vazias são removidas.
+
+    4. Contribuição:
+       Abre espaço para a reinserção por arrependimento reorganizar regiões inteiras da solução.
+       Retorna a lista dos serviços retirados.
+    """
+    presentes = [s for rota in solucao.rotas for s in rota]
+    quantidade = min(quantidade, len(presentes))
+    if criterio == "aleatoria":
+        removidos = rng.sample(presentes, quantidade)
+    elif criterio == "relacionada":
+        escolhidos = set()
+        removidos = []
+        while len(removidos) < quantidade:
+            candidatos = []
+            if removidos:
+                base = removidos[rng.randrange(len(removidos))]
+                candidatos = [t for t in vizinhos.vizinhos[base] if t not in escolhidos]
+            if not candidatos:
+                candidatos = [s for s in presentes if s not in escolhidos]
+            # Viés para os vizinhos mais próximos (as listas granulares estão ordenadas por proximidade)
+            s = candidatos[int(len(candidatos) * rng.random() ** 3)] if removidos else rng.choice(candidatos)
+            escolhidos.add(s)
+            removidos.append(s)
+    elif criterio == "rotas":
+        ordem = [j for j, rota in enumerate(solucao.rotas) if rota]
+        rng.shuffle(ordem)
+        removidos = []
+        for j in ordem:
+            if len(removidos) >= quantidade:
+                break
+            removidos.extend(solucao.rotas[j])
+    else:
+        raise ValueError(f"Critério de remoção desconhecido: {criterio}")
+
+    for s in removidos:
+        solucao.remover(s)
+    solucao.remover_vazias()
+    return removidos
+
+
+def inserir_arrependimento(solucao, servicos, vizinhos, k=REGRET_K):
+    """
+    1. Objetivo:
+       Etapa de "recriação": reinsere serviços sem rota pela heurística de arrependimento (regret-k).
+
+    2. Entradas:
+       - solucao: Solucao (alterada no lugar) com os serviços de servicos fora das rotas.
+       - servicos: serviços a inserir.
+       - vizinhos: VizinhancaGranular, que define as posições candidatas.
+       - k: ordem do arrependimento (2 = diferença entre a melhor e a segunda melhor rota).
+
+    3. Lógica:
+       - As posições candidatas de um serviço s são as adjacentes (antes e depois) aos seus vizinhos granulares já roteados
+         e, se s é vizinho do depósito, o início e o fim de cada rota; uma rota nova (depósito -> s -> depósito) é sempre possível.
+       - Cache por rota: melhor[s][j] = (custo, posição) da melhor inserção de s na rota j (Solucao.custo_insercao, no melhor sentido).
+         Após inserir x na rota j, só são recalculadas as entradas da rota j (as demais continuam válidas) para os serviços
+         que tinham candidatos em j ou que têm x como vizinho.
+       - A cada passo, o arrependimento de s é a soma das diferenças entre a melhor inserção viável (capacidade) e as k - 1 seguintes,
+         contando a rota nova como opção; insere o serviço de maior arrependimento (desempate: menor custo) na sua melhor posição.
+
+    4. Contribuição:
+       Reconstrói a solução priorizando os serviços com poucas boas opções, e o cache torna cada passo proporcional ao número de serviços pendentes.
+    """
+    d = solucao.matriz_distancias
+    tabela = solucao.tabela
+    deposito = solucao.deposito
+    capacidade = solucao.capacidade
+    rota_de, posicao = solucao.rota_de, solucao.posicao
+
+    # inversos[x]: serviços pendentes que têm x entre os seus vizinhos granulares
+    pendentes = set(servicos)
+    inversos = {}
+    for s in pendentes:
+        for t in vizinhos.vizinhos[s]:
+            inversos.setdefault(t, []).append(s)
+
+    def custo_rota_nova(s):
+        return solucao.custo_insercao(s, deposito, deposito) + d[deposito][deposito]
+
+    def avaliar(s, j):
+        # Melhor inserção de s na rota j entre as posições candidatas (ou None)
+        rota = solucao.rotas[j]
+        posicoes = set()
+        for t in vizinhos.vizinhos[s]:
+            if rota_de[t] == j:
+                posicoes.add(posicao[t])
+                posicoes.add(posicao[t] + 1)
+        if vizinhos.perto_deposito[s]:
+            posicoes.add(0)
+            posicoes.add(len(rota))
+        melhor = None
+        for pos in posicoes:
+            a, b = solucao.nos_vizinhos(j, pos)
+            custo = solucao.custo_insercao(s, a, b)
+            if melhor is None or custo < melhor[0]:
+                melhor = (custo, pos)
+        return melhor
+
+    def rotas_candidatas(s):
+        if vizinhos.perto_deposito[s]:
+            return range(len(solucao.rotas))
+        return {rota_de[t] for t in vizinhos.vizinhos[s] if rota_de[t] >= 0}
+
+    def prioridade(s):
+        # (chave de escolha, melhor opção) de s; menor chave = inserir primeiro
+        demanda_s = tabela.demanda[s]
+        opcoes = [
+            (custo, j, pos) for j, (custo, pos) in melhor[s].items()
+            if solucao.demanda[j] + demanda_s <= capacidade
+        ]
+        opcoes.append((custo_rota_nova(s), -1, 0))
+        opcoes.sort()
+        arrependimento = sum(opcoes[h][0] - opcoes[0][0] for h in range(1, min(k, len(opcoes))))
+        # Serviços com menos de k opções têm prioridade (arrependimento "infinito" nas opções ausentes)
+        return (len(opcoes) >= k, -arrependimento, opcoes[0][0], s), opcoes[0]
+
+    melhor = {}
+    for s in pendentes:
+        melhor[s] = {}
+        for j in rotas_candidatas(s):
+            avaliacao = avaliar(s, j)
+            if avaliacao is not None:
+                melhor[s][j] = avaliacao
+    chaves = {s: prioridade(s) for s in pendentes}
+
+    while pendentes:
+        s = min(pendentes, key=lambda t: chaves[t][0])
+        _, j, pos = chaves[s][1]
+        pendentes.remove(s)
+        del melhor[s], chaves[s]
+        if j < 0:
+            j, pos = solucao.nova_rota(), 0
+        solucao.inserir(s, j, pos)
+
+        # Só a rota j mudou (posições e carga): recalcula a sua entrada no cache para os serviços afetados
+        afetados = {t for t in pendentes if j in melhor[t] or vizinhos.perto_deposito[t]}
+        afetados.update(t for t in inversos.get(s, ()) if t in pendentes)
+        for t in afetados:
+            avaliacao = avaliar(t, j)
+            if avaliacao is None:
+                melhor[t].pop(j, None)
+            else:
+                melhor[t][j] = avaliacao
+            chaves[t] = prioridade(t)
+    return solucao
+
+
+def ruina_e_recriacao(solucao, rng, vizinhos, fracao_min=FRACAO_RUINA_MIN, fracao_max=FRACAO_RUINA_MAX, k=REGRET_K):
+    """
+    1. Objetivo:
+       Movimento de vizinhança grande (LNS): retira uma fração dos serviços e os reinsere por arrependimento.
+
+    2. Entradas:
+       - solucao: Solucao (alterada no lugar).
+       - rng: random.Random.
+       - vizinhos: VizinhancaGranular da instância.
+       - fracao_min, fracao_max: fração dos serviços retirados (sorteada no intervalo).
+       - k: ordem do arrependimento.
+
+    3. Lógica:
+       Sorteia a quantidade e o critério de remoção (aleatória, relacionada ou por rotas), aplica remover_servicos
+       e reinsere os serviços com inserir_arrependimento.
+
+    4. Contribuição:
+       Escapa de ótimos locais em que relocate e 2-opt ficam presos, a um custo por iteração bem menor que o de uma nova tentativa GRASP.
+    """
+    n = len(solucao.tabela)
+    quantidade = max(1, round(n * rng.uniform(fracao_min, fracao_max)))
+    criterio = rng.choice(CRITERIOS_RUINA)
+    removidos = remover_servicos(solucao, rng, quantidade, criterio, vizinhos)
+    return inserir_arrependimento(solucao, removidos, vizinhos, k)
+
+
+def busca_local_iterada(
+    solucao,
+    vizinhos,
+    rng,
+    prazo=None,
+    max_iteracoes=None,
+    aceitacao="aceitacao_tardia",
+    forca=FORCA_PERTURBACAO,
+    perturbacao="segmentos"
+):
+    """
+    1. Objetivo:
+       Busca local iterada (ILS): melhora uma solução já refinada perturbando-a e reotimizando-a repetidamente, sem reconstruí-la.
+
+    2. Entradas:
+       - solucao: Solucao de partida (ótimo local do VND); não é alterada.
+       - vizinhos: VizinhancaGranular da instância, compartilhada entre as iterações.
+       - rng: random.Random.
+       - prazo: Prazo opcional; a busca para quando ele se esgota.
+       - max_iteracoes: número máximo de iterações (None = até o prazo).
+       - aceitacao: "aceitacao_tardia" (late acceptance) ou "recozimento" (simulated annealing).
+       - forca: número de segmentos movidos por perturbação.
+       - perturbacao: "segmentos" (perturbar) ou "ruina" (ruína e recriação com inserção por arrependimento, ruina_e_recriacao).
+
+    3. Lógica:
+       - Cada iteração copia a solução corrente (O(n)), aplica a perturbação (perturbar ou ruina_e_recriacao) e reotimiza com vnd. Custos e sentidos ficam em cache
+         na Solucao (só as rotas alteradas são reavaliadas), e a vizinhança granular é a mesma em todas as iterações.
+       - Aceitação tardia: aceita o candidato se não for pior que a solução corrente ou que a corrente de HISTORICO_ACEITACAO iterações atrás.
+       - Recozimento: aceita pioras com probabilidade exp(-delta / T), com T decaindo geometricamente de
+         TEMPERATURA_INICIAL * custo até TEMPERATURA_FINAL * custo ao longo do orçamento (prazo ou max_iteracoes).
+       - Guarda a melhor solução visitada (menor custo, depois menos rotas).
+
+    4. Contribuição:
+       Cada iteração custa uma fração de uma tentativa completa (sem savings, construção nem busca a partir de uma solução ruim),
+       permitindo muito mais exploração no mesmo orçamento de tempo.
+       Retorna (melhor Solucao, clock em que foi encontrada ou None se não houve melhoria, número de iterações).
+    """
+    if max_iteracoes is None and prazo is None:
+        raise ValueError("Informe max_iteracoes ou um prazo para a busca local iterada.")
+    if aceitacao not in ("aceitacao_tardia", "recozimento"):
+        raise ValueError(f"Critério de aceitação desconhecido: {aceitacao}")
+    if perturbacao not in ("segmentos", "ruina"):
+        raise ValueError(f"Perturbação desconhecida: {perturbacao}")
+
+    corrente = solucao
+    custo_corrente = corrente.custo_total()
+    melhor = corrente
+    chave_melhor = (custo_corrente, corrente.num_rotas())
+    clock_melhor = None
+    historico = [custo_corrente] * HISTORICO_ACEITACAO
+    temperatura_inicial = TEMPERATURA_INICIAL * custo_corrente
+    razao_temperatura = TEMPERATURA_FINAL / TEMPERATURA_INICIAL
+
+    iteracao = 0
+    while (max_iteracoes is None or iteracao < max_iteracoes) and not (prazo is not None and prazo.esgotado()):
+        candidata = corrente.copiar()
+        if perturbacao == "ruina":
+            ruina_e_recriacao(candidata, rng, vizinhos)
+        else:
+            perturbar(candidata, rng, forca, vizinhos=vizinhos)
+        vnd(candidata, vizinhos=vizinhos, prazo=prazo)
+        candidata.remover_vazias()
+        custo = candidata.custo_total()
+
+        if aceitacao == "aceitacao_tardia":
+            v = iteracao % HISTORICO_ACEITACAO
+            aceita = custo <= custo_corrente or custo <= historico[v]
+        else:
+            if max_iteracoes is not None:
+                progresso = iteracao / max_iteracoes
+            else:
+                progresso = 1 - prazo.restante() / prazo.segundos if prazo.segundos > 0 else 1
+            temperatura = temperatura_inicial * razao_temperatura ** min(1.0, progresso)
+            delta = custo - custo_corrente
+            aceita = delta <= 0 or (temperatura > 0 and rng.random() < math.exp(-delta / temperatura))
+        if aceita:
+            corrente, custo_corrente = candidata, custo
+        if aceitacao == "aceitacao_tardia":
+            historico[v] = custo_corrente
+
+        chave = (custo, candidata.num_rotas())
+        if chave < chave_melhor:
+            melhor, chave_melhor, clock_melhor = candidata.copiar(), chave, time.perf_counter_ns()
+        iteracao += 1
+    return melhor, clock_melhor, iteracao
+
+
+def executar_tentativa(
+    tentativa,
+    tabela,
+    deposito,
+    matriz_distancias,
+    capacidade,
+    ids_obrigatorios,
+    k_grasp=10,
+    vizinhos=None,
+    savings=None,
+    prazo=None,
+    construtivo="clarke_wright",
+    iteracoes_ils=0,
+    aceitacao_ils="aceitacao_tardia",
+    perturbacao_ils="segmentos",
+    semente=SEMENTE_PADRAO,
+    tempos=None
+):
+    """
+    1. Objetivo:
+       Executa uma única tentativa do multi-start: construção (GRASP ou tour gigante + split) seguida de VND e segment_relocate
+       e, opcionalmente, de uma busca local iterada.
+
+    2. Entradas:
+       - tentativa: número da tentativa (com semente, define a semente do gerador aleatório).
+       - tabela: TabelaServicos com os serviços obrigatórios.
+       - ids_obrigatorios: conjunto dos id_servico que devem estar na solução (validação).
+       - deposito, matriz_distancias, capacidade, k_grasp: como em multi_start_pipeline.
+       - vizinhos: VizinhancaGranular da instância, compartilhada pelas buscas locais.
+       - savings: savings pré-calculados (calcular_savings), compartilhados pelas tentativas; None = calculados pelo Clarke & Wright.
+       - prazo: Prazo opcional; as buscas locais param quando ele se esgota.
+       - construtivo: "clarke_wright", "split" ou "misto" (tentativas pares com Clarke & Wright, ímpares com split).
+       - iteracoes_ils: iterações da busca local iterada após o refinamento (0 = nenhuma; None = até o prazo).
+       - aceitacao_ils: critério de aceitação da busca local iterada ("aceitacao_tardia" ou "recozimento").
+       - perturbacao_ils: perturbação da busca local iterada ("segmentos" ou "ruina", ruína e recriação).
+       - semente: semente base da instância (ex.: derivar_semente do nome da instância).
+       - tempos: dicionário opcional em que o tempo de parede (s) de cada etapa é acumulado
+         ("construcao", "vnd", "segment_relocate" e, com busca local iterada, "ils"); usado pelo benchmark.
+
+    3. Lógica:
+       - Cria um random.Random próprio com semente derivar_semente(semente, tentativa), passado explicitamente a todos os componentes
+         aleatórios, para que o resultado não dependa de outras tentativas, de outros processos nem da ordem de execução.
+       - Constrói, refina (e, com iteracoes_ils, aplica a busca local iterada) e valida a solução.
+
+    4. Contribuição:
+       Unidade de trabalho independente, executada em sequência ou distribuída entre processos pelo multi_start_pipeline.
+       Retorna (custo_total, num_rotas, rotas, demandas, clock_tentativa), com rotas em array('i') de índices (compactas para enviar entre processos),
+       ou None se a solução for inválida.
+    """
+    # Marca o clock do início da tentativa
+    clock_tentativa = time.perf_counter_ns()
+    rng = random.Random(derivar_semente(semente, tentativa))
+    instante = time.perf_counter()
+
+    def marcar(etapa):
+        # Acumula em tempos a duração da etapa que acabou de terminar
+        nonlocal instante
+        agora = time.perf_counter()
+        if tempos is not None:
+            tempos[etapa] = tempos.get(etapa, 0.0) + agora - instante
+        instante = agora
+
+    # 1. Construção inicial com Clarke & Wright GRASP ou tour gigante + split (ambos com randomização controlada)
+    if construtivo == "misto":
+        construtivo = CONSTRUTIVOS[tentativa % 2]
+    if construtivo == "split":
+        tour, sentidos = tour_gigante(tabela, deposito, matriz_distancias, rng=rng, vizinhos=vizinhos)
+        rotas, demandas = split(tour, sentidos, tabela, deposito, matriz_distancias, capacidade)
+    else:
+        rotas, demandas = clarke_wright_grasp(
+            tabela, deposito, matriz_distancias, capacidade, k=k_grasp, rng=rng, savings=savings
+        )
+    solucao = Solucao(tabela, deposito, matriz_distancias, capacidade, rotas)
+    marcar("construcao")
+
+    # 2. Otimização local com VND, no lugar sobre a Solucao
+    vnd(solucao, vizinhos=vizinhos, prazo=prazo)
+    marcar("vnd")
+
+    # 3. Pós-processamento com realocação de segmentos (segment relocate)
+    segment_relocate(solucao, vizinhos=vizinhos, prazo=prazo)
+    marcar("segment_relocate")
+
+    # 3b. Busca local iterada a partir do ótimo local (perturbação + VND), se solicitada
+    if iteracoes_ils != 0:
+        solucao, clock_ils, _ = busca_local_iterada(
+            solucao, vizinhos, rng, prazo=prazo, max_iteracoes=iteracoes_ils, aceitacao=aceitacao_ils,
+            perturbacao=perturbacao_ils
+        )
+        clock_tentativa = clock_ils or clock_tentativa
+        marcar("ils")
+
+    # 4. Custo total (mantido incrementalmente pela Solucao) e número de rotas
+    rotas_final, demandas_final = solucao.rotas, solucao.demanda
+    custo_total = solucao.custo_total()
+    num_rotas = len(rotas_final)
+
+    # 5. Validação: todos os serviços obrigatórios devem estar presentes e sem duplicatas
+    ids_nas_rotas = [tabela.id[s] for rota in rotas_final for s in rota]
+    if set(ids_nas_rotas) != ids_obrigatorios or len(ids_nas_rotas) != len(set(ids_nas_rotas)):
+        print(f"[Tentativa {tentativa+1}] Solução inválida: serviços perdidos ou duplicados!")
+        return None
+
+    return custo_total, num_rotas, rotas_final, demandas_final, clock_tentativa
+
+
+def converter_tempos(clock_inicio, clock_fim, clock_melhor, freq_hz=None):
+    """
+    Converte os instantes (perf_counter_ns) em (tempo total, tempo até a melhor solução), em ciclos se freq_hz foi fornecida
+    (senão em nanosegundos). O tempo até a melhor solução é -1 se nenhuma foi encontrada.
+    """
+    escala = freq_hz / 1_000_000_000 if freq_hz else 1
+    total = int((clock_fim - clock_inicio) * escala)
+    melhor = int((clock_melhor - clock_inicio) * escala) if clock_melhor else -1
+    return total, melhor
+
+
+# Dados da instância compartilhados (somente leitura) com os processos do multi-start paralelo
+_contexto_tentativas = None
+
+
+def _inicializar_processo_tentativas(contexto):
+    global _contexto_tentativas
+    _contexto_tentativas = contexto
+
+
+def _executar_tentativa_processo(tentativa, prazo=None, opcoes=None):
+    return tentativa, executar_tentativa(tentativa, *_contexto_tentativas, prazo=prazo, **(opcoes or {}))
+
 
 def multi_start_pipeline(
     servicos,
@@ -273,29 +1872,53 @@ def multi_start_pipeline(
     servicos_obrigatorios,
     k_grasp=10,
     num_tentativas=3,
-    freq_hz=None
+    freq_hz=None,
+    num_processos=1,
+    tempo_limite=None,
+    tempo_cpu=False,
+    construtivo="clarke_wright",
+    iteracoes_ils=0,
+    aceitacao_ils="aceitacao_tardia",
+    perturbacao_ils="segmentos",
+    semente=SEMENTE_PADRAO
 ):
     """
     1. Objetivo:
        Executa o pipeline completo de construção e otimização de rotas múltiplas vezes (multi-start), cada vez com uma randomização diferente, e retorna a melhor solução encontrada.
 
     2. Entradas:
-       - servicos: lista de serviços obrigatórios.
+       - servicos: lista de serviços obrigatórios (dicionários de extrair_servicos) ou TabelaServicos.
        - deposito: índice do depósito.
        - matriz_distancias: matriz de distâncias.
        - capacidade: capacidade máxima do veículo.
        - servicos_obrigatorios: lista de todos os serviços obrigatórios (para validação).
        - k_grasp: parâmetro top-k para o GRASP.
-       - num_tentativas: número de tentativas (multi-start).
+       - num_tentativas: número de tentativas (multi-start); com tempo_limite, é o máximo de tentativas (None = sem máximo).
        - freq_hz: frequência do processador para medir tempo em ciclos (opcional).
+       - num_processos: número de processos para executar as tentativas em paralelo (1 = sequencial).
+       - tempo_limite: orçamento de tempo em segundos (modo "anytime"); None mantém o número fixo de tentativas.
+       - tempo_cpu: se True, o orçamento é medido em tempo de CPU (somente no modo sequencial); senão, em tempo de parede.
+       - construtivo: construtivo de cada tentativa, um de CONSTRUTIVOS ("clarke_wright", "split" = tour gigante + split, ou "misto").
+       - iteracoes_ils: iterações de busca local iterada ao fim de cada tentativa (0 = nenhuma; None = até o prazo, exige tempo_limite).
+         Com num_tentativas=1 e iteracoes_ils=None, todo o orçamento vai para perturbar e reotimizar a melhor solução, sem reconstruções.
+       - aceitacao_ils: critério de aceitação da busca local iterada ("aceitacao_tardia" ou "recozimento").
+       - perturbacao_ils: perturbação da busca local iterada: "segmentos" ou "ruina" (ruína e recriação com inserção por arrependimento).
+       - semente: semente base; a tentativa t usa um gerador próprio com semente derivar_semente(semente, t).
 
     3. Lógica:
-       Para cada tentativa:
-         - Executa o construtivo GRASP.
-         - Refina com VND e segment_relocate.
+       Converte os serviços para uma TabelaServicos (arrays paralelos); internamente as rotas são listas de índices.
+       Calcula uma vez a vizinhança granular (K serviços mais próximos), usada pelas buscas locais de todas as tentativas,
+       e a lista ordenada de savings, reaproveitada por todas as construções Clarke & Wright (só a escolha GRASP muda entre tentativas).
+       Para cada tentativa (executar_tentativa):
+         - Executa o construtivo escolhido (Clarke & Wright GRASP ou tour gigante randomizado + split).
+         - Refina com VND e segment_relocate e, se solicitado, com a busca local iterada (busca_local_iterada).
          - Valida a solução.
-         - Guarda a melhor solução encontrada (menor custo, ou menos rotas em caso de empate).
+       Com num_processos > 1, as tentativas são distribuídas em um pool de processos; a matriz de distâncias e os serviços são herdados pelos processos (fork) em vez de copiados a cada tarefa.
+       Os resultados são percorridos na ordem das tentativas e a melhor solução é escolhida pela mesma regra (menor custo, ou menos rotas em caso de empate), de modo que o resultado é idêntico ao da execução sequencial.
+       No modo "anytime" (tempo_limite), novas tentativas são iniciadas enquanto houver orçamento, e as buscas locais em andamento
+       param de forma limpa no prazo, devolvendo a solução corrente (a primeira tentativa sempre é iniciada, para haver solução).
        Mede o tempo total e o tempo até encontrar a melhor solução.
+       A melhor solução é devolvida como rotas de dicionários (adaptador da tabela), no formato esperado por salvar_solucao.
 
     4. Contribuição:
        Aumenta a robustez e qualidade das soluções, explorando diferentes pontos de partida e refinando cada um.
@@ -306,60 +1929,100 @@ def multi_start_pipeline(
     melhor_demandas = None
     melhor_clock_encontrado = None
 
-    clock_inicio = time.perf_counter_ns()
-    for tentativa in range(num_tentativas):
-        # Marca o clock do início da tentativa
-        clock_tentativa = time.perf_counter_ns()
-        random.seed(12345 + tentativa)
-
-        # 1. Construção inicial com Clarke & Wright GRASP (com randomização controlada)
-        rotas, demandas = clarke_wright_grasp(
-            servicos, deposito, matriz_distancias, capacidade, k=k_grasp
-        )
-
-        # 2. Otimização local com VND (relocate + 2-opt)
-        rotas_otimizadas, demandas_otimizadas = vnd(
-            rotas, demandas, capacidade, matriz_distancias, deposito
-        )
-
-        # 3. Pós-processamento com realocação de segmentos (segment relocate)
-        rotas_final, demandas_final = segment_relocate(
-            rotas_otimizadas, demandas_otimizadas, capacidade, matriz_distancias, deposito, servicos_obrigatorios
+    tabela = servicos if isinstance(servicos, TabelaServicos) else TabelaServicos.de_servicos(servicos)
+    ids_obrigatorios = frozenset(
+        servicos_obrigatorios.id if isinstance(servicos_obrigatorios, TabelaServicos)
+        else (s['id_servico'] for s in servicos_obrigatorios)
+    )
+    if construtivo not in CONSTRUTIVOS:
+        raise ValueError(f"Construtivo desconhecido: {construtivo}")
+    if num_tentativas is None and tempo_limite is None:
+        raise ValueError("Informe num_tentativas ou tempo_limite.")
+    if iteracoes_ils is None and tempo_limite is None:
+        raise ValueError("A busca local iterada sem limite de iterações exige tempo_limite.")
+    if tempo_cpu and num_processos > 1:
+        raise ValueError("O orçamento em tempo de CPU só é suportado no modo sequencial.")
+
+    # A vizinhança granular é calculada uma única vez e compartilhada por todas as tentativas
+    vizinhos = VizinhancaGranular(tabela, deposito, matriz_distancias)
+    # Os savings não dependem da randomização: são calculados uma vez e compartilhados (herdados pelos processos)
+    savings = None
+    if construtivo != "split":
+        savings = calcular_savings(
+            tabela, deposito, matriz_distancias,
+            top_m=TOP_M_SAVINGS if len(tabela) > LIMITE_SAVINGS_COMPLETOS else None
         )
+    contexto = (tabela, deposito, matriz_distancias, capacidade, ids_obrigatorios, k_grasp, vizinhos, savings)
+    opcoes = {
+        "construtivo": construtivo,
+        "iteracoes_ils": iteracoes_ils,
+        "aceitacao_ils": aceitacao_ils,
+        "perturbacao_ils": perturbacao_ils,
+        "semente": semente,
+    }
 
-        # 4. Calcula custo total e número de rotas
-        custo_total = sum(rota_custo(rota, matriz_distancias, deposito) for rota in rotas_final)
-        num_rotas = len(rotas_final)
+    clock_inicio = time.perf_counter_ns()
+    prazo = Prazo(tempo_limite, cpu=tempo_cpu) if tempo_limite is not None else None
+
+    def pode_iniciar(tentativa):
+        if num_tentativas is not None and tentativa >= num_tentativas:
+            return False
+        return tentativa == 0 or prazo is None or not prazo.esgotado()
+
+    resultados = []
+    if num_processos > 1 and (num_tentativas is None or num_tentativas > 1):
+        metodos = multiprocessing.get_all_start_methods()
+        mp_contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        num_trabalhadores = num_processos if num_tentativas is None else min(num_processos, num_tentativas)
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_trabalhadores,
+            mp_context=mp_contexto,
+            initializer=_inicializar_processo_tentativas,
+            initargs=(contexto,)
+        ) as executor:
+            # Mantém no máximo um lote de tentativas em andamento por processo, para que nenhuma comece após o prazo
+            em_andamento = set()
+            proxima = 0
+            while True:
+                while len(em_andamento) < num_trabalhadores and pode_iniciar(proxima):
+                    em_andamento.add(executor.submit(_executar_tentativa_processo, proxima, prazo, opcoes))
+                    proxima += 1
+                if not em_andamento:
+                    break
+                concluidas, em_andamento = concurrent.futures.wait(
+                    em_andamento, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                resultados.extend(futuro.result() for futuro in concluidas)
+        resultados.sort(key=lambda item: item[0])
+    else:
+        tentativa = 0
+        while pode_iniciar(tentativa):
+            resultados.append((tentativa, executar_tentativa(tentativa, *contexto, prazo=prazo, **opcoes)))
+            tentativa += 1
 
-        # 5. Validação: todos os serviços obrigatórios devem estar presentes e sem duplicatas
-        ids_esperados = set(s['id_servico'] for s in servicos_obrigatorios)
-        ids_nas_rotas = [serv['id_servico'] for rota in rotas_final for serv in rota]
-        if set(ids_nas_rotas) != ids_esperados or len(ids_nas_rotas) != len(set(ids_nas_rotas)):
-            print(f"[Tentativa {tentativa+1}] Solução inválida: serviços perdidos ou duplicados!")
+    for tentativa, resultado in resultados:
+        if resultado is None:
             continue
+        custo_total, num_rotas, rotas_final, demandas_final, clock_tentativa = resultado
 
-        # 6. Atualiza melhor solução se necessário (menor custo, depois menos rotas)
+        # Atualiza melhor solução se necessário (menor custo, depois menos rotas)
         if (custo_total < melhor_custo) or (custo_total == melhor_custo and num_rotas < melhor_num_rotas):
             melhor_custo = custo_total
             melhor_num_rotas = num_rotas
-            melhor_rotas = [list(r) for r in rotas_final]
+            melhor_rotas = rotas_final  # cada tentativa devolve rotas próprias: não é preciso copiar
             melhor_demandas = list(demandas_final)
             melhor_clock_encontrado = clock_tentativa  # registra o clock quando achou a melhor
 
             print(f"[Tentativa {tentativa+1}] Nova melhor solução: custo {custo_total}, rotas {num_rotas}")
 
     clock_fim = time.perf_counter_ns()
-
-    # Converte para ciclos se freq_hz foi fornecida (senão retorna em nanosegundos)
-    if freq_hz:
-        clock_total_ciclos = int((clock_fim - clock_inicio) * (freq_hz / 1_000_000_000))
-        melhor_clock_encontrado_ciclos = int((melhor_clock_encontrado - clock_inicio) * (freq_hz / 1_000_000_000)) if melhor_clock_encontrado else -1
-    else:
-        clock_total_ciclos = clock_fim - clock_inicio
-        melhor_clock_encontrado_ciclos = (melhor_clock_encontrado - clock_inicio) if melhor_clock_encontrado else -1
+    clock_total_ciclos, melhor_clock_encontrado_ciclos = converter_tempos(
+        clock_inicio, clock_fim, melhor_clock_encontrado, freq_hz
+    )
 
     if melhor_rotas is not None:
         print(f"\nMelhor solução multi-start: custo {melhor_custo}, rotas {melhor_num_rotas}")
+        melhor_rotas = tabela.rotas_como_dicts(melhor_rotas)
     else:
         print("Nenhuma solução válida encontrada!")
 
@@ -367,28 +2030,83 @@ def multi_start_pipeline(
 
 
 
-def segment_relocate(rotas, demandas, capacidade, matriz_distancias, deposito, servicos_obrigatorios):
+def segment_relocate(solucao, max_segmento=MAX_SEGMENTO, vizinhos=None, prazo=None):
     """
     1. Objetivo:
        Refina a solução movendo blocos contínuos de serviços (segmentos) entre rotas, se isso reduzir o custo total e respeitar a capacidade.
 
     2. Entradas:
-       - rotas: lista de rotas (cada rota é uma lista de serviços).
-       - demandas: lista de demandas de cada rota.
-       - capacidade: capacidade máxima do veículo.
-       - matriz_distancias: matriz de distâncias.
-       - deposito: índice do depósito.
-       - servicos_obrigatorios: lista de todos os serviços obrigatórios (para validação).
+       - solucao: Solucao a ser refinada (alterada no lugar); a matriz de distâncias deve ser uma MatrizDistancias (array denso).
+       - max_segmento: comprimento máximo dos blocos movidos (None = sem limite).
+       - vizinhos: VizinhancaGranular opcional; se informada, só avalia inserções em que o bloco fica ao lado de um vizinho.
+       - prazo: Prazo opcional; quando esgotado, a busca para e devolve a solução corrente.
 
     3. Lógica:
-       Para cada par de rotas, tenta mover todos os blocos possíveis de uma para outra, desde que não deixe rota vazia e não exceda a capacidade.
-       Aceita o movimento se reduzir o custo total das duas rotas.
-       Repete até não haver mais melhorias.
-       Remove rotas vazias e valida a solução.
+       Para cada rota de origem, enumera os blocos de 1 até max_segmento serviços (nunca a rota inteira).
+       Somas prefixas de demanda tornam a demanda de cada bloco O(1). O bloco mantém a ordem e as ligações internas,
+       e o custo de serviço apenas muda de rota, então o delta depende só das ligações nas extremidades:
+       o ganho de retirar o bloco (anterior -> início, fim -> seguinte, substituídas por anterior -> seguinte)
+       e o custo de inseri-lo entre cada par de posições consecutivas da rota de destino, com os sentidos atuais
+       (saída de um serviço -> entrada do seguinte). A reorientação das duas rotas após o movimento só pode reduzir o delta estimado.
+       Os deltas de todos os blocos e posições de um par de rotas são avaliados de uma vez com NumPy, e o melhor movimento que reduz o custo
+       é aplicado no lugar (Solucao.mover_segmento).
+       Com a vizinhança granular, pares de rotas sem nenhum par de serviços vizinhos (nem serviço vizinho do depósito) são descartados,
+       e a máscara vizinhos.proximo restringe os movimentos àqueles em que o início do bloco fica após um vizinho ou o fim do bloco antes de um vizinho.
+       "Don't look bits": um par de rotas que já foi examinado sem melhoria só é reexaminado se uma das duas rotas mudou desde então.
+       Repete até não haver mais melhorias, remove rotas vazias e valida a solução.
 
     4. Contribuição:
        Permite grandes saltos na vizinhança da solução, potencialmente reduzindo o número de rotas e o custo total.
     """
+    tabela = solucao.tabela
+    rotas, demandas, capacidade = solucao.rotas, solucao.demanda, solucao.capacidade
+    valores = solucao.matriz_distancias.valores
+    indice = solucao.matriz_distancias.indice
+    entrada, saida = solucao.entrada, solucao.saida
+    no_deposito = indice[solucao.deposito]
+    demanda_servico = np.asarray(tabela.demanda, dtype=np.int64)
+
+    versao = [0] * len(rotas)
+    sem_melhoria = {}   # (i, j) -> versões das duas rotas no último exame sem melhoria
+    cache_blocos = {}   # i -> (versão, dados dos blocos da rota i)
+
+    # Na vizinhança granular, o depósito é o elemento de índice len(tabela)
+    elemento_deposito = len(tabela)
+
+    def elementos_da_rota(rota):
+        # Cópia (int64) da rota com o depósito nas pontas; nenhuma visão do array('i') é mantida, para que ele possa ser alterado
+        return np.concatenate(([elemento_deposito], np.asarray(rota, dtype=np.int64), [elemento_deposito]))
+
+    def nos_da_rota(rota):
+        # Índices (na matriz) dos nós de entrada e de saída de cada elemento, no sentido atual, com o depósito nas pontas
+        x_in = np.full(len(rota) + 2, no_deposito, dtype=np.int64)
+        x_out = x_in.copy()
+        x_in[1:-1] = [indice[entrada[s]] for s in rota]
+        x_out[1:-1] = [indice[saida[s]] for s in rota]
+        return x_in, x_out
+
+    def blocos_da_rota(i):
+        guardado = cache_blocos.get(i)
+        if guardado is not None and guardado[0] == versao[i]:
+            return guardado[1]
+        rota = rotas[i]
+        n = len(rota)
+        limite = n - 1 if max_segmento is None else min(max_segmento, n - 1)
+        if limite < 1:
+            dados = None
+        else:
+            elementos = elementos_da_rota(rota)
+            x_in, x_out = nos_da_rota(rota)
+            prefixo = np.concatenate(([0], np.cumsum(demanda_servico[elementos[1:-1]])))
+            inicio = np.concatenate([np.arange(0, n - comp + 1) for comp in range(1, limite + 1)])
+            fim = np.concatenate([np.arange(comp - 1, n) for comp in range(1, limite + 1)])
+            # Os nós estão deslocados de 1 (posição 0 é o depósito): inicio é o anterior ao bloco e fim + 2 o seguinte
+            anterior, primeiro, ultimo, seguinte = x_out[inicio], x_in[inicio + 1], x_out[fim + 1], x_in[fim + 2]
+            ganho = valores[anterior, primeiro] + valores[ultimo, seguinte] - valores[anterior, seguinte]
+            dados = (inicio, fim, prefixo[fim + 1] - prefixo[inicio], primeiro, ultimo, ganho, elementos[inicio + 1], elementos[fim + 1])
+        cache_blocos[i] = (versao[i], dados)
+        return dados
+
     melhorou = True
     while melhorou:
         melhorou = False
@@ -397,58 +2115,72 @@ def segment_relocate(rotas, demandas, capacidade, matriz_distancias, deposito, s
             for j in range(len(rotas)):
                 if i == j or not rotas[i] or not rotas[j]:
                     continue
-                rota_origem = rotas[i]
-                rota_destino = rotas[j]
-                demanda_origem = demandas[i]
-                demanda_destino = demandas[j]
-                n = len(rota_origem)
-                # Tenta todos os blocos possíveis (segmentos contínuos) de 1 até n-1 serviços
-                for start in range(n):
-                    for end in range(start + 1, n + 1):
-                        bloco = rota_origem[start:end]
-                        if not bloco or len(bloco) == n:
-                            continue  # Não move rota inteira
-                        demanda_bloco = sum(serv['demanda'] for serv in bloco)
-                        if demanda_destino + demanda_bloco > capacidade:
-                            continue
-                        nova_rota_origem = rota_origem[:start] + rota_origem[end:]
-                        nova_rota_destino = rota_destino + bloco
-                        if not nova_rota_origem:
-                            continue  # Não deixa rota vazia
-                        # Calcula custos antes e depois
-                        custo_antigo = rota_custo(rota_origem, matriz_distancias, deposito) + rota_custo(rota_destino, matriz_distancias, deposito)
-                        custo_novo = rota_custo(nova_rota_origem, matriz_distancias, deposito) + rota_custo(nova_rota_destino, matriz_distancias, deposito)
-                        if custo_novo < custo_antigo:
-                            # Aplica movimento
-                            rotas[i] = nova_rota_origem
-                            rotas[j] = nova_rota_destino
-                            demandas[i] = sum(serv['demanda'] for serv in nova_rota_origem)
-                            demandas[j] = sum(serv['demanda'] for serv in nova_rota_destino)
-                            melhorou = True
-                            break  # Recomeça busca após melhoria
-                    if melhorou:
-                        break
-                if melhorou:
+                if prazo is not None and prazo.esgotado():
+                    melhorou = False
                     break
-            if melhorou:
+                if sem_melhoria.get((i, j)) == (versao[i], versao[j]):
+                    continue  # Nada mudou desde o último exame deste par
+                dados = blocos_da_rota(i)
+                if dados is None:
+                    sem_melhoria[(i, j)] = (versao[i], versao[j])
+                    continue
+                inicio, fim, demanda_bloco, primeiro, ultimo, ganho, servico_primeiro, servico_ultimo = dados
+                cabe = np.nonzero(demanda_bloco <= capacidade - demandas[j])[0]
+                if len(cabe) == 0:
+                    sem_melhoria[(i, j)] = (versao[i], versao[j])
+                    continue
+                if vizinhos is not None:
+                    e_destino = elementos_da_rota(rotas[j])
+                    if not vizinhos.proximo[np.ix_(elementos_da_rota(rotas[i])[1:-1], e_destino[:-1])].any():
+                        sem_melhoria[(i, j)] = (versao[i], versao[j])
+                        continue  # Nenhum serviço da rota i é vizinho de algum elemento da rota j
+
+                # Delta de inserir cada bloco entre cada par de posições consecutivas (p -> q) da rota de destino
+                x_in, x_out = nos_da_rota(rotas[j])
+                p, q = x_out[:-1], x_in[1:]
+                base = valores[p, q]
+                melhor_delta, melhor_bloco, melhor_pos = 0, None, None
+                passo = max(1, LIMITE_AVALIACOES_BLOCO // len(p))
+                for parte in range(0, len(cabe), passo):
+                    k = cabe[parte:parte + passo]
+                    delta = (
+                        valores[np.ix_(p, primeiro[k])].T + valores[np.ix_(ultimo[k], q)]
+                        - base[None, :] - ganho[k, None]
+                    )
+                    if vizinhos is not None:
+                        permitido = (
+                            vizinhos.proximo[np.ix_(e_destino[:-1], servico_primeiro[k])].T
+                            | vizinhos.proximo[np.ix_(servico_ultimo[k], e_destino[1:])]
+                        )
+                        delta = np.where(permitido, delta, 0)
+                    pos_min = int(np.argmin(delta))
+                    valor = delta.flat[pos_min]
+                    if valor < melhor_delta:
+                        melhor_delta = valor
+                        melhor_bloco, melhor_pos = int(k[pos_min // len(p)]), pos_min % len(p)
+
+                if melhor_bloco is None:
+                    sem_melhoria[(i, j)] = (versao[i], versao[j])
+                    continue
+
+                # Aplica o movimento no lugar
+                solucao.mover_segmento(i, int(inicio[melhor_bloco]), int(fim[melhor_bloco]), j, int(melhor_pos))
+                versao[i] += 1
+                versao[j] += 1
+                melhorou = True
+            if prazo is not None and prazo.esgotado():
+                melhorou = False
                 break
-        # Remove rotas vazias e sincroniza demandas
-        novas_rotas = []
-        novas_demandas = []
-        for r, d in zip(rotas, demandas):
-            if r:
-                novas_rotas.append(r)
-                novas_demandas.append(d)
-        rotas = novas_rotas
-        demandas = novas_demandas
+
+    # Remove rotas vazias (reindexando a solução)
+    solucao.remover_vazias()
 
     # Validação final: todos os serviços obrigatórios devem estar presentes e sem duplicatas
-    ids_esperados = set(s['id_servico'] for s in servicos_obrigatorios)
-    ids_nas_rotas = [serv['id_servico'] for rota in rotas for serv in rota]
-    if set(ids_nas_rotas) != ids_esperados or len(ids_nas_rotas) != len(set(ids_nas_rotas)):
+    servicos_nas_rotas = [s for rota in solucao.rotas for s in rota]
+    if set(servicos_nas_rotas) != set(range(len(tabela))) or len(servicos_nas_rotas) != len(tabela):
         raise Exception("Erro: serviços obrigatórios perdidos ou duplicados após segment relocate!")
 
-    return rotas, demandas
+    return solucao
 
 
 
@@ -459,6 +2191,7 @@ def salvar_solucao(
     tempo_referencia_execucao,
     tempo_referencia_solucao,
     deposito=0,
+    semente=None,
 ):
     """
     1. Objetivo:
@@ -471,9 +2204,12 @@ def salvar_solucao(
        - tempo_referencia_execucao: tempo total de execução (em ciclos ou ns).
        - tempo_referencia_solucao: tempo até encontrar a melhor solução (em ciclos ou ns).
        - deposito: índice do depósito.
+       - semente: semente base usada na otimização; se informada, é registrada em uma linha de comentário ("# semente: ...") após as rotas.
 
     3. Lógica:
        Para cada rota, calcula o custo, demanda e monta a linha de saída no formato especificado.
+       O deslocamento é avaliado por orientar_sequencia, e cada serviço é impresso com os nós de entrada e saída do sentido escolhido
+       (arestas podem aparecer como destino -> origem).
        Garante que cada serviço é impresso apenas uma vez por rota.
        Escreve o custo total, número de rotas, tempos e as rotas no arquivo.
 
@@ -488,9 +2224,9 @@ def salvar_solucao(
         servicos_unicos = {}
         demanda_rota = 0
         custo_servico_rota = 0
-        custo_transporte_rota = 0
 
-        destinos = []
+        entradas = []
+        saidas = []
 
         for serv in rota:
             id_s = serv["id_servico"]
@@ -499,13 +2235,16 @@ def salvar_solucao(
             servicos_unicos[id_s] = serv
             demanda_rota += serv["demanda"]
             custo_servico_rota += serv["custo_servico"]
-            destinos.append(serv["destino"])
+            # Arestas podem ser atendidas nos dois sentidos; vértices e arcos, apenas origem -> destino
+            origem, destino = serv["origem"], serv["destino"]
+            if serv["tipo"] == "aresta":
+                entradas.append((origem, destino))
+                saidas.append((destino, origem))
+            else:
+                entradas.append((origem, origem))
+                saidas.append((destino, destino))
 
-        if destinos:
-            custo_transporte_rota += matriz_distancias[deposito][destinos[0]]
-            for i in range(len(destinos) - 1):
-                custo_transporte_rota += matriz_distancias[destinos[i]][destinos[i + 1]]
-            custo_transporte_rota += matriz_distancias[destinos[-1]][deposito]
+        custo_transporte_rota, sentidos = orientar_sequencia(entradas, saidas, matriz_distancias, deposito)
 
         custo_rota = custo_servico_rota + custo_transporte_rota
         custo_total_solucao += custo_rota
@@ -514,23 +2253,25 @@ def salvar_solucao(
 
         linha = f"0 1 {idx_rota} {demanda_rota} {custo_rota} {total_visitas} (D {deposito},1,1)"
 
-        servicos_impressos = set()
-        for serv in rota:
-            id_s = serv["id_servico"]
-            if id_s in servicos_impressos:
-                continue
-            servicos_impressos.add(id_s)
-            linha += f" (S {id_s},{serv['origem']},{serv['destino']})"
+        # Cada serviço é impresso com os nós de entrada e saída no sentido escolhido
+        for (id_s, serv), entrada, saida, sentido in zip(servicos_unicos.items(), entradas, saidas, sentidos):
+            linha += f" (S {id_s},{entrada[sentido]},{saida[sentido]})"
 
         linha += f" (D {deposito},1,1)"
         linhas_rotas.append(linha)
 
-    with open(nome_arquivo, "w", encoding="utf-8") as f:
+    # Escreve em arquivo temporário e renomeia, para que um processo interrompido
+    # nunca deixe uma solução parcial (o executor em lote usa a existência do arquivo para retomar)
+    temporario = f"{nome_arquivo}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
         f.write(f"{custo_total_solucao}\n")
         f.write(f"{total_rotas}\n")
         f.write(f"{tempo_referencia_execucao}\n")
         f.write(f"{tempo_referencia_solucao}\n")
         for linha in linhas_rotas:
             f.write(linha + "\n")
+        if semente is not None:
+            f.write(f"# semente: {semente}\n")
+    os.replace(temporario, nome_arquivo)
 
     print(f"Solução salva em '{nome_arquivo}' com {total_rotas} rotas e custo total {custo_total_solucao}.")
\ No newline at end of file
@@ -0,0 +1,445 @@
+import multiprocessing
+import queue
+import random
+import time
+import traceback
+import numpy as np
+from array import array
+
+from tabela_servicos import TabelaServicos
+from algoritmo_construtivo import (
+    LIMITE_SAVINGS_COMPLETOS,
+    SEMENTE_PADRAO,
+    TOP_M_SAVINGS,
+    Prazo,
+    Solucao,
+    VizinhancaGranular,
+    calcular_savings,
+    clarke_wright_grasp,
+    converter_tempos,
+    derivar_semente,
+    segment_relocate,
+    split,
+    tour_gigante,
+    vnd,
+)
+
+# Parâmetros da população. Menores que os usuais da busca genética híbrida de Vidal (25 e 40),
+# pois a educação em Python custa dezenas de milissegundos e o orçamento típico permite poucas centenas de filhos.
+TAMANHO_POPULACAO = 10      # tamanho mínimo da população após a seleção de sobreviventes
+TAMANHO_GERACAO = 20        # filhos gerados antes de cada seleção de sobreviventes
+NUM_ELITE = 4               # indivíduos protegidos pela parcela de custo da aptidão enviesada
+NUM_PROXIMOS = 5            # vizinhos considerados na contribuição de diversidade
+
+# Iterações sem melhoria antes de reiniciar a população (mantendo o melhor indivíduo)
+ITERACOES_REINICIO = 300
+
+# Intervalo (em iterações) entre migrações no modelo de ilhas
+INTERVALO_MIGRACAO = 25
+
+
+class Individuo:
+    """
+    1. Objetivo:
+       Indivíduo da população: uma solução educada (rotas, sentidos e custo) e o seu cromossomo (tour gigante).
+
+    2. Entradas:
+       - solucao: Solucao já refinada pela busca local.
+
+    3. Lógica:
+       - O cromossomo é a concatenação das rotas (tour gigante), e sentido[s] guarda o sentido de travessia de cada serviço.
+       - sucessor[s] e antecessor[s] (arrays NumPy, com o depósito como len(tabela)) permitem calcular a distância
+         de pares quebrados entre dois indivíduos de forma vetorizada.
+
+    4. Contribuição:
+       Representação compacta e independente da Solucao de origem, usada no cruzamento, na gestão de diversidade e na migração entre ilhas.
+    """
+
+    def __init__(self, solucao):
+        self.rotas = [array("i", rota) for rota in solucao.rotas if rota]
+        self.demandas = [solucao.demanda[j] for j, rota in enumerate(solucao.rotas) if rota]
+        self.sentido = solucao.sentido[:]
+        self.custo = solucao.custo_total()
+        self.num_rotas = len(self.rotas)
+        self.tour = array("i")
+        for rota in self.rotas:
+            self.tour.extend(rota)
+
+        n = len(solucao.tabela)
+        self.sucessor = np.full(n, n, dtype=np.int64)
+        self.antecessor = np.full(n, n, dtype=np.int64)
+        for rota in self.rotas:
+            elementos = np.concatenate(([n], np.asarray(rota, dtype=np.int64), [n]))
+            self.sucessor[elementos[1:-1]] = elementos[2:]
+            self.antecessor[elementos[1:-1]] = elementos[:-2]
+
+    def melhor_que(self, outro):
+        # Mesma regra do multi-start: menor custo, depois menos rotas
+        return outro is None or (self.custo, self.num_rotas) < (outro.custo, outro.num_rotas)
+
+
+def distancia_pares_quebrados(a, b):
+    """
+    1. Objetivo:
+       Mede a diferença estrutural entre dois indivíduos (distância de pares quebrados, "broken pairs").
+
+    2. Entradas:
+       - a, b: Individuo.
+
+    3. Lógica:
+       Conta os serviços cujo sucessor em a não é vizinho (sucessor ou antecessor) do serviço em b, mais os inícios de rota de a
+       que não estão ligados ao depósito em b, e normaliza pelo número de serviços.
+       Os pares são tratados sem sentido, já que a reorientação e as inversões da busca local não mudam a estrutura.
+
+    4. Contribuição:
+       Base da contribuição de diversidade na aptidão enviesada e da detecção de clones na população.
+    """
+    n = len(a.sucessor)
+    deposito = n
+    quebrados = np.count_nonzero((a.sucessor != b.sucessor) & (a.sucessor != b.antecessor))
+    quebrados += np.count_nonzero((a.antecessor == deposito) & (b.antecessor != deposito) & (b.sucessor != deposito))
+    return quebrados / n
+
+
+def crossover_ox(pai1, pai2, rng):
+    """
+    1. Objetivo:
+       Cruzamento por ordem (OX) entre dois tours gigantes.
+
+    2. Entradas:
+       - pai1, pai2: Individuo.
+       - rng: random.Random.
+
+    3. Lógica:
+       Copia um trecho circular aleatório do tour de pai1 para as mesmas posições do filho e completa as posições restantes,
+       a partir do fim do trecho, com os serviços que faltam na ordem em que aparecem em pai2 (também a partir do fim do trecho).
+       Cada serviço herda o sentido do pai que forneceu o gene.
+
+    4. Contribuição:
+       Gera filhos que preservam subsequências dos dois pais; o split decide depois a melhor divisão em rotas.
+       Retorna (tour, sentidos).
+    """
+    tour1, tour2 = pai1.tour, pai2.tour
+    n = len(tour1)
+    inicio = rng.randrange(n)
+    fim = rng.randrange(n)
+    while fim == inicio and n > 1:
+        fim = rng.randrange(n)
+
+    filho = [0] * n
+    sentidos = [0] * n
+    usado = bytearray(n)
+    pos = inicio
+    while True:
+        s = tour1[pos]
+        filho[pos] = s
+        sentidos[pos] = pai1.sentido[s]
+        usado[s] = 1
+        if pos == fim:
+            break
+        pos = (pos + 1) % n
+
+    pos = (fim + 1) % n
+    for t in range(n):
+        s = tour2[(fim + 1 + t) % n]
+        if not usado[s]:
+            filho[pos] = s
+            sentidos[pos] = pai2.sentido[s]
+            pos = (pos + 1) % n
+    return filho, sentidos
+
+
+class Populacao:
+    """
+    1. Objetivo:
+       População de indivíduos viáveis com gestão de diversidade por aptidão enviesada (busca genética híbrida).
+
+    2. Entradas:
+       - tamanho_minimo: tamanho da população após a seleção de sobreviventes.
+       - tamanho_geracao: filhos admitidos antes de cada seleção de sobreviventes.
+       - num_elite, num_proximos: parâmetros da aptidão enviesada.
+
+    3. Lógica:
+       - Mantém a matriz de distâncias de pares quebrados entre os indivíduos, atualizada a cada inserção e remoção.
+       - Aptidão enviesada = posto no custo + (1 - num_elite / tamanho) * posto na diversidade (distância média aos num_proximos mais próximos),
+         ambos normalizados para [0, 1]; é recalculada apenas quando a população muda.
+       - Ao atingir tamanho_minimo + tamanho_geracao, remove um a um os indivíduos de pior aptidão, dando prioridade aos clones (distância 0).
+       - Os pais são escolhidos por torneio binário na aptidão enviesada.
+
+    4. Contribuição:
+       Equilibra intensificação (custo) e diversificação (distância), evitando a convergência prematura da população.
+    """
+
+    def __init__(self, tamanho_minimo=TAMANHO_POPULACAO, tamanho_geracao=TAMANHO_GERACAO,
+                 num_elite=NUM_ELITE, num_proximos=NUM_PROXIMOS):
+        self.tamanho_minimo = tamanho_minimo
+        self.tamanho_geracao = tamanho_geracao
+        self.num_elite = num_elite
+        self.num_proximos = num_proximos
+        self.individuos = []
+        self.distancias = []   # distancias[a][b]: distância de pares quebrados entre os indivíduos a e b
+        self._aptidao = None
+
+    def __len__(self):
+        return len(self.individuos)
+
+    def adicionar(self, individuo):
+        linha = [distancia_pares_quebrados(individuo, outro) for outro in self.individuos]
+        for d, outra in zip(linha, self.distancias):
+            outra.append(d)
+        self.distancias.append(linha + [0.0])
+        self.individuos.append(individuo)
+        self._aptidao = None
+        if len(self.individuos) >= self.tamanho_minimo + self.tamanho_geracao:
+            self.selecionar_sobreviventes()
+
+    def _remover(self, idx):
+        del self.individuos[idx]
+        del self.distancias[idx]
+        for linha in self.distancias:
+            del linha[idx]
+        self._aptidao = None
+
+    def aptidao(self):
+        if self._aptidao is not None:
+            return self._aptidao
+        tamanho = len(self.individuos)
+        if tamanho == 1:
+            self._aptidao = [0.0]
+            return self._aptidao
+        diversidade = []
+        for idx, linha in enumerate(self.distancias):
+            outras = sorted(d for j, d in enumerate(linha) if j != idx)[:self.num_proximos]
+            diversidade.append(sum(outras) / len(outras))
+        posto_custo = _postos([(ind.custo, ind.num_rotas) for ind in self.individuos])
+        posto_diversidade = _postos([-d for d in diversidade])
+        peso = 1 - min(self.num_elite, tamanho) / tamanho
+        self._aptidao = [
+            (posto_custo[idx] + peso * posto_diversidade[idx]) / (tamanho - 1) for idx in range(tamanho)
+        ]
+        return self._aptidao
+
+    def selecionar_sobreviventes(self):
+        while len(self.individuos) > self.tamanho_minimo:
+            aptidao = self.aptidao()
+            clones = [idx for idx, linha in enumerate(self.distancias)
+                      if any(d == 0 for j, d in enumerate(linha) if j != idx)]
+            candidatos = clones or range(len(self.individuos))
+            self._remover(max(candidatos, key=lambda idx: aptidao[idx]))
+
+    def torneio(self, rng):
+        aptidao = self.aptidao()
+        a = rng.randrange(len(self.individuos))
+        b = rng.randrange(len(self.individuos))
+        return self.individuos[a if aptidao[a] <= aptidao[b] else b]
+
+
+def _postos(chaves):
+    # Posto (0 = melhor) de cada posição segundo a chave
+    postos = [0] * len(chaves)
+    for posto, idx in enumerate(sorted(range(len(chaves)), key=lambda idx: chaves[idx])):
+        postos[idx] = posto
+    return postos
+
+
+def educar(rotas, tabela, deposito, matriz_distancias, capacidade, vizinhos, prazo=None):
+    """
+    Etapa de educação: refina as rotas com vnd e segment_relocate (as mesmas buscas locais do multi-start) e devolve o Individuo.
+    """
+    solucao = Solucao(tabela, deposito, matriz_distancias, capacidade, rotas)
+    vnd(solucao, vizinhos=vizinhos, prazo=prazo)
+    segment_relocate(solucao, vizinhos=vizinhos, prazo=prazo)
+    return Individuo(solucao)
+
+
+def evoluir(contexto, rng, prazo, max_iteracoes=None, entrada=None, saida=None):
+    """
+    1. Objetivo:
+       Laço principal da busca genética híbrida em uma população (uma ilha).
+
+    2. Entradas:
+       - contexto: (tabela, deposito, matriz_distancias, capacidade, k_grasp, vizinhos).
+       - rng: random.Random da ilha.
+       - prazo: Prazo que encerra a busca.
+       - max_iteracoes: limite opcional de filhos gerados (None = até o prazo).
+       - entrada, saida: filas de migração (multiprocessing.Queue) do modelo de ilhas, ou None.
+
+    3. Lógica:
+       - População inicial: alterna soluções Clarke & Wright GRASP (com a lista de savings calculada uma única vez)
+         e tours gigantes randomizados (tour_gigante + split), todos educados.
+       - A cada iteração: dois pais por torneio binário, cruzamento OX, decodificação por split, educação e inserção na população.
+       - Após ITERACOES_REINICIO iterações sem melhoria, a população é recriada, mantendo apenas o melhor indivíduo.
+       - A cada INTERVALO_MIGRACAO iterações, envia o melhor indivíduo para a próxima ilha e insere os migrantes recebidos.
+       - O prazo é verificado entre as etapas e repassado às buscas locais, que param de forma limpa.
+
+    4. Contribuição:
+       Aproveita todo o orçamento de tempo acumulando informação entre soluções, em vez de descartar cada tentativa como o multi-start.
+       Retorna (melhor Individuo, clock em que foi encontrado, número de iterações).
+    """
+    tabela, deposito, matriz_distancias, capacidade, k_grasp, vizinhos = contexto
+    populacao = Populacao(tamanho_minimo=TAMANHO_POPULACAO, tamanho_geracao=TAMANHO_GERACAO)
+    melhor = None
+    clock_melhor = None
+
+    def registrar(individuo):
+        nonlocal melhor, clock_melhor
+        populacao.adicionar(individuo)
+        if individuo.melhor_que(melhor):
+            melhor, clock_melhor = individuo, time.perf_counter_ns()
+            return True
+        return False
+
+    def decodificar(tour, sentidos):
+        rotas, _ = split(tour, sentidos, tabela, deposito, matriz_distancias, capacidade)
+        return educar(rotas, tabela, deposito, matriz_distancias, capacidade, vizinhos, prazo)
+
+    savings = calcular_savings(
+        tabela, deposito, matriz_distancias,
+        top_m=TOP_M_SAVINGS if len(tabela) > LIMITE_SAVINGS_COMPLETOS else None
+    )
+
+    def povoar():
+        # A primeira construção sempre acontece, para haver solução mesmo com prazo curto
+        construidos = 0
+        while len(populacao) < TAMANHO_POPULACAO and (construidos == 0 or not prazo.esgotado()):
+            if construidos % 2 == 0:
+                rotas, _ = clarke_wright_grasp(
+                    tabela, deposito, matriz_distancias, capacidade, k=k_grasp, rng=rng, savings=savings
+                )
+                registrar(educar(rotas, tabela, deposito, matriz_distancias, capacidade, vizinhos, prazo))
+            else:
+                registrar(decodificar(*tour_gigante(tabela, deposito, matriz_distancias, rng=rng, vizinhos=vizinhos)))
+            construidos += 1
+
+    povoar()
+    iteracao = 0
+    sem_melhoria = 0
+    while not prazo.esgotado() and (max_iteracoes is None or iteracao < max_iteracoes):
+        iteracao += 1
+        pai1, pai2 = populacao.torneio(rng), populacao.torneio(rng)
+        filho = decodificar(*crossover_ox(pai1, pai2, rng))
+        sem_melhoria = 0 if registrar(filho) else sem_melhoria + 1
+
+        if entrada is not None and iteracao % INTERVALO_MIGRACAO == 0:
+            saida.put((melhor.rotas, melhor.sentido))
+            while True:
+                try:
+                    rotas, _ = entrada.get_nowait()
+                except queue.Empty:
+                    break
+                migrante = Individuo(Solucao(tabela, deposito, matriz_distancias, capacidade, rotas))
+                sem_melhoria = 0 if registrar(migrante) else sem_melhoria
+
+        if sem_melhoria >= ITERACOES_REINICIO:
+            populacao = Populacao(tamanho_minimo=TAMANHO_POPULACAO, tamanho_geracao=TAMANHO_GERACAO)
+            populacao.adicionar(melhor)
+            povoar()
+            sem_melhoria = 0
+    return melhor, clock_melhor, iteracao
+
+
+def _executar_ilha(conexao, contexto, semente, prazo, max_iteracoes, entrada, saida):
+    """
+    Corpo do processo de uma ilha: executa evoluir e envia ao processo principal o melhor indivíduo ("ok") ou o traceback ("erro").
+    """
+    # A ilha não espera que os migrantes ainda não lidos sejam entregues para poder terminar
+    saida.cancel_join_thread()
+    try:
+        melhor, clock_melhor, iteracoes = evoluir(
+            contexto, random.Random(semente), prazo, max_iteracoes, entrada=entrada, saida=saida
+        )
+        conexao.send(("ok", (melhor.custo, melhor.num_rotas, melhor.rotas, melhor.demandas, clock_melhor, iteracoes)))
+    except BaseException:
+        conexao.send(("erro", traceback.format_exc()))
+    finally:
+        conexao.close()
+
+
+def algoritmo_genetico(
+    servicos,
+    deposito,
+    matriz_distancias,
+    capacidade,
+    servicos_obrigatorios,
+    tempo_limite,
+    k_grasp=10,
+    freq_hz=None,
+    num_ilhas=1,
+    semente=SEMENTE_PADRAO,
+    max_iteracoes=None
+):
+    """
+    1. Objetivo:
+       Otimizador populacional (algoritmo memético / busca genética híbrida), alternativo ao multi_start_pipeline, com orçamento de tempo.
+
+    2. Entradas:
+       - servicos, deposito, matriz_distancias, capacidade, servicos_obrigatorios, k_grasp, freq_hz: como em multi_start_pipeline.
+       - tempo_limite: orçamento de tempo de parede, em segundos.
+       - num_ilhas: número de populações independentes, cada uma em um processo (modelo de ilhas); 1 = sequencial.
+       - semente: semente base; a ilha i usa um gerador próprio com semente derivar_semente(semente, i).
+       - max_iteracoes: limite opcional de filhos por ilha.
+
+    3. Lógica:
+       - Cromossomos são tours gigantes, decodificados pelo split e educados por vnd + segment_relocate (evoluir).
+       - Com num_ilhas > 1, cada ilha roda em um processo (fork, herdando a matriz e a vizinhança granular) e, periodicamente,
+         envia o seu melhor indivíduo para a ilha seguinte (anel de filas).
+       - Escolhe o melhor resultado das ilhas (menor custo, depois menos rotas) e valida que todos os serviços obrigatórios estão presentes.
+
+    4. Contribuição:
+       Usa o mesmo orçamento de tempo do multi-start para obter custos menores, e escala com o número de núcleos.
+       Retorna (rotas como dicionários, demandas, tempo total, tempo até a melhor solução), no mesmo formato de multi_start_pipeline.
+    """
+    clock_inicio = time.perf_counter_ns()
+    tabela = servicos if isinstance(servicos, TabelaServicos) else TabelaServicos.de_servicos(servicos)
+    ids_obrigatorios = frozenset(
+        servicos_obrigatorios.id if isinstance(servicos_obrigatorios, TabelaServicos)
+        else (s['id_servico'] for s in servicos_obrigatorios)
+    )
+    vizinhos = VizinhancaGranular(tabela, deposito, matriz_distancias)
+    contexto = (tabela, deposito, matriz_distancias, capacidade, k_grasp, vizinhos)
+    prazo = Prazo(tempo_limite)
+
+    resultados = []
+    if num_ilhas > 1:
+        metodos = multiprocessing.get_all_start_methods()
+        mp_contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        filas = [mp_contexto.Queue() for _ in range(num_ilhas)]
+        ilhas = []
+        for i in range(num_ilhas):
+            leitura, escrita = mp_contexto.Pipe(duplex=False)
+            processo = mp_contexto.Process(
+                target=_executar_ilha,
+                args=(escrita, contexto, derivar_semente(semente, i), prazo, max_iteracoes, filas[i], filas[(i + 1) % num_ilhas])
+            )
+            processo.start()
+            escrita.close()
+            ilhas.append((processo, leitura))
+        for i, (processo, leitura) in enumerate(ilhas):
+            try:
+                status, detalhe = leitura.recv()
+            except EOFError:
+                status, detalhe = "erro", "processo terminou sem relatar"
+            processo.join()
+            leitura.close()
+            if status == "ok":
+                resultados.append(detalhe)
+            else:
+                print(f"[Ilha {i+1}] {detalhe}")
+    else:
+        melhor, clock_melhor, iteracoes = evoluir(contexto, random.Random(derivar_semente(semente, 0)), prazo, max_iteracoes)
+        resultados.append((melhor.custo, melhor.num_rotas, melhor.rotas, melhor.demandas, clock_melhor, iteracoes))
+
+    melhor_rotas = melhor_demandas = melhor_clock = None
+    if resultados:
+        custo, num_rotas, melhor_rotas, melhor_demandas, melhor_clock, _ = min(resultados, key=lambda r: (r[0], r[1]))
+        iteracoes = sum(r[5] for r in resultados)
+        ids_nas_rotas = [tabela.id[s] for rota in melhor_rotas for s in rota]
+        if set(ids_nas_rotas) != ids_obrigatorios or len(ids_nas_rotas) != len(set(ids_nas_rotas)):
+            raise Exception("Erro: serviços obrigatórios perdidos ou duplicados na busca genética!")
+        print(f"\nMelhor solução genética: custo {custo}, rotas {num_rotas} ({iteracoes} iterações em {len(resultados)} ilha(s))")
+        melhor_rotas = tabela.rotas_como_dicts(melhor_rotas)
+    else:
+        print("Nenhuma solução válida encontrada!")
+
+    clock_total, clock_melhor = converter_tempos(clock_inicio, time.perf_counter_ns(), melhor_clock, freq_hz)
+    return melhor_rotas, melhor_demandas, clock_total, clock_melhor
@@ -0,0 +1,420 @@
+import argparse
+import contextlib
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+import traceback
+
+from leitor_grafo import leitor_arquivo, criar_matriz_distancias_requeridas, extrair_servicos
+from tabela_servicos import TabelaServicos
+from algoritmo_construtivo import (
+    LIMITE_SAVINGS_COMPLETOS,
+    TOP_M_SAVINGS,
+    VizinhancaGranular,
+    calcular_savings,
+    derivar_semente,
+    executar_tentativa,
+)
+
+# Famílias de instâncias, reconhecidas pelo prefixo do nome do arquivo
+FAMILIAS = ("BHW", "CBMix", "DI-NEARP", "EGL", "mggdb", "mgval")
+
+# Etapas cronometradas, na ordem do pipeline
+ETAPAS = ("leitura", "distancias", "preparacao", "construcao", "vnd", "segment_relocate")
+
+# Comparação entre execuções: aumentos relativos de tempo e de custo tolerados, e diferença mínima de tempo (s)
+# para que oscilações em instâncias de poucos milissegundos não sejam acusadas como regressão
+TOLERANCIA_TEMPO = 0.25
+TOLERANCIA_CUSTO = 0.0
+TEMPO_MINIMO_REGRESSAO = 0.05
+
+COLUNAS_CSV = (
+    "instancia", "familia", "status", "servicos", "semente", "custo", "rotas", "otimo", "gap",
+    *(f"tempo_{etapa}" for etapa in ETAPAS), "tempo_total", "rss_pico_mb",
+)
+
+
+def familia_instancia(nome):
+    """
+    Família de uma instância pelo prefixo do nome (ex.: "DI-NEARP-n240-Q2k" -> "DI-NEARP"), ou None se não for reconhecida.
+    """
+    for familia in sorted(FAMILIAS, key=len, reverse=True):
+        if nome.startswith(familia):
+            return familia
+    return None
+
+
+def selecionar_instancias(pasta, familias=None, nomes=None, limite_por_familia=None):
+    """
+    1. Objetivo:
+       Escolhe o subconjunto de instâncias .dat de uma pasta a ser executado no benchmark.
+
+    2. Entradas:
+       - pasta: diretório das instâncias.
+       - familias: famílias a incluir (FAMILIAS); None = todas.
+       - nomes: nomes de instâncias (sem extensão) a incluir; None = todos.
+       - limite_por_familia: número máximo de instâncias por família (as primeiras em ordem alfabética); None = sem limite.
+
+    3. Lógica:
+       Filtra os arquivos por família e nome e os mantém em ordem alfabética, de modo que o mesmo filtro
+       seleciona sempre o mesmo subconjunto.
+
+    4. Contribuição:
+       Permite repetir o benchmark sobre subconjuntos fixos (ex.: 5 instâncias de cada família) entre commits.
+    """
+    selecionados = []
+    por_familia = {}
+    for arquivo in sorted(os.listdir(pasta)):
+        if not arquivo.endswith(".dat"):
+            continue
+        nome = os.path.splitext(arquivo)[0]
+        familia = familia_instancia(nome)
+        if familias is not None and familia not in familias:
+            continue
+        if nomes is not None and nome not in nomes:
+            continue
+        if limite_por_familia is not None and por_familia.get(familia, 0) >= limite_por_familia:
+            continue
+        por_familia[familia] = por_familia.get(familia, 0) + 1
+        selecionados.append(arquivo)
+    return selecionados
+
+
+def executar_instancia(caminho, num_tentativas=5, k_grasp=10, semente=None):
+    """
+    1. Objetivo:
+       Executa o pipeline de uma instância (tentativas sequenciais do multi-start), cronometrando cada etapa.
+
+    2. Entradas:
+       - caminho: caminho do arquivo .dat.
+       - num_tentativas: número de tentativas (construção + VND + segment_relocate).
+       - k_grasp: parâmetro top-k do GRASP.
+       - semente: semente base; None = derivada do nome da instância, como em main.processar_arquivo.
+
+    3. Lógica:
+       - Mede a leitura (leitor_arquivo + extrair_servicos), as distâncias (matriz compacta, sem cache em disco, para medir o cálculo)
+         e a preparação (tabela de serviços, vizinhança granular e savings), como no multi_start_pipeline.
+       - Executa as tentativas com executar_tentativa, que acumula os tempos de construção, VND e segment_relocate.
+       - Escolhe a melhor tentativa (menor custo, depois menos rotas) e calcula o gap para o "Optimal value" do cabeçalho,
+         quando conhecido (valores <= 0 indicam ótimo desconhecido). Em famílias cujo valor de referência segue outra convenção de custo,
+         o gap pode ser negativo; ele continua útil para comparar execuções entre si.
+       - O pico de memória residente é o do processo (ru_maxrss, em KB no Linux); executar_benchmark roda cada instância
+         em um processo próprio para que ele corresponda a uma única instância.
+
+    4. Contribuição:
+       Unidade de medida do benchmark. Retorna um dicionário com custo, rotas, gap, semente, tempos por etapa e pico de memória.
+    """
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    semente = derivar_semente(nome) if semente is None else semente
+    tempos = dict.fromkeys(ETAPAS, 0.0)
+    inicio = instante = time.perf_counter()
+
+    dados = leitor_arquivo(caminho)
+    servicos = extrair_servicos(dados)
+    header = dados["header"]
+    capacidade = int(header["Capacity"])
+    deposito = int(header.get("Depot Node", 0))
+    agora = time.perf_counter()
+    tempos["leitura"], instante = agora - instante, agora
+
+    matriz_distancias = criar_matriz_distancias_requeridas(
+        dados["vertices"], dados["arestas"], dados["arcos"], servicos, deposito
+    )
+    agora = time.perf_counter()
+    tempos["distancias"], instante = agora - instante, agora
+
+    tabela = TabelaServicos.de_servicos(servicos)
+    ids_obrigatorios = frozenset(tabela.id)
+    vizinhos = VizinhancaGranular(tabela, deposito, matriz_distancias)
+    savings = calcular_savings(
+        tabela, deposito, matriz_distancias,
+        top_m=TOP_M_SAVINGS if len(tabela) > LIMITE_SAVINGS_COMPLETOS else None
+    )
+    agora = time.perf_counter()
+    tempos["preparacao"] = agora - instante
+
+    melhor = None
+    for tentativa in range(num_tentativas):
+        resultado = executar_tentativa(
+            tentativa, tabela, deposito, matriz_distancias, capacidade, ids_obrigatorios, k_grasp, vizinhos, savings,
+            semente=semente, tempos=tempos
+        )
+        if resultado is not None and (melhor is None or resultado[:2] < melhor[:2]):
+            melhor = resultado
+    tempo_total = time.perf_counter() - inicio
+
+    try:
+        otimo = float(header.get("Optimal value", -1))
+    except ValueError:
+        otimo = -1
+    custo = melhor[0] if melhor is not None else None
+    gap = 100.0 * (custo - otimo) / otimo if custo is not None and otimo > 0 else None
+    return {
+        "instancia": nome,
+        "familia": familia_instancia(nome),
+        "status": "ok" if melhor is not None else "invalida",
+        "servicos": len(tabela),
+        "semente": semente,
+        "custo": custo,
+        "rotas": melhor[1] if melhor is not None else None,
+        "otimo": otimo if otimo > 0 else None,
+        "gap": gap,
+        "tempos": tempos,
+        "tempo_total": tempo_total,
+        "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _executar_em_processo(conexao, caminho, opcoes):
+    """
+    Corpo do processo de uma instância: executa executar_instancia (sem as mensagens do pipeline) e envia
+    o resultado ("ok") ou o traceback da exceção ("erro").
+    """
+    try:
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            resultado = executar_instancia(caminho, **opcoes)
+        conexao.send(("ok", resultado))
+    except BaseException:
+        conexao.send(("erro", traceback.format_exc()))
+    finally:
+        conexao.close()
+
+
+def executar_benchmark(arquivos, pasta, num_tentativas=5, k_grasp=10, semente=None, tempo_limite=None):
+    """
+    1. Objetivo:
+       Executa o benchmark sobre uma lista de instâncias, uma de cada vez, cada uma em um processo próprio.
+
+    2. Entradas:
+       - arquivos: nomes dos arquivos .dat (selecionar_instancias).
+       - pasta: diretório das instâncias.
+       - num_tentativas, k_grasp, semente: repassados a executar_instancia.
+       - tempo_limite: tempo máximo de parede por instância, em segundos (None = sem limite).
+
+    3. Lógica:
+       As instâncias rodam em sequência, para que uma não interfira na medição de tempo da outra, e cada uma em um processo
+       novo (fork), cujo pico de memória (ru_maxrss) começa na memória herdada do processo principal, e não no pico de instâncias anteriores.
+       Falhas e estouros de tempo são registrados no resultado da instância (status e detalhe), sem interromper o benchmark.
+
+    4. Contribuição:
+       Produz resultados comparáveis entre commits: mesmas instâncias, mesmas sementes e medições isoladas por instância.
+       Retorna a lista de resultados, na ordem dos arquivos.
+    """
+    metodos = multiprocessing.get_all_start_methods()
+    mp_contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+    opcoes = {"num_tentativas": num_tentativas, "k_grasp": k_grasp, "semente": semente}
+    resultados = []
+    for arquivo in arquivos:
+        nome = os.path.splitext(arquivo)[0]
+        leitura, escrita = mp_contexto.Pipe(duplex=False)
+        processo = mp_contexto.Process(target=_executar_em_processo, args=(escrita, os.path.join(pasta, arquivo), opcoes))
+        processo.start()
+        escrita.close()
+        if leitura.poll(tempo_limite):
+            try:
+                status, detalhe = leitura.recv()
+            except EOFError:
+                status, detalhe = "erro", "processo terminou sem relatar"
+        else:
+            processo.terminate()
+            status, detalhe = "tempo esgotado", f"excedeu {tempo_limite} s"
+        processo.join()
+        leitura.close()
+
+        if status == "ok":
+            resultado = detalhe
+            gap = f"{resultado['gap']:+.2f}%" if resultado["gap"] is not None else "-"
+            print(
+                f"{nome:<24} custo {resultado['custo']!s:>8} rotas {resultado['rotas']!s:>4} gap {gap:>8}"
+                f" tempo {resultado['tempo_total']:8.2f} s  RSS {resultado['rss_pico_mb']:7.1f} MB"
+            )
+        else:
+            resultado = {"instancia": nome, "familia": familia_instancia(nome), "status": status, "detalhe": detalhe}
+            print(f"{nome:<24} [{status}] {detalhe.strip().splitlines()[-1]}")
+        resultados.append(resultado)
+    return resultados
+
+
+def _commit_atual():
+    # Commit do repositório em que o benchmark roda (None fora de um repositório git)
+    try:
+        saida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        return saida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def salvar_resultados(resultados, metadados, caminho_base):
+    """
+    1. Objetivo:
+       Grava os resultados do benchmark em JSON (completo, com metadados) e em CSV (uma linha por instância).
+
+    2. Entradas:
+       - resultados: lista devolvida por executar_benchmark.
+       - metadados: parâmetros da execução (commit, data, tentativas, etc.).
+       - caminho_base: caminho sem extensão; são gravados caminho_base + ".json" e caminho_base + ".csv".
+
+    3. Lógica:
+       No CSV, os tempos por etapa viram colunas tempo_<etapa>; campos ausentes (ex.: instâncias com falha) ficam vazios.
+
+    4. Contribuição:
+       O JSON é a entrada de comparar_resultados em execuções futuras; o CSV serve para planilhas e gráficos.
+    """
+    os.makedirs(os.path.dirname(caminho_base) or ".", exist_ok=True)
+    with open(caminho_base + ".json", "w", encoding="utf-8") as f:
+        json.dump({"metadados": metadados, "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    with open(caminho_base + ".csv", "w", encoding="utf-8", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUNAS_CSV, extrasaction="ignore")
+        escritor.writeheader()
+        for resultado in resultados:
+            linha = dict(resultado)
+            for etapa, duracao in resultado.get("tempos", {}).items():
+                linha[f"tempo_{etapa}"] = duracao
+            escritor.writerow(linha)
+
+
+def comparar_resultados(
+    atuais,
+    anteriores,
+    tolerancia_tempo=TOLERANCIA_TEMPO,
+    tolerancia_custo=TOLERANCIA_CUSTO,
+    tempo_minimo=TEMPO_MINIMO_REGRESSAO
+):
+    """
+    1. Objetivo:
+       Aponta as regressões de qualidade e de tempo de uma execução do benchmark em relação a uma execução anterior.
+
+    2. Entradas:
+       - atuais: resultados da execução atual.
+       - anteriores: resultados da execução de referência (lista "resultados" do JSON de salvar_resultados).
+       - tolerancia_tempo: aumento relativo de tempo total tolerado (0.25 = 25%).
+       - tolerancia_custo: aumento relativo de custo tolerado (0 = qualquer piora é regressão).
+       - tempo_minimo: aumento absoluto de tempo (s) abaixo do qual a diferença é considerada ruído.
+
+    3. Lógica:
+       Compara as instâncias presentes nas duas execuções: custo maior que o anterior além da tolerância, tempo total maior
+       além das duas tolerâncias, ou instância que deixou de terminar com status "ok". Instâncias só de uma das execuções são ignoradas.
+       Como as sementes são fixas, diferenças de custo vêm do código, e não do acaso.
+
+    4. Contribuição:
+       Permite acusar automaticamente, entre commits, alterações que pioram as soluções ou o desempenho.
+       Retorna uma lista de dicionários (instancia, tipo: "custo", "tempo" ou "falha", anterior, atual).
+    """
+    referencia = {r["instancia"]: r for r in anteriores}
+    regressoes = []
+    for atual in atuais:
+        anterior = referencia.get(atual["instancia"])
+        if anterior is None or anterior.get("status") != "ok":
+            continue
+        if atual.get("status") != "ok":
+            regressoes.append({"instancia": atual["instancia"], "tipo": "falha", "anterior": "ok", "atual": atual.get("status")})
+            continue
+        if atual["custo"] > anterior["custo"] * (1 + tolerancia_custo):
+            regressoes.append({"instancia": atual["instancia"], "tipo": "custo", "anterior": anterior["custo"], "atual": atual["custo"]})
+        aumento = atual["tempo_total"] - anterior["tempo_total"]
+        if aumento > tempo_minimo and aumento > anterior["tempo_total"] * tolerancia_tempo:
+            regressoes.append({
+                "instancia": atual["instancia"], "tipo": "tempo", "anterior": anterior["tempo_total"], "atual": atual["tempo_total"]
+            })
+    return regressoes
+
+
+def resumir(resultados):
+    """
+    Imprime, por família, o número de instâncias resolvidas, o gap médio (só as de ótimo conhecido), o tempo por etapa e o pico de memória.
+    """
+    print(f"\n{'Família':<10} {'Inst.':>5} {'Gap médio':>10} " + " ".join(f"{etapa[:10]:>10}" for etapa in ETAPAS) + f" {'Total (s)':>10} {'RSS (MB)':>9}")
+    familias = sorted({r["familia"] or "-" for r in resultados})
+    for familia in familias:
+        grupo = [r for r in resultados if (r["familia"] or "-") == familia and r.get("status") == "ok"]
+        if not grupo:
+            continue
+        gaps = [r["gap"] for r in grupo if r["gap"] is not None]
+        gap = f"{sum(gaps) / len(gaps):+.2f}%" if gaps else "-"
+        etapas = " ".join(f"{sum(r['tempos'].get(etapa, 0.0) for r in grupo):10.2f}" for etapa in ETAPAS)
+        total = sum(r["tempo_total"] for r in grupo)
+        rss = max(r["rss_pico_mb"] for r in grupo)
+        print(f"{familia:<10} {len(grupo):>5} {gap:>10} {etapas} {total:10.2f} {rss:9.1f}")
+
+
+def main():
+    """
+    1. Objetivo:
+       Interface de linha de comando do benchmark: seleciona as instâncias, executa, grava os resultados e compara com uma execução anterior.
+
+    2. Entradas:
+       Argumentos da linha de comando (python benchmark.py --help).
+
+    3. Lógica interna:
+       - Seleciona as instâncias (selecionar_instancias) e executa o benchmark (executar_benchmark).
+       - Grava <saida>/benchmark-<commit>-<data>.json/.csv com os metadados da execução e imprime o resumo por família.
+       - Com --comparar, carrega o JSON de referência e lista as regressões (comparar_resultados).
+
+    4. Contribuição:
+       Ponto de entrada para medir o efeito de cada alteração do código sobre um subconjunto fixo das instâncias.
+       Termina com código 1 se houver regressões, para uso em scripts.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline CARP sobre as instâncias de dados/.")
+    parser.add_argument("--pasta", default="dados", help="diretório das instâncias .dat")
+    parser.add_argument("--familias", nargs="+", choices=FAMILIAS, help="famílias a executar (padrão: todas)")
+    parser.add_argument("--instancias", nargs="+", help="nomes de instâncias (sem extensão) a executar")
+    parser.add_argument("--limite", type=int, help="máximo de instâncias por família")
+    parser.add_argument("--tentativas", type=int, default=5, help="tentativas do multi-start por instância")
+    parser.add_argument("--k-grasp", type=int, default=10, help="parâmetro top-k do GRASP")
+    parser.add_argument("--semente", type=int, help="semente base fixa (padrão: derivada do nome de cada instância)")
+    parser.add_argument("--tempo-limite", type=float, help="tempo máximo por instância, em segundos")
+    parser.add_argument("--saida", default="benchmarks", help="diretório dos resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior, para apontar regressões")
+    parser.add_argument("--tolerancia-tempo", type=float, default=TOLERANCIA_TEMPO)
+    parser.add_argument("--tolerancia-custo", type=float, default=TOLERANCIA_CUSTO)
+    args = parser.parse_args()
+
+    arquivos = selecionar_instancias(args.pasta, args.familias, args.instancias, args.limite)
+    if not arquivos:
+        print("Nenhuma instância selecionada.")
+        return 0
+
+    data = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    commit = _commit_atual()
+    metadados = {
+        "commit": commit,
+        "data": data,
+        "python": sys.version.split()[0],
+        "tentativas": args.tentativas,
+        "k_grasp": args.k_grasp,
+        "semente": args.semente,
+        "instancias": len(arquivos),
+    }
+    resultados = executar_benchmark(
+        arquivos, args.pasta, num_tentativas=args.tentativas, k_grasp=args.k_grasp, semente=args.semente,
+        tempo_limite=args.tempo_limite
+    )
+    resumir(resultados)
+    caminho_base = os.path.join(args.saida, f"benchmark-{commit or 'local'}-{data}")
+    salvar_resultados(resultados, metadados, caminho_base)
+    print(f"\nResultados salvos em '{caminho_base}.json' e '{caminho_base}.csv'.")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        regressoes = comparar_resultados(
+            resultados, referencia["resultados"], tolerancia_tempo=args.tolerancia_tempo, tolerancia_custo=args.tolerancia_custo
+        )
+        print(f"\nComparação com {args.comparar} (commit {referencia['metadados'].get('commit')}): {len(regressoes)} regressão(ões).")
+        for r in regressoes:
+            print(f"  {r['instancia']:<24} {r['tipo']:<6} {r['anterior']} -> {r['atual']}")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import numpy as np
+
+from distancias import MatrizDistancias
+
+# Versão do formato em disco; alterar invalida as entradas antigas do cache
+VERSAO_CACHE = 1
+
+
+class CacheDistancias:
+    """
+    1. Objetivo:
+       Cache persistente em disco de matrizes de distâncias, indexado pelo conteúdo do grafo (hash das arestas e arcos).
+
+    2. Entradas:
+       - pasta: diretório onde os arquivos .npy do cache são guardados.
+       - limite_bytes: orçamento máximo de espaço em disco ocupado pelo cache.
+
+    3. Lógica:
+       - Cada entrada é composta por dois arquivos .npy: os valores da matriz e os rótulos dos vértices.
+       - A leitura usa np.load com mmap_mode='r', de modo que as páginas só são carregadas quando as linhas são acessadas.
+       - O horário de modificação dos arquivos marca o último uso; ao exceder o orçamento, as entradas menos usadas recentemente (LRU) são removidas.
+       - A escrita é feita em arquivo temporário seguido de os.replace, evitando leituras parciais por outros processos.
+
+    4. Contribuição:
+       Em reexecuções das mesmas instâncias (ajuste de k_grasp, num_tentativas, etc.), o cálculo de caminhos mínimos é totalmente evitado.
+    """
+
+    def __init__(self, pasta=".cache_distancias", limite_bytes=2 * 1024 ** 3):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        os.makedirs(pasta, exist_ok=True)
+
+    @staticmethod
+    def chave(vertices, arestas, arcos, vertices_alvo=None):
+        """
+        Calcula a chave de uma entrada a partir do conteúdo do grafo (vértices, arestas e arcos)
+        e, no modo compacto, do conjunto de vértices alvo.
+        """
+        h = hashlib.sha256()
+        h.update(f"v{VERSAO_CACHE}".encode())
+        for parte in (vertices, arestas, arcos):
+            h.update(repr(sorted(parte)).encode())
+            h.update(b"|")
+        if vertices_alvo is not None:
+            h.update(b"alvos")
+            h.update(repr(sorted(vertices_alvo)).encode())
+        return h.hexdigest()
+
+    def _caminhos(self, chave):
+        base = os.path.join(self.pasta, chave)
+        return base + ".valores.npy", base + ".rotulos.npy"
+
+    def obter(self, chave):
+        """
+        Devolve a matriz guardada sob a chave (mapeada em memória) ou None se não existir.
+        """
+        caminho_valores, caminho_rotulos = self._caminhos(chave)
+        try:
+            valores = np.load(caminho_valores, mmap_mode="r")
+            rotulos = np.load(caminho_rotulos)
+        except (FileNotFoundError, ValueError):
+            return None
+        # Marca o uso da entrada para a política LRU
+        for caminho in (caminho_valores, caminho_rotulos):
+            try:
+                os.utime(caminho)
+            except OSError:
+                pass
+        return MatrizDistancias(rotulos.tolist(), valores)
+
+    def guardar(self, chave, matriz):
+        """
+        Grava a matriz no cache e aplica a política de despejo se o orçamento for excedido.
+        """
+        caminho_valores, caminho_rotulos = self._caminhos(chave)
+        for caminho, array in ((caminho_rotulos, np.asarray(matriz.rotulos)), (caminho_valores, matriz.valores)):
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, "wb") as f:
+                np.save(f, array)
+            os.replace(temporario, caminho)
+        self.despejar()
+
+    def despejar(self):
+        """
+        Remove as entradas menos usadas recentemente até que o tamanho total caiba em limite_bytes.
+        """
+        entradas = {}
+        for nome in os.listdir(self.pasta):
+            if not nome.endswith(".npy"):
+                continue
+            chave = nome.split(".", 1)[0]
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            tamanho, ultimo_uso = entradas.get(chave, (0, 0))
+            entradas[chave] = (tamanho + info.st_size, max(ultimo_uso, info.st_mtime))
+
+        total = sum(tamanho for tamanho, _ in entradas.values())
+        for chave, (tamanho, _) in sorted(entradas.items(), key=lambda item: item[1][1]):
+            if total <= self.limite_bytes:
+                break
+            for caminho in self._caminhos(chave):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+            total -= tamanho
+
+
+def obter_ou_calcular(cache, chave, calcular):
+    """
+    1. Objetivo:
+       Busca uma matriz no cache e, em caso de ausência, calcula e grava o resultado.
+
+    2. Entradas:
+       - cache: instância de CacheDistancias (ou None para desativar o cache).
+       - chave: chave da entrada (CacheDistancias.chave).
+       - calcular: função sem argumentos que calcula a MatrizDistancias.
+
+    3. Lógica:
+       Tenta obter a entrada; se não existir, chama calcular(), grava e devolve o resultado.
+
+    4. Contribuição:
+       Ponto único usado pelas funções de criação de matriz para envolver o cálculo com o cache.
+    """
+    if cache is None:
+        return calcular()
+    matriz = cache.obter(chave)
+    if matriz is None:
+        matriz = calcular()
+        cache.guardar(chave, matriz)
+    return matriz
@@ -0,0 +1,259 @@
+import heapq
+import math
+import numpy as np
+
+# Razão aproximada entre o custo de um relaxamento do Dijkstra (Python puro) e o de uma
+# operação do Floyd-Warshall vetorizado; usada na escolha automática do método.
+RAZAO_CUSTO_DIJKSTRA = 18
+
+
+class LinhaDistancias:
+    """
+    1. Objetivo:
+       Representa uma linha da matriz de distâncias (todas as distâncias a partir de um vértice), com acesso no estilo dicionário.
+
+    2. Entradas:
+       - valores: lista Python com as distâncias da linha, na ordem dos índices contíguos.
+       - indice: dicionário que mapeia o rótulo do vértice para o seu índice contíguo.
+
+    3. Lógica:
+       Traduz o rótulo do vértice para o índice contíguo e devolve o valor correspondente da lista.
+
+    4. Contribuição:
+       Permite que o código existente continue usando matriz_distancias[u][v] sem saber que os dados estão em um array denso.
+    """
+    __slots__ = ("_valores", "_indice")
+
+    def __init__(self, valores, indice):
+        self._valores = valores
+        self._indice = indice
+
+    def __getitem__(self, v):
+        return self._valores[self._indice[v]]
+
+    def __contains__(self, v):
+        return v in self._indice
+
+    def __iter__(self):
+        return iter(self._indice)
+
+    def __len__(self):
+        return len(self._indice)
+
+    def get(self, v, padrao=None):
+        idx = self._indice.get(v)
+        return padrao if idx is None else self._valores[idx]
+
+    def keys(self):
+        return self._indice.keys()
+
+    def items(self):
+        return ((v, self._valores[idx]) for v, idx in self._indice.items())
+
+
+class MatrizDistancias:
+    """
+    1. Objetivo:
+       Armazena as distâncias mínimas entre vértices em um array NumPy denso, com vértices reindexados de forma contígua.
+
+    2. Entradas:
+       - rotulos: sequência com os rótulos dos vértices, na ordem dos índices do array.
+       - valores: array 2-D (n x n) com as distâncias entre os vértices de rotulos.
+
+    3. Lógica:
+       Mantém o array original (útil para operações vetorizadas) e um índice rótulo -> posição.
+       As linhas acessadas via matriz[u] são convertidas para listas Python sob demanda e guardadas em cache, de modo que o acesso matriz[u][v] nos laços quentes não pague o custo de escalares NumPy.
+
+    4. Contribuição:
+       Substitui o dicionário de dicionários do Floyd-Warshall original mantendo a mesma interface de leitura usada por rota_custo, calcular_savings e salvar_solucao.
+    """
+
+    def __init__(self, rotulos, valores):
+        self.rotulos = list(rotulos)
+        self.indice = {v: idx for idx, v in enumerate(self.rotulos)}
+        self.valores = valores
+        self._linhas = [None] * len(self.rotulos)
+
+    def __getitem__(self, u):
+        idx = self.indice[u]
+        linha = self._linhas[idx]
+        if linha is None:
+            linha = LinhaDistancias(self.valores[idx].tolist(), self.indice)
+            self._linhas[idx] = linha
+        return linha
+
+    def __contains__(self, u):
+        return u in self.indice
+
+    def __iter__(self):
+        return iter(self.rotulos)
+
+    def __len__(self):
+        return len(self.rotulos)
+
+    def keys(self):
+        return self.indice.keys()
+
+    def items(self):
+        return ((u, self[u]) for u in self.rotulos)
+
+
+def _adjacencia(indice, arestas, arcos):
+    """
+    Monta a lista de adjacência (por índice contíguo) a partir das arestas (bidirecionais) e arcos (direcionais),
+    mantendo apenas o menor custo quando há ligações paralelas.
+    """
+    adjacencia = [dict() for _ in indice]
+    for (u, v), custo in arestas:
+        iu, iv = indice[u], indice[v]
+        if custo < adjacencia[iu].get(iv, float('inf')):
+            adjacencia[iu][iv] = custo
+        if custo < adjacencia[iv].get(iu, float('inf')):
+            adjacencia[iv][iu] = custo
+    for (u, v), custo in arcos:
+        iu, iv = indice[u], indice[v]
+        if custo < adjacencia[iu].get(iv, float('inf')):
+            adjacencia[iu][iv] = custo
+    return [list(vizinhos.items()) for vizinhos in adjacencia]
+
+
+def dijkstra(adjacencia, origem):
+    """
+    1. Objetivo:
+       Calcula as distâncias mínimas a partir de um vértice usando Dijkstra com heap binário.
+
+    2. Entradas:
+       - adjacencia: lista de adjacência indexada por índice contíguo, com pares (vizinho, custo).
+       - origem: índice contíguo do vértice de partida.
+
+    3. Lógica:
+       Extrai repetidamente o vértice com menor distância provisória e relaxa seus vizinhos, ignorando entradas obsoletas do heap.
+
+    4. Contribuição:
+       Base das estratégias esparsas de caminhos mínimos (uma execução por vértice ou apenas a partir dos nós requeridos).
+    """
+    dist = [float('inf')] * len(adjacencia)
+    dist[origem] = 0
+    heap = [(0, origem)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, custo in adjacencia[u]:
+            nd = d + custo
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def floyd_warshall_vetorizado(valores):
+    """
+    1. Objetivo:
+       Executa o Floyd-Warshall sobre um array denso, vetorizando os dois laços internos.
+
+    2. Entradas:
+       - valores: array float64 (n x n) com as distâncias diretas (infinito onde não há ligação); é modificado no lugar.
+
+    3. Lógica:
+       Para cada vértice intermediário k, relaxa todos os pares de uma vez com np.minimum(D, D[:, k] + D[k, :]).
+
+    4. Contribuição:
+       Reduz o custo do cálculo de todos os pares de n³ operações interpretadas para n operações vetorizadas em C.
+    """
+    for k in range(valores.shape[0]):
+        np.minimum(valores, valores[:, k, None] + valores[None, k, :], out=valores)
+    return valores
+
+
+def _normalizar(valores):
+    """
+    Converte o array para inteiros quando todas as distâncias são finitas e inteiras,
+    preservando a saída inteira que o algoritmo original produzia (custos do arquivo são inteiros).
+    """
+    if np.isfinite(valores).all() and np.array_equal(valores, np.round(valores)):
+        return valores.astype(np.int64)
+    return valores
+
+
+def calcular_distancias(vertices, arestas, arcos, metodo="auto"):
+    """
+    1. Objetivo:
+       Calcula a matriz de distâncias mínimas entre todos os pares de vértices, armazenada em um array NumPy denso.
+
+    2. Entradas:
+       - vertices: conjunto de vértices do grafo.
+       - arestas: conjunto de arestas (bidirecionais) com custos.
+       - arcos: conjunto de arcos (direcionais) com custos.
+       - metodo: "floyd" (Floyd-Warshall vetorizado), "dijkstra" (um Dijkstra por vértice) ou "auto".
+
+    3. Lógica:
+       - Reindexa os vértices para índices contíguos 0..n-1.
+       - No modo "auto", estima o custo das duas estratégias e usa Dijkstra quando o grafo é esparso (poucas ligações por vértice) e Floyd-Warshall vetorizado caso contrário.
+       - Converte o resultado para inteiros quando possível.
+
+    4. Contribuição:
+       Motor de caminhos mínimos usado por criar_matriz_distancias, reduzindo o pré-processamento das maiores instâncias de minutos para segundos.
+    """
+    rotulos = sorted(vertices)
+    indice = {v: idx for idx, v in enumerate(rotulos)}
+    n = len(rotulos)
+
+    if metodo == "auto":
+        # Dijkstra custa ~ n * m * log n passos interpretados; Floyd-Warshall, n³ passos vetorizados
+        num_ligacoes = 2 * len(arestas) + len(arcos)
+        esparso = num_ligacoes * math.log2(max(n, 2)) * RAZAO_CUSTO_DIJKSTRA < n * n
+        metodo = "dijkstra" if esparso else "floyd"
+
+    if metodo == "dijkstra":
+        adjacencia = _adjacencia(indice, arestas, arcos)
+        valores = np.array([dijkstra(adjacencia, origem) for origem in range(n)], dtype=np.float64).reshape(n, n)
+    elif metodo == "floyd":
+        valores = np.full((n, n), np.inf)
+        np.fill_diagonal(valores, 0)
+        for (u, v), custo in arestas:
+            iu, iv = indice[u], indice[v]
+            valores[iu, iv] = min(valores[iu, iv], custo)
+            valores[iv, iu] = min(valores[iv, iu], custo)
+        for (u, v), custo in arcos:
+            iu, iv = indice[u], indice[v]
+            valores[iu, iv] = min(valores[iu, iv], custo)
+        floyd_warshall_vetorizado(valores)
+    else:
+        raise ValueError(f"Método de distâncias desconhecido: {metodo}")
+
+    return MatrizDistancias(rotulos, _normalizar(valores))
+
+
+
+def calcular_distancias_requeridas(vertices, arestas, arcos, vertices_alvo):
+    """
+    1. Objetivo:
+       Calcula as distâncias mínimas apenas entre os vértices de interesse (depósito e extremidades dos serviços), sem computar todos os |V|² pares.
+
+    2. Entradas:
+       - vertices: conjunto de vértices do grafo.
+       - arestas: conjunto de arestas (bidirecionais) com custos.
+       - arcos: conjunto de arcos (direcionais) com custos.
+       - vertices_alvo: vértices entre os quais as distâncias serão calculadas.
+
+    3. Lógica:
+       - Monta a lista de adjacência do grafo completo.
+       - Executa um Dijkstra com heap a partir de cada vértice alvo e guarda apenas as colunas dos vértices alvo.
+       - Devolve uma matriz compacta (|alvos| x |alvos|) indexada pelos rótulos dos vértices alvo.
+
+    4. Contribuição:
+       Reduz tempo e memória do pré-processamento em ordens de grandeza quando os nós requeridos são uma fração de |V|, já que as rotas só consultam distâncias entre depósito e extremidades de serviços.
+    """
+    rotulos = sorted(vertices)
+    indice = {v: idx for idx, v in enumerate(rotulos)}
+    alvos = sorted(set(vertices_alvo))
+    colunas = [indice[v] for v in alvos]
+
+    adjacencia = _adjacencia(indice, arestas, arcos)
+    valores = np.empty((len(alvos), len(alvos)), dtype=np.float64)
+    for linha, origem in enumerate(colunas):
+        dist = dijkstra(adjacencia, origem)
+        valores[linha] = [dist[c] for c in colunas]
+
+    return MatrizDistancias(alvos, _normalizar(valores))
@@ -0,0 +1,180 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+
+
+def ler_cabecalho(caminho):
+    """
+    1. Objetivo:
+       Lê apenas o cabeçalho de um arquivo de instância (.dat), sem processar as seções de dados.
+
+    2. Entradas:
+       - caminho: caminho do arquivo de instância.
+
+    3. Lógica:
+       Percorre as linhas até encontrar a primeira seção (ReN., ReE., EDGE, ReA., ARC) e guarda os pares "chave: valor".
+
+    4. Contribuição:
+       Permite estimar o tamanho das instâncias para o escalonamento do lote a custo praticamente nulo.
+    """
+    header = {}
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if linha.startswith(("ReN.", "ReE.", "EDGE", "ReA.", "ARC")):
+                break
+            if ":" in linha:
+                chave, valor = linha.split(":", 1)
+                header[chave.strip()] = valor.strip()
+    return header
+
+
+def tamanho_instancia(caminho):
+    """
+    Estima o tamanho de uma instância pelo cabeçalho: (#serviços requeridos, #Nodes).
+    Instâncias com cabeçalho ilegível recebem tamanho zero.
+    """
+    try:
+        header = ler_cabecalho(caminho)
+        requeridos = sum(int(header.get(chave, 0)) for chave in ("#Required N", "#Required E", "#Required A"))
+        return requeridos, int(header.get("#Nodes", 0))
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def _executar_tarefa(conexao, funcao, argumentos):
+    """
+    Corpo do processo trabalhador: executa a função e envia ao processo principal
+    o resultado ("ok") ou o traceback da exceção ("erro").
+    O trabalhador abre um grupo de processos próprio, herdado pelos processos que ele criar (pool do multi-start, ilhas do genético),
+    para que _encerrar_grupo possa encerrar todos juntos.
+    """
+    if hasattr(os, "setsid"):
+        os.setsid()
+    try:
+        funcao(*argumentos)
+        conexao.send(("ok", None))
+    except BaseException:
+        conexao.send(("erro", traceback.format_exc()))
+    finally:
+        conexao.close()
+
+
+def _encerrar_grupo(processo):
+    """
+    Encerra um trabalhador junto com os processos que ele criou (SIGTERM ao grupo de processos aberto em _executar_tarefa).
+    Se o grupo ainda não existir (o trabalhador acabou de iniciar) ou não houver grupos de processos, encerra só o trabalhador.
+    """
+    try:
+        os.killpg(processo.pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        processo.terminate()
+
+
+def executar_lote(
+    arquivos,
+    pasta_entrada,
+    pasta_saida,
+    funcao,
+    num_processos=None,
+    tempo_limite=None,
+    retomar=False
+):
+    """
+    1. Objetivo:
+       Processa um lote de instâncias em processos separados, com escalonamento por tamanho, limite de tempo por instância e relato de falhas.
+
+    2. Entradas:
+       - arquivos: nomes dos arquivos de instância (.dat).
+       - pasta_entrada: diretório das instâncias.
+       - pasta_saida: diretório das soluções (sol-<arquivo>).
+       - funcao: função chamada como funcao(arquivo, pasta_entrada, pasta_saida) em cada processo.
+       - num_processos: número máximo de processos simultâneos (padrão: os.cpu_count()).
+       - tempo_limite: tempo máximo de parede por instância, em segundos (None = sem limite).
+       - retomar: se True, ignora instâncias cuja solução já existe na pasta de saída (retomada de um lote interrompido);
+         por padrão, todas as instâncias são recalculadas e as soluções existentes, substituídas.
+
+    3. Lógica:
+       - Ordena as instâncias da maior para a menor (#serviços requeridos, depois #Nodes do cabeçalho), para que as mais longas não fiquem para o final.
+       - Mantém até num_processos processos ativos, cada um com um canal (Pipe) próprio para devolver o status.
+         Os processos não são daemon, para que a própria instância possa usar um pool (multi-start paralelo).
+       - Espera pelo relato (canal) ou pelo término (sentinela) de qualquer processo, ou pelo próximo prazo; o relato é lido assim que chega,
+         antes do join, para que um traceback maior que o buffer do canal não bloqueie o processo.
+       - Processos que excedem o tempo limite são encerrados com todo o seu grupo de processos (pool e ilhas incluídos), sem deixar órfãos;
+         se o lote for interrompido (ex.: Ctrl+C, que não alcança os grupos próprios dos trabalhadores), os grupos ativos também são encerrados.
+       - Exceções nos trabalhadores são devolvidas com traceback; processos que terminam sem relatar (ex.: exit()) também são registrados como erro.
+
+    4. Contribuição:
+       Substitui o ThreadPoolExecutor (serializado pelo GIL) por paralelismo real entre núcleos, sem perder falhas silenciosamente e permitindo retomar lotes interrompidos.
+    """
+    num_processos = num_processos or os.cpu_count() or 1
+    resultados = {}
+
+    pendentes = []
+    for arquivo in arquivos:
+        if retomar and os.path.exists(os.path.join(pasta_saida, f"sol-{arquivo}")):
+            resultados[arquivo] = ("ignorado", "solução já existente", 0.0)
+            continue
+        pendentes.append(arquivo)
+    pendentes.sort(key=lambda arq: tamanho_instancia(os.path.join(pasta_entrada, arq)), reverse=True)
+    pendentes.reverse()  # pop() retira do final: a maior instância sai primeiro
+
+    ativos = {}  # sentinela -> (arquivo, processo, conexão, instante de início)
+    relatos = {}  # sentinela -> (status, detalhe) já recebido pelo canal
+    try:
+        while pendentes or ativos:
+            while pendentes and len(ativos) < num_processos:
+                arquivo = pendentes.pop()
+                leitura, escrita = multiprocessing.Pipe(duplex=False)
+                processo = multiprocessing.Process(
+                    target=_executar_tarefa,
+                    args=(escrita, funcao, (arquivo, pasta_entrada, pasta_saida))
+                )
+                processo.start()
+                escrita.close()
+                ativos[processo.sentinel] = (arquivo, processo, leitura, time.perf_counter())
+
+            espera = None
+            if tempo_limite is not None:
+                agora = time.perf_counter()
+                espera = max(0.0, min(inicio + tempo_limite - agora for _, _, _, inicio in ativos.values()))
+            # Espera também pelos canais: um relato grande (traceback) só é entregue se for lido antes do término do processo
+            canais = [leitura for sentinela, (_, _, leitura, _) in ativos.items() if sentinela not in relatos]
+            prontos = multiprocessing.connection.wait(list(ativos) + canais, timeout=espera)
+
+            agora = time.perf_counter()
+            for sentinela in list(ativos):
+                arquivo, processo, leitura, inicio = ativos[sentinela]
+                decorrido = agora - inicio
+                if leitura in prontos:
+                    try:
+                        relatos[sentinela] = leitura.recv()
+                    except (EOFError, OSError):
+                        relatos[sentinela] = ("erro", f"processo terminou sem relatar (código {processo.exitcode})")
+                if sentinela in relatos or sentinela in prontos:
+                    processo.join()
+                    status, detalhe = relatos.pop(
+                        sentinela, ("erro", f"processo terminou sem relatar (código {processo.exitcode})")
+                    )
+                elif tempo_limite is not None and decorrido >= tempo_limite:
+                    _encerrar_grupo(processo)
+                    processo.join()
+                    status, detalhe = "tempo esgotado", f"excedeu {tempo_limite} s"
+                else:
+                    continue
+                leitura.close()
+                del ativos[sentinela]
+                resultados[arquivo] = (status, detalhe, decorrido)
+                if status != "ok":
+                    print(f"[{status}] {arquivo}: {detalhe}")
+    finally:
+        # Interrupção do lote: nenhum trabalhador (nem os processos que ele criou) continua rodando
+        for _, processo, leitura, _ in ativos.values():
+            _encerrar_grupo(processo)
+            processo.join()
+            leitura.close()
+
+    return resultados
@@ -0,0 +1,246 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+from leitor_grafo import (
+    COLUNAS_SECAO,
+    SECOES,
+    DadosInstancia,
+    ErroInstancia,
+    criar_matriz_distancias,
+    criar_matriz_distancias_requeridas,
+    extrair_servicos,
+    leitor_arquivo,
+)
+from distancias import MatrizDistancias
+from tabela_servicos import TabelaServicos
+
+# Identificação e versão do formato binário; alterar a versão invalida os arquivos compilados antigos
+MAGIA = b"CARPBIN\0"
+VERSAO_FORMATO = 1
+EXTENSAO = ".carpbin"
+
+# Cabeçalho fixo: magia (8 bytes), versão (uint32) e tamanho dos metadados JSON (uint32)
+_CABECALHO = struct.Struct("<8sII")
+
+# Alinhamento (em bytes) do início de cada array no arquivo
+ALINHAMENTO = 64
+
+# Colunas da tabela de serviços gravada no arquivo (mesma ordem do construtor de TabelaServicos)
+COLUNAS_SERVICOS = ("id", "tipo", "origem", "destino", "demanda", "custo_servico")
+
+
+def _alinhar(posicao):
+    return (posicao + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+class InstanciaCompilada:
+    """
+    1. Objetivo:
+       Instância carregada de um arquivo compilado: cabeçalho, seções do grafo, tabela de serviços e, se houver, a matriz de distâncias.
+
+    2. Entradas:
+       - header: campos do cabeçalho do .dat original.
+       - dados: DadosInstancia com as seções (colunas são visões do arquivo mapeado em memória).
+       - tabela: TabelaServicos com os serviços obrigatórios (mesma ordem e ids de extrair_servicos).
+       - matriz_distancias: MatrizDistancias sobre o arquivo mapeado, ou None se não foi gravada.
+       - tipo_matriz: "requeridos" (matriz compacta), "completa" ou None.
+
+    3. Lógica:
+       Apenas agrupa os objetos montados por carregar_instancia.
+
+    4. Contribuição:
+       Ponto de entrada único para o pipeline usar uma instância compilada no lugar de leitor_arquivo + extrair_servicos + cálculo de distâncias.
+    """
+
+    def __init__(self, header, dados, tabela, matriz_distancias, tipo_matriz):
+        self.header = header
+        self.dados = dados
+        self.tabela = tabela
+        self.matriz_distancias = matriz_distancias
+        self.tipo_matriz = tipo_matriz
+
+    @property
+    def capacidade(self):
+        return int(self.header["Capacity"])
+
+    @property
+    def deposito(self):
+        return int(self.header.get("Depot Node", 0))
+
+
+def compilar_instancia(caminho_dat, caminho_saida, distancias="requeridos", cache=None):
+    """
+    1. Objetivo:
+       Converte uma instância .dat em um arquivo binário compacto, que pode ser carregado sem nova leitura do texto.
+
+    2. Entradas:
+       - caminho_dat: caminho do arquivo de instância (.dat).
+       - caminho_saida: caminho do arquivo compilado a ser gerado.
+       - distancias: "requeridos" (matriz compacta entre depósito e extremidades dos serviços), "completa" ou None (sem matriz).
+       - cache: CacheDistancias opcional, repassado ao cálculo das distâncias.
+
+    3. Lógica:
+       - Lê a instância (leitor_arquivo) e extrai os serviços (extrair_servicos).
+       - Reúne os arrays: uma tabela (k x 5) por seção, a tabela de serviços (n x 6) e, opcionalmente, os rótulos e valores da matriz de distâncias.
+       - Grava um cabeçalho fixo (magia, versão, tamanho dos metadados), os metadados em JSON (cabeçalho do .dat, dtype, forma e deslocamento de cada array)
+         e os arrays brutos, cada um alinhado a ALINHAMENTO bytes.
+       - A escrita é feita em arquivo temporário seguido de os.replace.
+
+    4. Contribuição:
+       Etapa de "compilação" das instâncias: o parsing do texto e a derivação dos serviços (e, opcionalmente, das distâncias) acontecem uma única vez.
+    """
+    dados = leitor_arquivo(caminho_dat)
+    servicos = extrair_servicos(dados)
+    header = dados["header"]
+    deposito = int(header.get("Depot Node", 0))
+
+    arrays = {}
+    for nome, _ in SECOES.values():
+        arrays[nome] = np.column_stack([dados[nome][c] for c in COLUNAS_SECAO]).reshape(-1, len(COLUNAS_SECAO))
+    tabela = TabelaServicos.de_servicos(servicos)
+    arrays["servicos"] = np.column_stack(
+        [np.asarray(getattr(tabela, c), dtype=np.int64) for c in COLUNAS_SERVICOS]
+    ).reshape(-1, len(COLUNAS_SERVICOS))
+
+    if distancias == "requeridos":
+        matriz = criar_matriz_distancias_requeridas(
+            dados["vertices"], dados["arestas"], dados["arcos"], servicos, deposito, cache=cache
+        )
+    elif distancias == "completa":
+        matriz = criar_matriz_distancias(dados["vertices"], dados["arestas"], dados["arcos"], cache=cache)
+    elif distancias is None:
+        matriz = None
+    else:
+        raise ValueError(f"Tipo de matriz de distâncias desconhecido: {distancias}")
+    if matriz is not None:
+        arrays["matriz.rotulos"] = np.asarray(matriz.rotulos, dtype=np.int64)
+        arrays["matriz.valores"] = np.ascontiguousarray(matriz.valores)
+
+    # Deslocamentos relativos ao início da área de dados
+    descricao = {}
+    posicao = 0
+    for nome, valores in arrays.items():
+        valores = np.ascontiguousarray(valores)
+        arrays[nome] = valores
+        posicao = _alinhar(posicao)
+        descricao[nome] = {"dtype": valores.dtype.str, "forma": list(valores.shape), "deslocamento": posicao}
+        posicao += valores.nbytes
+    metadados = json.dumps(
+        {"header": header, "matriz": distancias, "arrays": descricao}, ensure_ascii=False
+    ).encode("utf-8")
+    inicio_dados = _alinhar(_CABECALHO.size + len(metadados))
+
+    temporario = f"{caminho_saida}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(_CABECALHO.pack(MAGIA, VERSAO_FORMATO, len(metadados)))
+        f.write(metadados)
+        for nome, valores in arrays.items():
+            f.seek(inicio_dados + descricao[nome]["deslocamento"])
+            f.write(valores.tobytes())
+    os.replace(temporario, caminho_saida)
+
+
+def carregar_instancia(caminho):
+    """
+    1. Objetivo:
+       Carrega um arquivo gerado por compilar_instancia, mapeando-o em memória (mmap) sem copiar os arrays.
+
+    2. Entradas:
+       - caminho: caminho do arquivo compilado.
+
+    3. Lógica:
+       - Mapeia o arquivo em modo somente leitura e valida a magia e a versão do formato.
+       - Cria cada array com np.frombuffer sobre o mapeamento (visões somente leitura, sem cópia).
+       - As páginas do arquivo ficam no cache de páginas do sistema operacional, compartilhadas por todos os processos que carregam a mesma instância.
+       - A tabela de serviços é copiada para TabelaServicos (arrays do módulo array, rápidos nos laços das heurísticas), o que custa O(n).
+
+    4. Contribuição:
+       Reduz o custo de inicialização de cada instância a praticamente zero em execuções de lote.
+       Retorna uma InstanciaCompilada.
+    """
+    try:
+        with open(caminho, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ErroInstancia(caminho, f"não foi possível mapear o arquivo compilado ({e})") from e
+
+    if len(mapa) < _CABECALHO.size:
+        raise ErroInstancia(caminho, "arquivo compilado truncado")
+    magia, versao, tamanho_metadados = _CABECALHO.unpack_from(mapa, 0)
+    if magia != MAGIA:
+        raise ErroInstancia(caminho, "não é um arquivo de instância compilada")
+    if versao != VERSAO_FORMATO:
+        raise ErroInstancia(caminho, f"versão do formato {versao} incompatível (esperada {VERSAO_FORMATO})")
+    metadados = json.loads(mapa[_CABECALHO.size:_CABECALHO.size + tamanho_metadados].decode("utf-8"))
+    inicio_dados = _alinhar(_CABECALHO.size + tamanho_metadados)
+
+    arrays = {}
+    for nome, desc in metadados["arrays"].items():
+        forma = tuple(desc["forma"])
+        arrays[nome] = np.frombuffer(
+            mapa, dtype=np.dtype(desc["dtype"]), count=int(np.prod(forma)), offset=inicio_dados + desc["deslocamento"]
+        ).reshape(forma)
+
+    header = metadados["header"]
+    secoes = {
+        nome: {c: arrays[nome][:, i] for i, c in enumerate(COLUNAS_SECAO)}
+        for nome, _ in SECOES.values()
+    }
+    servicos = arrays["servicos"]
+    tabela = TabelaServicos(*(servicos[:, i].tolist() for i in range(len(COLUNAS_SERVICOS))))
+    matriz = None
+    if metadados["matriz"] is not None:
+        matriz = MatrizDistancias(arrays["matriz.rotulos"].tolist(), arrays["matriz.valores"])
+    return InstanciaCompilada(header, DadosInstancia(header, secoes), tabela, matriz, metadados["matriz"])
+
+
+def localizar_compilada(caminho_dat, pasta_compilados):
+    """
+    Devolve o caminho do arquivo compilado correspondente ao .dat, ou None se ele não existir ou for mais antigo que o .dat.
+    """
+    nome = os.path.splitext(os.path.basename(caminho_dat))[0] + EXTENSAO
+    caminho = os.path.join(pasta_compilados, nome)
+    try:
+        if os.path.getmtime(caminho) >= os.path.getmtime(caminho_dat):
+            return caminho
+    except OSError:
+        pass
+    return None
+
+
+def compilar_pasta(pasta_entrada, pasta_saida, distancias="requeridos"):
+    """
+    1. Objetivo:
+       Compila todas as instâncias .dat de uma pasta (etapa única antes dos lotes).
+
+    2. Entradas:
+       - pasta_entrada: diretório das instâncias .dat.
+       - pasta_saida: diretório dos arquivos compilados.
+       - distancias: tipo de matriz gravada em cada arquivo (como em compilar_instancia).
+
+    3. Lógica:
+       Compila apenas as instâncias sem arquivo compilado atualizado; erros de uma instância são relatados e não interrompem as demais.
+
+    4. Contribuição:
+       Permite preparar a pasta de compilados uma vez e reaproveitá-la em todas as execuções seguintes.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    for arquivo in sorted(os.listdir(pasta_entrada)):
+        if not arquivo.endswith(".dat"):
+            continue
+        caminho_dat = os.path.join(pasta_entrada, arquivo)
+        if localizar_compilada(caminho_dat, pasta_saida):
+            continue
+        caminho_saida = os.path.join(pasta_saida, os.path.splitext(arquivo)[0] + EXTENSAO)
+        try:
+            compilar_instancia(caminho_dat, caminho_saida, distancias=distancias)
+            print(f"Compilado: {arquivo}")
+        except (ErroInstancia, KeyError, ValueError) as e:
+            print(f"[erro] {arquivo}: {e}")
+
+
+if __name__ == "__main__":
+    compilar_pasta("dados", "compilados")
@@ -1,3 +1,147 @@
+from array import array
+import numpy as np
+
+from distancias import calcular_distancias, calcular_distancias_requeridas
+from cache_distancias import CacheDistancias, obter_ou_calcular
+from tabela_servicos import TabelaServicos
+
+
+# Tamanho do buffer de leitura dos arquivos de instância (o arquivo é lido em blocos, não de uma vez)
+TAMANHO_BLOCO_LEITURA = 1 << 20
+
+# Cabeçalhos de seção -> (nome da seção, número de campos numéricos de cada linha de dados)
+SECOES = {
+    b"ReN.": ("ReN", 3),   # vértice, demanda, custo de serviço
+    b"ReE.": ("ReE", 5),   # origem, destino, custo, demanda, custo de serviço
+    b"EDGE": ("EDGE", 3),  # origem, destino, custo
+    b"ReA.": ("ReA", 5),
+    b"ARC": ("ARC", 3),
+}
+
+# Colunas dos arrays de cada seção (vértices requeridos usam origem = destino e custo 0;
+# ligações não requeridas usam demanda e custo de serviço 0)
+COLUNAS_SECAO = ("origem", "destino", "custo", "demanda", "custo_servico")
+
+
+class ErroInstancia(Exception):
+    """
+    Erro ao ler um arquivo de instância. Substitui as chamadas a exit(), para que um arquivo inválido
+    não encerre o processo inteiro (ex.: um trabalhador do lote).
+    """
+
+    def __init__(self, caminho, mensagem):
+        super().__init__(f"{caminho}: {mensagem}")
+        self.caminho = caminho
+
+
+class ErroLeituraInstancia(ErroInstancia):
+    """
+    O arquivo de instância não existe ou não pôde ser lido.
+    """
+
+
+class ErroFormatoInstancia(ErroInstancia):
+    """
+    Uma linha de dados do arquivo de instância está malformada.
+    """
+
+    def __init__(self, caminho, num_linha, trecho, mensagem):
+        super().__init__(caminho, f"linha {num_linha}: {mensagem}: {trecho!r}")
+        self.num_linha = num_linha
+        self.trecho = trecho
+
+
+def _converter_secao(caminho, nome, largura, campos, linhas):
+    """
+    Converte os campos (bytes) de uma seção para um array('q') de uma só vez e expõe as colunas como arrays NumPy (sem cópia).
+    Em caso de campo não numérico, localiza a linha de origem para a mensagem de erro.
+    """
+    try:
+        valores = array("q", map(int, campos))
+    except ValueError:
+        for pos, campo in enumerate(campos):
+            try:
+                int(campo)
+            except ValueError:
+                raise ErroFormatoInstancia(
+                    caminho, linhas[pos // largura], campo.decode("utf-8", "replace"), f"campo não numérico na seção {nome}"
+                ) from None
+        raise
+    tabela = np.frombuffer(valores, dtype=np.int64).reshape(-1, largura) if valores else np.zeros((0, largura), dtype=np.int64)
+    zeros = np.zeros(len(tabela), dtype=np.int64)
+    if nome == "ReN":
+        colunas = (tabela[:, 0], tabela[:, 0], zeros, tabela[:, 1], tabela[:, 2])
+    elif largura == 5:
+        colunas = tuple(tabela[:, c] for c in range(5))
+    else:
+        colunas = (tabela[:, 0], tabela[:, 1], tabela[:, 2], zeros, zeros)
+    return dict(zip(COLUNAS_SECAO, colunas))
+
+
+class DadosInstancia(dict):
+    """
+    1. Objetivo:
+       Resultado de leitor_arquivo: cabeçalho e arrays de cada seção, com acesso preguiçoso às estruturas antigas (conjuntos de tuplas).
+
+    2. Entradas:
+       - header: dicionário com os campos do cabeçalho.
+       - secoes: dicionário seção -> colunas (origem, destino, custo, demanda, custo_servico), cada uma um array int64.
+
+    3. Lógica:
+       As chaves "header" e as seções ("ReN", "ReE", "EDGE", "ReA", "ARC") são guardadas diretamente.
+       As chaves antigas ("vertices", "arestas", "arcos", "vertices_requeridos", "arestas_requeridas", "arcos_requeridos")
+       são montadas a partir dos arrays apenas no primeiro acesso (__missing__) e guardadas no próprio dicionário.
+
+    4. Contribuição:
+       Mantém compatível o código que usa dados["vertices"], dados["arestas"], etc., sem pagar o custo dos conjuntos quando eles não são usados.
+    """
+
+    def __init__(self, header, secoes):
+        super().__init__(header=header, **secoes)
+
+    def __missing__(self, chave):
+        montar = {
+            "vertices": self._vertices,
+            "arestas": lambda: self._ligacoes(("ReE", "EDGE"), normalizar=True),
+            "arcos": lambda: self._ligacoes(("ReA", "ARC"), normalizar=False),
+            "vertices_requeridos": self._vertices_requeridos,
+            "arestas_requeridas": lambda: self._requeridas("ReE", normalizar=True),
+            "arcos_requeridos": lambda: self._requeridas("ReA", normalizar=False),
+        }.get(chave)
+        if montar is None:
+            raise KeyError(chave)
+        valor = montar()
+        self[chave] = valor
+        return valor
+
+    def _vertices(self):
+        vertices = set()
+        for nome in ("ReN", "ReE", "EDGE", "ReA", "ARC"):
+            vertices.update(self[nome]["origem"].tolist())
+            vertices.update(self[nome]["destino"].tolist())
+        return vertices
+
+    def _ligacoes(self, nomes, normalizar):
+        ligacoes = set()
+        for nome in nomes:
+            secao = self[nome]
+            for u, v, custo in zip(secao["origem"].tolist(), secao["destino"].tolist(), secao["custo"].tolist()):
+                ligacoes.add(((min(u, v), max(u, v)) if normalizar else (u, v), custo))
+        return ligacoes
+
+    def _vertices_requeridos(self):
+        secao = self["ReN"]
+        return set(zip(secao["origem"].tolist(), zip(secao["demanda"].tolist(), secao["custo_servico"].tolist())))
+
+    def _requeridas(self, nome, normalizar):
+        secao = self[nome]
+        requeridas = set()
+        for u, v, custo, demanda, custo_servico in zip(*(secao[c].tolist() for c in COLUNAS_SECAO)):
+            ligacao = (min(u, v), max(u, v)) if normalizar else (u, v)
+            requeridas.add((ligacao, (custo, demanda, custo_servico)))
+        return requeridas
+
+
 def leitor_arquivo(path):
     """
     1. Objetivo:
@@ -7,151 +151,143 @@ def leitor_arquivo(path):
        - path: caminho do arquivo de entrada (.dat) contendo a descrição do grafo e dos serviços.
 
     3. Lógica interna:
-       - Inicializa estruturas para armazenar cabeçalho, vértices, arestas, arcos e seus subconjuntos obrigatórios.
-       - Lê o arquivo linha a linha, identificando seções (vértices, arestas, arcos, obrigatórios ou não).
-       - Para cada linha relevante, extrai os dados (origem, destino, custos, demandas, etc.) e armazena nas estruturas apropriadas.
-       - Ignora comentários, linhas vazias e metadados irrelevantes.
-       - Trata erros de leitura e formatação, exibindo avisos quando necessário.
+       - Lê o arquivo em modo binário, em blocos de TAMANHO_BLOCO_LEITURA bytes, processando uma linha por vez (sem carregar o arquivo inteiro).
+       - Antes da primeira seção, guarda os pares "chave: valor" do cabeçalho.
+       - Ao encontrar o cabeçalho de uma seção (ReN., ReE., EDGE, ReA., ARC), seleciona uma única vez a lista de campos da seção;
+         as linhas seguintes não passam mais por testes de prefixo.
+       - Os campos de cada linha de dados (identificador como N4, E1, NrA2 seguido de números) são acumulados como bytes e, no final,
+         convertidos de uma vez para um array tipado (array('q')), exposto como colunas NumPy sem cópia.
+       - Ignora comentários, linhas vazias e texto livre (ex.: "Based on CARP instance ...").
+       - Erros de leitura e linhas de dados malformadas geram ErroLeituraInstancia / ErroFormatoInstancia, em vez de encerrar o programa.
 
     4. Contribuição:
-       Fornece toda a base de dados estruturada para o pipeline de otimização, permitindo que as próximas funções acessem o grafo, os serviços obrigatórios e os parâmetros do problema.
+       Fornece toda a base de dados estruturada para o pipeline de otimização (DadosInstancia), permitindo que as próximas funções acessem o grafo, os serviços obrigatórios e os parâmetros do problema.
     """
     header = {}
-    vertices = set()
-    arestas = set()
-    arcos = set()
-    vertices_requeridos = set()
-    arestas_requeridas = set()
-    arcos_requeridos = set()
-
-    secao_atual = None
+    secoes = {}      # nome -> (largura, campos, números das linhas)
+    campos = None    # campos da seção atual (lista de bytes, convertida de uma vez no final)
+    linhas = None
 
     try:
-        with open(path, "r", encoding="utf-8") as arquivo:
-            linhas = arquivo.readlines()
-    except FileNotFoundError:
-        print(f"Erro: Arquivo '{path}' não encontrado.")
-        exit()
-    except Exception as e:
-        print(f"Erro ao ler o arquivo: {e}")
-        exit()
-
-    for linha in linhas:
-        linha = linha.strip()
-
-        # Identifica e armazena informações do cabeçalho (parâmetros globais)
-        if linha.startswith(("Optimal value:", "Capacity:", "Depot Node:", "#Nodes:", "#Edges:", "#Arcs:",
-                             "#Required N:", "#Required E:", "#Required A:")):
-            chave, valor = linha.split(":", 1)
-            header[chave.strip()] = valor.strip()
-            continue
-
-        # Ignora comentários, linhas vazias e metadados não relevantes
-        if not linha or linha.startswith("//") or linha.startswith("Name:") or "based on the" in linha.lower():
-            continue
-
-        # Identifica início de cada seção do arquivo
-        if linha.startswith("ReN."):
-            secao_atual = "ReN"
-            continue
-        elif linha.startswith("ReE."):
-            secao_atual = "ReE"
-            continue
-        elif linha.startswith("EDGE"):
-            secao_atual = "EDGE"
-            continue
-        elif linha.startswith("ReA."):
-            secao_atual = "ReA"
-            continue
-        elif linha.startswith("ARC"):
-            secao_atual = "ARC"
-            continue
-
-        # Processa linhas de dados conforme a seção atual
-        if linha and secao_atual:
-            partes = linha.split()
-            try:
-                if secao_atual == "ReN":
-                    # Vértices obrigatórios: (N, demanda, custo_servico)
-                    vertice = int(partes[0].replace("N", ""))
-                    demanda = int(partes[1])
-                    custo_servico = int(partes[2])
-                    vertices_requeridos.add((vertice, (demanda, custo_servico)))
-                    vertices.add(vertice)
-                elif secao_atual in ["ReE", "EDGE"]:
-                    # Arestas (com ou sem obrigatoriedade)
-                    origem, destino = int(partes[1]), int(partes[2])
-                    aresta = (min(origem, destino), max(origem, destino))
-                    custo_transporte = int(partes[3])
-                    arestas.add((aresta, custo_transporte))
-                    vertices.update([origem, destino])
-                    if secao_atual == "ReE":
-                        # Aresta obrigatória: inclui demanda e custo de serviço
-                        demanda = int(partes[4])
-                        custo_servico = int(partes[5])
-                        arestas_requeridas.add((aresta, (custo_transporte, demanda, custo_servico)))
-                elif secao_atual in ["ReA", "ARC"]:
-                    # Arcos (com ou sem obrigatoriedade)
-                    origem, destino = int(partes[1]), int(partes[2])
-                    arco = (origem, destino)
-                    custo_transporte = int(partes[3])
-                    arcos.add((arco, custo_transporte))
-                    vertices.update([origem, destino])
-                    if secao_atual == "ReA":
-                        # Arco obrigatório: inclui demanda e custo de serviço
-                        demanda = int(partes[4])
-                        custo_servico = int(partes[5])
-                        arcos_requeridos.add((arco, (custo_transporte, demanda, custo_servico)))
-            except ValueError:
-                print(f"[Aviso] Linha ignorada por erro: {linha}")
-                continue
+        arquivo = open(path, "rb", buffering=TAMANHO_BLOCO_LEITURA)
+    except OSError as e:
+        raise ErroLeituraInstancia(path, f"não foi possível abrir o arquivo ({e.strerror or e})") from e
+
+    with arquivo:
+        try:
+            for num_linha, linha in enumerate(arquivo, 1):
+                partes = linha.split()
+                if not partes or partes[0].startswith(b"//"):
+                    continue
+                primeiro = partes[0]
 
-    return {
-        "header": header,
-        "vertices": vertices,
-        "arestas": arestas,
-        "arcos": arcos,
-        "vertices_requeridos": vertices_requeridos,
-        "arestas_requeridas": arestas_requeridas,
-        "arcos_requeridos": arcos_requeridos
-    }
+                # Cabeçalho de seção: a partir daqui, as linhas de dados vão para os campos da seção
+                secao = SECOES.get(primeiro)
+                if secao is not None:
+                    nome_secao, largura = secao
+                    if nome_secao not in secoes:
+                        secoes[nome_secao] = (largura, [], [])
+                    _, campos, linhas = secoes[nome_secao]
+                    continue
 
-def criar_matriz_distancias(vertices, arestas, arcos):
+                # Linha de dados: identificador (letras seguidas de dígitos, ex.: N4, E1, NrA2) e campos numéricos
+                if campos is not None and primeiro[:1].isalpha() and primeiro[-1:].isdigit():
+                    if nome_secao == "ReN":
+                        dados_linha = [primeiro.lstrip(b"N")] + partes[1:largura]
+                    else:
+                        dados_linha = partes[1:largura + 1]
+                    if len(dados_linha) < largura:
+                        raise ErroFormatoInstancia(
+                            path, num_linha, linha.decode("utf-8", "replace").strip(),
+                            f"a seção {nome_secao} exige {largura} campos numéricos"
+                        )
+                    campos.extend(dados_linha)
+                    linhas.append(num_linha)
+                    continue
+
+                # Campos do cabeçalho (antes da primeira seção); texto livre é ignorado
+                if campos is None and b":" in linha:
+                    chave, valor = linha.decode("utf-8").split(":", 1)
+                    header[chave.strip()] = valor.strip()
+        except OSError as e:
+            raise ErroLeituraInstancia(path, f"erro ao ler o arquivo ({e.strerror or e})") from e
+        except UnicodeDecodeError as e:
+            raise ErroFormatoInstancia(
+                path, num_linha, linha.decode("utf-8", "replace").strip(), "cabeçalho com codificação inválida"
+            ) from e
+
+    dados_secoes = {}
+    for nome, largura in SECOES.values():
+        largura, campos, linhas = secoes.get(nome, (largura, [], []))
+        dados_secoes[nome] = _converter_secao(path, nome, largura, campos, linhas)
+    return DadosInstancia(header, dados_secoes)
+
+def criar_matriz_distancias(vertices, arestas, arcos, metodo="auto", cache=None):
     """
     1. Objetivo:
-       Construir a matriz de distâncias entre todos os pares de vértices do grafo, considerando arestas e arcos, e computando o caminho mais curto entre todos os pares (Floyd-Warshall).
+       Construir a matriz de distâncias entre todos os pares de vértices do grafo, considerando arestas e arcos, e computando o caminho mais curto entre todos os pares.
 
     2. Entradas:
        - vertices: conjunto de vértices do grafo.
        - arestas: conjunto de arestas (bidirecionais) com custos.
        - arcos: conjunto de arcos (direcionais) com custos.
+       - metodo: "floyd", "dijkstra" ou "auto" (escolhe conforme a esparsidade do grafo).
+       - cache: instância opcional de CacheDistancias; se fornecida, a matriz é lida do disco quando o mesmo grafo já foi processado.
 
     3. Lógica interna:
-       - Inicializa a matriz de distâncias com infinito para todos os pares, exceto zero na diagonal.
-       - Preenche as distâncias diretas a partir das arestas (bidirecional) e arcos (direcional).
-       - Aplica o algoritmo de Floyd-Warshall para garantir que a matriz contenha o menor custo entre todos os pares de vértices.
+       - Consulta o cache em disco (se houver) pela chave do conteúdo do grafo.
+       - Caso contrário, delega ao motor de distâncias (distancias.calcular_distancias), que reindexa os vértices para índices contíguos e guarda as distâncias em um array NumPy denso.
+       - Calcula os caminhos mínimos com Floyd-Warshall vetorizado ou com um Dijkstra por vértice quando o grafo é esparso.
+       - Devolve um objeto com acesso no estilo dicionário (matriz[u][v]), compatível com o restante do pipeline.
 
     4. Contribuição:
        Permite calcular rapidamente o custo de deslocamento entre quaisquer dois pontos do grafo, fundamental para avaliar e construir rotas no pipeline de otimização.
     """
-    distancias = {v: {u: float('inf') for u in vertices} for v in vertices}
-    for v in vertices:
-        distancias[v][v] = 0
-    # Preenche distâncias diretas de arestas (bidirecionais)
-    for (u, v), custo in arestas:
-        distancias[u][v] = custo
-        distancias[v][u] = custo
-    # Preenche distâncias diretas de arcos (direcionais)
-    for (u, v), custo in arcos:
-        distancias[u][v] = custo
-
-    # Algoritmo de Floyd-Warshall para caminhos mínimos entre todos os pares
-    for k in vertices:
-        for i in vertices:
-            for j in vertices:
-                if distancias[i][j] > distancias[i][k] + distancias[k][j]:
-                    distancias[i][j] = distancias[i][k] + distancias[k][j]
-    return distancias
+    if cache is None:
+        return calcular_distancias(vertices, arestas, arcos, metodo=metodo)
+    return obter_ou_calcular(
+        cache,
+        CacheDistancias.chave(vertices, arestas, arcos),
+        lambda: calcular_distancias(vertices, arestas, arcos, metodo=metodo)
+    )
+
+def criar_matriz_distancias_requeridas(vertices, arestas, arcos, servicos, deposito, cache=None):
+    """
+    1. Objetivo:
+       Construir uma matriz de distâncias compacta contendo apenas o depósito e as extremidades (origem/destino) dos serviços obrigatórios.
+
+    2. Entradas:
+       - vertices: conjunto de vértices do grafo.
+       - arestas: conjunto de arestas (bidirecionais) com custos.
+       - arcos: conjunto de arcos (direcionais) com custos.
+       - servicos: lista de serviços obrigatórios (saída de extrair_servicos) ou TabelaServicos.
+       - deposito: vértice do depósito.
+       - cache: instância opcional de CacheDistancias para reaproveitar matrizes já calculadas.
+
+    3. Lógica interna:
+       - Reúne o depósito e as extremidades distintas dos serviços.
+       - Consulta o cache em disco (se houver), com chave que inclui o conjunto de vértices alvo.
+       - Executa um Dijkstra a partir de cada um desses vértices sobre a lista de adjacência do grafo.
+       - Devolve a matriz compacta com o mesmo acesso matriz[u][v] da matriz completa.
+
+    4. Contribuição:
+       Modo "somente nós requeridos": as rotinas de roteamento só consultam distâncias entre esses vértices, então o restante dos |V|² pares não precisa ser calculado.
+    """
+    vertices_alvo = {deposito}
+    if isinstance(servicos, TabelaServicos):
+        vertices_alvo.update(servicos.origem)
+        vertices_alvo.update(servicos.destino)
+    else:
+        for serv in servicos:
+            vertices_alvo.add(serv["origem"])
+            vertices_alvo.add(serv["destino"])
+    if cache is None:
+        return calcular_distancias_requeridas(vertices, arestas, arcos, vertices_alvo)
+    return obter_ou_calcular(
+        cache,
+        CacheDistancias.chave(vertices, arestas, arcos, vertices_alvo),
+        lambda: calcular_distancias_requeridas(vertices, arestas, arcos, vertices_alvo)
+    )
 
 def extrair_servicos(dados_leitura):
     """
@@ -159,9 +295,10 @@ def extrair_servicos(dados_leitura):
        Extrair e organizar todos os serviços obrigatórios do grafo (vértices, arestas e arcos obrigatórios) em uma lista padronizada para uso nos algoritmos de roteamento.
 
     2. Entradas:
-       - dados_leitura: dicionário retornado por leitor_arquivo, contendo os conjuntos de serviços obrigatórios.
+       - dados_leitura: DadosInstancia retornado por leitor_arquivo (ou dicionário com os conjuntos de serviços obrigatórios).
 
     3. Lógica interna:
+       - Lê os serviços direto dos arrays das seções ReN, ReE e ReA, ordenados e sem repetições.
        - Para cada vértice obrigatório, cria um dicionário de serviço com tipo 'vertice'.
        - Para cada aresta obrigatória, cria um dicionário de serviço com tipo 'aresta'.
        - Para cada arco obrigatório, cria um dicionário de serviço com tipo 'arco'.
@@ -170,11 +307,21 @@ def extrair_servicos(dados_leitura):
     4. Contribuição:
        Gera a lista de serviços obrigatórios no formato esperado pelos algoritmos construtivos e heurísticas de otimização, garantindo padronização e facilidade de manipulação.
     """
+    if isinstance(dados_leitura, DadosInstancia):
+        # Ordena e remove linhas repetidas direto nos arrays (mesma ordem dos conjuntos ordenados pela chave)
+        vertices_req = _linhas_ordenadas(dados_leitura["ReN"], ("origem", "demanda", "custo_servico"))
+        arestas_req = _linhas_ordenadas(dados_leitura["ReE"], COLUNAS_SECAO[2:], normalizar=True)
+        arcos_req = _linhas_ordenadas(dados_leitura["ReA"], COLUNAS_SECAO[2:])
+    else:
+        vertices_req = sorted((v, demanda, cs) for v, (demanda, cs) in dados_leitura["vertices_requeridos"])
+        arestas_req = sorted((u, v, *valores) for (u, v), valores in dados_leitura["arestas_requeridas"])
+        arcos_req = sorted((u, v, *valores) for (u, v), valores in dados_leitura["arcos_requeridos"])
+
     servicos = []
     id_atual = 1
 
     # Adiciona vértices obrigatórios como serviços
-    for (vertice, (demanda, custo_servico)) in sorted(dados_leitura["vertices_requeridos"], key=lambda x: x[0]):
+    for vertice, demanda, custo_servico in vertices_req:
         servicos.append({
             "id_servico": id_atual,
             "tipo": "vertice",
@@ -186,8 +333,7 @@ def extrair_servicos(dados_leitura):
         id_atual += 1
 
     # Adiciona arestas obrigatórias como serviços
-    for (aresta, (custo_transporte, demanda, custo_servico)) in sorted(dados_leitura["arestas_requeridas"], key=lambda x: x[0]):
-        origem, destino = aresta
+    for origem, destino, custo_transporte, demanda, custo_servico in arestas_req:
         servicos.append({
             "id_servico": id_atual,
             "tipo": "aresta",
@@ -199,8 +345,7 @@ def extrair_servicos(dados_leitura):
         id_atual += 1
 
     # Adiciona arcos obrigatórios como serviços
-    for (arco, (custo_transporte, demanda, custo_servico)) in sorted(dados_leitura["arcos_requeridos"], key=lambda x: x[0]):
-        origem, destino = arco
+    for origem, destino, custo_transporte, demanda, custo_servico in arcos_req:
         servicos.append({
             "id_servico": id_atual,
             "tipo": "arco",
@@ -211,4 +356,19 @@ def extrair_servicos(dados_leitura):
         })
         id_atual += 1
 
-    return servicos
\ No newline at end of file
+    return servicos
+
+
+def _linhas_ordenadas(secao, colunas, normalizar=False):
+    """
+    Devolve as linhas distintas de uma seção como tuplas, em ordem lexicográfica.
+    Para ligações, as duas primeiras posições são (origem, destino), normalizadas para (menor, maior) no caso das arestas.
+    """
+    if colunas[0] == "origem":
+        chaves = [secao[c] for c in colunas]
+    else:
+        origem, destino = secao["origem"], secao["destino"]
+        if normalizar:
+            origem, destino = np.minimum(origem, destino), np.maximum(origem, destino)
+        chaves = [origem, destino] + [secao[c] for c in colunas]
+    return sorted(set(zip(*(chave.tolist() for chave in chaves))))
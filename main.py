@@ -1,12 +1,31 @@
 import os
+import sys
 import time
 import psutil
-import concurrent.futures
-from leitor_grafo import leitor_arquivo, criar_matriz_distancias, extrair_servicos
-from algoritmo_construtivo import salvar_solucao, clarke_wright_grasp, relocate, vnd, segment_relocate, multi_start_pipeline
-
-
-def processar_arquivo(arquivo, pasta_entrada, pasta_saida):
+from leitor_grafo import leitor_arquivo, criar_matriz_distancias, criar_matriz_distancias_requeridas, extrair_servicos
+from cache_distancias import CacheDistancias
+from executor_lote import executar_lote
+from instancia_compilada import carregar_instancia, localizar_compilada
+from algoritmo_construtivo import salvar_solucao, clarke_wright_grasp, relocate, vnd, segment_relocate, multi_start_pipeline, derivar_semente
+from algoritmo_genetico import algoritmo_genetico
+
+# Orçamento de tempo (s) do otimizador genético quando nenhum tempo limite é informado
+TEMPO_PADRAO_GENETICO = 60
+
+
+def processar_arquivo(
+    arquivo,
+    pasta_entrada,
+    pasta_saida,
+    somente_requeridos=True,
+    pasta_cache=".cache_distancias",
+    processos_tentativas=1,
+    tempo_limite_tentativas=None,
+    pasta_compilados="compilados",
+    construtivo="clarke_wright",
+    otimizador="multi_start",
+    semente=None
+):
     """
     1. Objetivo:
        Processa uma instância do problema de roteamento de veículos (um arquivo .dat), executando todo o pipeline de construção e otimização de rotas, e salva a melhor solução encontrada.
@@ -15,14 +34,27 @@ def processar_arquivo(arquivo, pasta_entrada, pasta_saida):
        - arquivo: nome do arquivo de entrada (instância do problema).
        - pasta_entrada: diretório onde estão os arquivos de entrada.
        - pasta_saida: diretório onde as soluções serão salvas.
+       - somente_requeridos: se True, calcula distâncias apenas entre o depósito e as extremidades dos serviços (matriz compacta); se False, entre todos os pares de vértices.
+       - pasta_cache: diretório do cache persistente de matrizes de distâncias (None desativa o cache).
+       - processos_tentativas: número de processos usados para executar as tentativas do multi-start em paralelo.
+       - tempo_limite_tentativas: orçamento de tempo (s) do multi-start; se informado, as tentativas se repetem até o prazo (modo "anytime").
+       - pasta_compilados: diretório das instâncias compiladas (instancia_compilada.py); None desativa o uso de compilados.
+       - construtivo: construtivo das tentativas do multi-start ("clarke_wright", "split" ou "misto").
+       - otimizador: "multi_start" (multi_start_pipeline) ou "genetico" (algoritmo_genetico, com processos_tentativas ilhas
+         e orçamento tempo_limite_tentativas ou TEMPO_PADRAO_GENETICO).
+       - semente: semente base da otimização; None = derivada do nome da instância (derivar_semente), de modo que cada instância
+         tem sempre a mesma semente, independentemente da ordem ou do paralelismo do lote.
 
     3. Lógica interna:
-       - Lê e interpreta os dados do arquivo de entrada (grafo, demandas, etc.).
-       - Cria a matriz de distâncias e extrai os serviços obrigatórios.
+       - Se houver uma versão compilada atualizada da instância, carrega-a por mmap (serviços e, se gravada, a matriz de distâncias do mesmo tipo).
+       - Caso contrário, lê e interpreta os dados do arquivo de entrada (grafo, demandas, etc.).
+       - Extrai os serviços obrigatórios e cria a matriz de distâncias (reaproveitando o cache em disco, se disponível).
        - Obtém a capacidade do veículo e o depósito.
        - Mede a frequência do processador para referência temporal.
-       - Executa o pipeline multi-start (multi_start_pipeline), que constrói e refina soluções múltiplas vezes (com GRASP, VND, segment_relocate, etc.), retornando a melhor solução encontrada.
-       - Salva a solução otimizada no formato esperado.
+       - Define a semente base da instância; todos os geradores aleatórios (tentativas, ilhas) são derivados dela.
+       - Executa o pipeline multi-start (multi_start_pipeline), que constrói e refina soluções múltiplas vezes (com GRASP, VND, segment_relocate, etc.),
+         ou a busca genética híbrida (algoritmo_genetico), retornando a melhor solução encontrada.
+       - Salva a solução otimizada no formato esperado, registrando a semente usada.
 
     4. Contribuição:
        É a função central de processamento de cada instância, integrando leitura, construção, otimização e salvamento da solução.
@@ -30,27 +62,67 @@ def processar_arquivo(arquivo, pasta_entrada, pasta_saida):
     print(f"Processando {arquivo}...")
 
     caminho = os.path.join(pasta_entrada, arquivo)
-    dados = leitor_arquivo(caminho)
-    matriz_distancias = criar_matriz_distancias(dados["vertices"], dados["arestas"], dados["arcos"])
+    compilada = localizar_compilada(caminho, pasta_compilados) if pasta_compilados else None
+    matriz_distancias = None
+    if compilada:
+        instancia = carregar_instancia(compilada)
+        dados = instancia.dados
+        servicos = instancia.tabela
+        if instancia.tipo_matriz == ("requeridos" if somente_requeridos else "completa"):
+            matriz_distancias = instancia.matriz_distancias
+    else:
+        dados = leitor_arquivo(caminho)
+        servicos = extrair_servicos(dados)
     capacidade = int(dados["header"]["Capacity"])
     deposito = int(dados["header"].get("Depot Node", 0))
-    servicos = extrair_servicos(dados)
+    if matriz_distancias is None:
+        cache = CacheDistancias(pasta_cache) if pasta_cache else None
+        if somente_requeridos:
+            matriz_distancias = criar_matriz_distancias_requeridas(
+                dados["vertices"], dados["arestas"], dados["arcos"], servicos, deposito, cache=cache
+            )
+        else:
+            matriz_distancias = criar_matriz_distancias(dados["vertices"], dados["arestas"], dados["arcos"], cache=cache)
 
     freq_mhz = psutil.cpu_freq().current
     freq_hz = freq_mhz * 1_000_000
 
-    # Executa o pipeline multi-start, que tenta várias soluções iniciais e refina cada uma,
-    # retornando a melhor solução encontrada (menor custo/rotas).
-    rotas_otimizadas, demandas, clock_total_ciclos, melhor_clock_encontrado_ciclos = multi_start_pipeline(
-        servicos,
-        deposito,
-        matriz_distancias,
-        capacidade,
-        servicos,
-        k_grasp=10,
-        num_tentativas=5,
-        freq_hz=freq_hz
-    )
+    if semente is None:
+        semente = derivar_semente(os.path.splitext(arquivo)[0])
+
+    if otimizador == "genetico":
+        # Busca genética híbrida com orçamento de tempo (uma ilha por processo)
+        rotas_otimizadas, demandas, clock_total_ciclos, melhor_clock_encontrado_ciclos = algoritmo_genetico(
+            servicos,
+            deposito,
+            matriz_distancias,
+            capacidade,
+            servicos,
+            tempo_limite=tempo_limite_tentativas or TEMPO_PADRAO_GENETICO,
+            k_grasp=10,
+            freq_hz=freq_hz,
+            num_ilhas=processos_tentativas,
+            semente=semente
+        )
+    elif otimizador == "multi_start":
+        # Executa o pipeline multi-start, que tenta várias soluções iniciais e refina cada uma,
+        # retornando a melhor solução encontrada (menor custo/rotas).
+        rotas_otimizadas, demandas, clock_total_ciclos, melhor_clock_encontrado_ciclos = multi_start_pipeline(
+            servicos,
+            deposito,
+            matriz_distancias,
+            capacidade,
+            servicos,
+            k_grasp=10,
+            num_tentativas=5 if tempo_limite_tentativas is None else None,
+            freq_hz=freq_hz,
+            num_processos=processos_tentativas,
+            tempo_limite=tempo_limite_tentativas,
+            construtivo=construtivo,
+            semente=semente
+        )
+    else:
+        raise ValueError(f"Otimizador desconhecido: {otimizador}")
     
 
     nome_saida = os.path.join(pasta_saida, f"sol-{arquivo}")
@@ -61,7 +133,8 @@ def processar_arquivo(arquivo, pasta_entrada, pasta_saida):
         matriz_distancias,
         deposito=deposito,
         tempo_referencia_execucao=clock_total_ciclos,
-        tempo_referencia_solucao=melhor_clock_encontrado_ciclos
+        tempo_referencia_solucao=melhor_clock_encontrado_ciclos,
+        semente=semente
     )
 
 def main():
@@ -70,21 +143,26 @@ def main():
        Gerencia o fluxo principal do programa: prepara diretórios, identifica arquivos de entrada e distribui o processamento das instâncias.
 
     2. Entradas:
-       Nenhuma direta (usa variáveis internas para diretórios).
+       Nenhuma direta (usa variáveis internas para diretórios, número de processos e tempo limite).
+       A opção de linha de comando --retomar ignora as instâncias que já têm solução na pasta de saída.
 
     3. Lógica interna:
        - Verifica se a pasta de entrada existe.
        - Cria a pasta de saída, se necessário.
        - Lista e ordena todos os arquivos .dat (instâncias do problema) na pasta de entrada.
        - Se não houver arquivos, exibe mensagem e encerra.
-       - Usa ThreadPoolExecutor para processar múltiplos arquivos em paralelo, chamando processar_arquivo para cada um.
+       - Usa executar_lote para processar as instâncias em processos paralelos (maiores primeiro), com tempo limite por instância;
+         com --retomar, continua um lote interrompido em vez de recalcular todas as soluções.
+       - Exibe um resumo com as instâncias que falharam ou excederam o tempo.
 
     4. Contribuição:
        Organiza o processamento em lote das instâncias, aproveitando múltiplos núcleos da máquina para acelerar a execução.
     """
     pasta_entrada = "dados"
     pasta_saida = "solucoes"
-    num_threads = os.cpu_count()
+    num_processos = os.cpu_count()
+    tempo_limite = 1800  # segundos por instância
+    retomar = "--retomar" in sys.argv[1:]
     if not os.path.exists(pasta_entrada):
         print(f"Pasta de entrada '{pasta_entrada}' não existe.")
         return
@@ -98,9 +176,22 @@ def main():
         print(f"Nenhum arquivo .dat encontrado na pasta '{pasta_entrada}'.")
         return
 
-    # Utiliza processamento paralelo para acelerar o processamento de múltiplas instâncias.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-      executor.map(processar_arquivo, arquivos, [pasta_entrada] * len(arquivos), [pasta_saida] * len(arquivos))
+    # Utiliza processos paralelos (e não threads, limitadas pelo GIL) para processar múltiplas instâncias.
+    resultados = executar_lote(
+        arquivos,
+        pasta_entrada,
+        pasta_saida,
+        processar_arquivo,
+        num_processos=num_processos,
+        tempo_limite=tempo_limite,
+        retomar=retomar
+    )
+
+    falhas = {arq: r for arq, r in resultados.items() if r[0] not in ("ok", "ignorado")}
+    ignorados = sum(1 for r in resultados.values() if r[0] == "ignorado")
+    print(f"\nLote concluído: {len(resultados) - len(falhas) - ignorados} processadas, {ignorados} já existentes, {len(falhas)} com falha.")
+    for arq, (status, _, decorrido) in sorted(falhas.items()):
+        print(f"  {arq}: {status} ({decorrido:.1f} s)")
 
 if __name__ == "__main__":
     """
@@ -0,0 +1,82 @@
+from array import array
+
+# Códigos compactos do tipo de serviço (guardados em array('b'))
+TIPOS_SERVICO = ("vertice", "aresta", "arco")
+
+
+class TabelaServicos:
+    """
+    1. Objetivo:
+       Representa os serviços obrigatórios como uma estrutura de arrays paralelos (struct-of-arrays), em vez de uma lista de dicionários.
+
+    2. Entradas:
+       - id, tipo, origem, destino, demanda, custo_servico: sequências alinhadas, uma posição por serviço
+         (tipo como código inteiro, índice em TIPOS_SERVICO).
+
+    3. Lógica:
+       Guarda cada campo em um array tipado (módulo array). Um serviço passa a ser identificado pelo seu índice na tabela,
+       e as rotas viram listas de índices. entrada[o][s] e saida[o][s] dão os nós por onde o serviço s começa e termina
+       no sentido o (0 = origem -> destino, 1 = invertido, permitido apenas para arestas). Adaptadores convertem índices de volta para dicionários quando necessário (ex.: salvar_solucao).
+
+    4. Contribuição:
+       Reduz a memória por serviço e elimina as buscas por chave de texto nos laços quentes das heurísticas,
+       que passam a acessar tabela.demanda[s], tabela.destino[s], etc.
+    """
+
+    def __init__(self, id, tipo, origem, destino, demanda, custo_servico):
+        self.id = array("i", id)
+        self.tipo = array("b", tipo)
+        self.origem = array("i", origem)
+        self.destino = array("i", destino)
+        self.demanda = array("q", demanda)
+        self.custo_servico = array("q", custo_servico)
+
+        # Nós de entrada e de saída de cada serviço nos dois sentidos de travessia (0: origem -> destino; 1: invertido).
+        # Só arestas podem ser atendidas no sentido invertido; para vértices e arcos, o sentido 1 repete o sentido 0.
+        aresta = TIPOS_SERVICO.index("aresta")
+        invertido = [t == aresta for t in self.tipo]
+        self.reversivel = array("b", invertido)
+        self.entrada = (
+            self.origem,
+            array("i", [d if inv else o for o, d, inv in zip(self.origem, self.destino, invertido)]),
+        )
+        self.saida = (
+            self.destino,
+            array("i", [o if inv else d for o, d, inv in zip(self.origem, self.destino, invertido)]),
+        )
+
+    @classmethod
+    def de_servicos(cls, servicos):
+        """
+        Constrói a tabela a partir da lista de dicionários gerada por extrair_servicos.
+        """
+        return cls(
+            [serv["id_servico"] for serv in servicos],
+            [TIPOS_SERVICO.index(serv["tipo"]) for serv in servicos],
+            [serv["origem"] for serv in servicos],
+            [serv["destino"] for serv in servicos],
+            [serv["demanda"] for serv in servicos],
+            [serv["custo_servico"] for serv in servicos],
+        )
+
+    def __len__(self):
+        return len(self.id)
+
+    def como_dict(self, s):
+        """
+        Adaptador: devolve o serviço de índice s no formato de dicionário usado por extrair_servicos.
+        """
+        return {
+            "id_servico": self.id[s],
+            "tipo": TIPOS_SERVICO[self.tipo[s]],
+            "origem": self.origem[s],
+            "destino": self.destino[s],
+            "demanda": self.demanda[s],
+            "custo_servico": self.custo_servico[s],
+        }
+
+    def rotas_como_dicts(self, rotas):
+        """
+        Adaptador: converte rotas de índices em rotas de dicionários (formato esperado por salvar_solucao).
+        """
+        return [[self.como_dict(s) for s in rota] for rota in rotas]